@@ -16,6 +16,9 @@ db_vol = modal.Volume.from_name("database_style_transfer", create_if_missing=Fal
 MOUNT_PATH = "/data"
 DB_VOL_MOUNT = "/mnt/db_volume"     
 DB_TOPFOLDER_NAME = "database_style_transfer"
+# Shared pooled/retrying model client, copied into the image next to main.py.
+MODEL_CLIENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 "..", "photo_art_agent", "model_client.py")
 
 PERSONAS_DIR_IN_IMAGE = None
 ARTWORK_KNOWLEDGE_DIR = None
@@ -84,8 +87,10 @@ sdxl_image = (
         "uvicorn",
         "Pillow",
         "openai",
+        "httpx[http2]",
         "ag2[openai]",
     )
+    .add_local_file(MODEL_CLIENT_PATH, remote_path="/root/model_client.py")
     # NOTE:
 )
 class GenerateRequest(BaseModel):
@@ -121,8 +126,8 @@ def fastapi_app():
     """
     import torch
     from diffusers import DiffusionPipeline
-    from openai import OpenAI
     from autogen import AssistantAgent
+    import model_client
 
     global PERSONAS_DIR_IN_IMAGE, ARTWORK_KNOWLEDGE_DIR, ICONO_WORK_KNOWLEDGE_DIR
 
@@ -202,7 +207,7 @@ def fastapi_app():
     os.environ["OPENAI_API_KEY"] = api_key
     os.environ["OPENAI_BASE_URL"] = "https://openrouter.ai/api/v1"
 
-    client = OpenAI(
+    client = model_client.get_client(
         api_key=api_key,
         base_url="https://openrouter.ai/api/v1",
         default_headers={
@@ -288,7 +293,8 @@ def fastapi_app():
         if uploaded_image_path:
             try:
                 image_data_url_for_caption = f"data:image/png;base64,{encode_image(uploaded_image_path)}"
-                caption_resp = client.responses.create(
+                caption_resp = await client.call(
+                    "responses",
                     model="google/gemma-3-27b-it",
                     input=[
                         {
@@ -346,7 +352,8 @@ def fastapi_app():
         print(f"\nUsing persona from: {persona_path}\nartwork_name = {artwork_name!r}, prompt_og = {prompt_og!r}, artist = {artist_normalized!r}")
 
         try:
-            response = client.responses.create(
+            response = await client.call(
+                "responses",
                 model="openai/gpt-oss-120b",
                 input=[
                     {
@@ -537,7 +544,8 @@ Describe surface feel, real or implied.
 Use these clear, literal directives together with your detailed Color section; SDXL will then have all the explicit parameters it needs to replicate the structure and style when swapping in any new subject.
 '''
         try:
-            art_response = client.responses.create(
+            art_response = await client.call(
+                "responses",
                 model="google/gemma-3-27b-it",
                 input=[
                     {
@@ -612,7 +620,8 @@ Detected Issues / Inconsistencies
 Overall Scene Assessment
 '''
         try:
-            obj_response = client.responses.create(
+            obj_response = await client.call(
+                "responses",
                 model="google/gemma-3-27b-it",
                 input=[
                     {
@@ -634,8 +643,8 @@ Overall Scene Assessment
         print(f"Saved reflect_object_knowledge to: {reflect_object_path}")
         img_md = encode_image_to_markdown(image1_path)
         config_list = [
-            {"model": "openai/gpt-oss-120b", "api_key": api_key},
-            {"model": "openai/gpt-oss-120b", "api_key": api_key},
+            {"model": "openai/gpt-oss-120b", "api_key": api_key, "max_retries": model_client.MAX_RETRIES},
+            {"model": "openai/gpt-oss-120b", "api_key": api_key, "max_retries": model_client.MAX_RETRIES},
         ]
 
         start_prompt = f'''
@@ -704,7 +713,8 @@ Briefly explain how each SDXLAgent response contributed to the refined version.'
         except Exception as e:
             print(f"Failed to save chat history: {e}")
         try:
-            extract_resp = client.responses.create(
+            extract_resp = await client.call(
+                "responses",
                 model="openai/gpt-oss-120b",
                 input=[
                     {
@@ -8,29 +8,40 @@ Endpoints:
 - POST /upload: Upload image + prompt, get session_id
 - POST /generate/{session_id}: Start first iteration
 - POST /iterate/{session_id}: Continue iterating
+- POST /generate/{session_id}/stream, /iterate/{session_id}/stream: Same, as server-sent events
 - POST /semantic/init/{session_id}: Initialize semantic editing mode
 - POST /semantic/edit/{session_id}: Apply semantic edits
+- POST /finalize/{session_id}: Render an edit at full resolution
+- POST /candidates/{session_id}: Render several candidate panels in one pass
 - GET /session/{session_id}: Get session info
+- GET /stats: Worker pool queues, render timings and cache hit/miss counters
 """
 
 import os
 import shutil
 import uuid
 import json
+import base64
 import cv2
 import numpy as np
 from typing import Dict, Optional, List, Any
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import modal
 
 
 image_volume = modal.Volume.from_name("photoart-images", create_if_missing=True)
 session_state = modal.Dict.from_name("photoart-sessions", create_if_missing=True)
 
+# Created on first use, once MOUNT_PATH is final.
+_render_cache = None
+
+# CPU reservation of the container; worker pools are sized from it.
+CPU_CORES = 4.0
+
 full_image = (
     modal.Image.debian_slim(python_version="3.11")
     .pip_install(
@@ -38,6 +49,7 @@ full_image = (
         "numpy",
         "torch",
         "openai",
+        "httpx[http2]",
         "cloudinary",
         "Pillow",
         "python-dotenv",
@@ -45,6 +57,7 @@ full_image = (
         "uvicorn",
         "python-multipart"
     )
+    .env({"CPU_QUOTA": str(CPU_CORES)})
     .add_local_dir(".", remote_path="/root/app")
 )
 
@@ -54,6 +67,30 @@ app = modal.App("photoart-backend")
 MOUNT_PATH = "/data"
 VLM_PREVIEW_WIDTH = 212
 MAX_ITERATIONS = 5
+USE_LUT = True
+PROXY_MODE = True
+USE_TILING = True
+PROXY_EDGE = 1024
+# Long edge and JPEG quality of the quick preview sent by the streaming endpoints.
+STREAM_PREVIEW_EDGE = 512
+STREAM_PREVIEW_QUALITY = 80
+# Render full-resolution exports in float32 and round to 8 bits once on encode.
+HIGH_PRECISION = True
+# Run panel renders on render_workers processes rather than API threads.
+USE_RENDER_PROCESSES = True
+
+# Default candidates for /candidates: the proposal interpolated toward neutral.
+CANDIDATE_SCALES = [1.0, 0.75, 0.5, 0.25]
+# Most candidates one /candidates request may render; they share one render job
+# and all frames are held in memory until it finishes.
+MAX_CANDIDATES = 8
+
+# Advanced-tool params that scale an effect's strength linearly from 0.
+STRENGTH_KEYS = {
+    "intensity", "opacity", "amount", "strength", "blend",
+    "shadow_sat", "highlight_sat", "fade_amount", "black_fade",
+    "shadows", "midtones", "highlights",
+}
 
 
 web_app = FastAPI(title="PhotoArtAgent API", version="2.0")
@@ -74,46 +111,46 @@ class SemanticEditRequest(BaseModel):
 class IterateRequest(BaseModel):
     base_filename: Optional[str] = None
 
+class CandidatesRequest(BaseModel):
+    parameters: Optional[List[Dict[str, Any]]] = Field(None, max_length=MAX_CANDIDATES)
+    scales: Optional[List[float]] = Field(None, max_length=MAX_CANDIDATES)
+    base_filename: Optional[str] = None
+
 
 def get_toolbox():
     """Get the toolbox with all available tools."""
     import sys
     sys.path.insert(0, "/root/app")
-    import opencv_tools
+    import pipeline
 
-    return {
-        "adjust_exposure": opencv_tools.adjust_exposure,
-        "adjust_contrast": opencv_tools.adjust_contrast,
-        "adjust_highlights": opencv_tools.adjust_highlights,
-        "adjust_shadows": opencv_tools.adjust_shadows,
-        "adjust_whites": opencv_tools.adjust_whites,
-        "adjust_blacks": opencv_tools.adjust_blacks,
-        "adjust_temp_tint": opencv_tools.adjust_temp_tint,
-        "adjust_saturation": opencv_tools.adjust_saturation,
-        "adjust_vibrance": opencv_tools.adjust_vibrance,
-        "adjust_color_mixer": opencv_tools.adjust_color_mixer,
-        "apply_split_toning": opencv_tools.apply_split_toning,
-        "apply_color_overlay": opencv_tools.apply_color_overlay,
-        "apply_curves": opencv_tools.apply_curves,
-        "apply_vignette": opencv_tools.apply_vignette,
-        "apply_glow": opencv_tools.apply_glow,
-        "apply_grain": opencv_tools.apply_grain,
-        "apply_duotone": opencv_tools.apply_duotone,
-        "apply_haze": opencv_tools.apply_haze,
-        "apply_film_fade": opencv_tools.apply_film_fade,
-        "apply_clarity": opencv_tools.apply_clarity,
-        "apply_dehaze": opencv_tools.apply_dehaze,
-        "apply_orton_effect": opencv_tools.apply_orton_effect,
-        "apply_cross_process": opencv_tools.apply_cross_process,
-        "apply_bleach_bypass": opencv_tools.apply_bleach_bypass,
-        "apply_teal_and_orange": opencv_tools.apply_teal_and_orange,
-        "apply_lut_color_grade": opencv_tools.apply_lut_color_grade,
-        "apply_style_preset": opencv_tools.apply_style_preset,
-    }
+    return pipeline.get_toolbox(use_lut=USE_LUT)
+
+
+async def run_blocking(pool: str, fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs) on one of the executors pools ("render", "io" or
+    "model") so blocking work does not hold up other requests.
+    """
+    import sys
+    sys.path.insert(0, "/root/app")
+    import executors
 
+    try:
+        return await executors.POOLS[pool].run(fn, *args, **kwargs)
+    except executors.PoolSaturated:
+        raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
+
+
+def vlm_preview_path(path: str) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}_vlm_preview{ext}"
 
-def make_vlm_preview(path: str, width: int = 224) -> Optional[str]:
-    """Create a smaller preview image for VLM processing."""
+
+def make_vlm_preview(path: str, width: int = 224, assets=None) -> Optional[str]:
+    """
+    Create a smaller preview image for VLM processing. With the session's
+    AssetRegistry, the preview's content hash is recorded as it is written.
+    """
     if not os.path.exists(path):
         print(f"⚠️ make_vlm_preview: Path not found {path}")
         return None
@@ -131,408 +168,180 @@ def make_vlm_preview(path: str, width: int = 224) -> Optional[str]:
         scale = width / w_img
         preview = cv2.resize(img, (width, int(h * scale)), interpolation=cv2.INTER_AREA)
 
-    root, ext = os.path.splitext(path)
-    preview_path = f"{root}_vlm_preview{ext}"
-    cv2.imwrite(preview_path, preview)
+    preview_path = vlm_preview_path(path)
+    if assets is not None:
+        assets.write_image(preview_path, preview)
+    else:
+        cv2.imwrite(preview_path, preview)
     return preview_path
 
 
-def clamp(value: float, mn: float, mx: float) -> float:
-    """Clamp a value to a range."""
-    try:
-        return max(mn, min(mx, float(value)))
-    except:
-        return mn
-
-
-def rgb_to_hue(rgb: List[int]) -> float:
-    """Convert RGB color [R,G,B] to hue (0-360)."""
-    if not rgb or len(rgb) < 3:
-        return 0
-    r, g, b = rgb[0] / 255.0, rgb[1] / 255.0, rgb[2] / 255.0
-    max_c = max(r, g, b)
-    min_c = min(r, g, b)
-    diff = max_c - min_c
-    if diff == 0:
-        return 0
-    if max_c == r:
-        hue = 60 * ((g - b) / diff % 6)
-    elif max_c == g:
-        hue = 60 * ((b - r) / diff + 2)
-    else:
-        hue = 60 * ((r - g) / diff + 4)
-    return hue if hue >= 0 else hue + 360
+def apply_panel_to_image(image: np.ndarray, params: Dict, toolbox: Dict,
+                         reference_edge: Optional[int] = None, sanitize: bool = True) -> np.ndarray:
+    """Apply editing parameters to an image."""
+    import sys
+    sys.path.insert(0, "/root/app")
+    import pipeline
+    import render_workers
 
+    if USE_RENDER_PROCESSES:
+        return render_workers.render(image, [(params, sanitize)], use_lut=USE_LUT,
+                                     use_tiling=USE_TILING, reference_edge=reference_edge)
+    return pipeline.render(image, params, toolbox, sanitize=sanitize, use_lut=USE_LUT,
+                           use_tiling=USE_TILING, reference_edge=reference_edge)
 
-def clamp_params(params: Dict) -> Dict:
-    """
-    Clamp parameters to balanced, safe ranges.
-    Key insight: Brightness controls need to be CONSERVATIVE to avoid washing out!
-    Color controls (temp, saturation) can be more aggressive.
-    """
-    def _c(val, mn, mx):
-        try:
-            return max(mn, min(mx, float(val)))
-        except:
-            return mn
-
-    result = params.copy()
-
-    mixer = result.get("adjust_color_mixer", {})
-    new_mixer = {}
-    for ch in ["red", "orange", "yellow", "green", "cyan", "blue", "purple"]:
-        cfg = mixer.get(ch, {})
-        if not isinstance(cfg, dict):
-            cfg = {}
-        hue = int(_c(cfg.get("hue_shift", 0), -20, 20))
-        sat = _c(cfg.get("sat_scale", 1.0), 0.5, 1.8)
-        lum = _c(cfg.get("lum_scale", 1.0), 0.7, 1.3)
-        new_mixer[ch] = {"hue_shift": hue, "sat_scale": sat, "lum_scale": lum}
-    result["adjust_color_mixer"] = new_mixer
-
-    if "adjust_exposure" in result:
-        exp = result["adjust_exposure"]
-        val = exp.get("value", 0.0) if isinstance(exp, dict) else exp
-        result["adjust_exposure"] = {"value": _c(val, -35, 15)}
-    else:
-        result["adjust_exposure"] = {"value": 0.0}
 
-    if "adjust_contrast" in result:
-        con = result["adjust_contrast"]
-        val = con.get("value", 1.0) if isinstance(con, dict) else con
-        result["adjust_contrast"] = {"value": _c(val, 0.85, 1.35)}
-    else:
-        result["adjust_contrast"] = {"value": 1.0}
+def render_batch(image: np.ndarray, params_list: List[Dict], toolbox: Dict,
+                 reference_edge: Optional[int] = None) -> List[np.ndarray]:
+    """Render several parameter sets over one image, sharing the colour lookup pass."""
+    import sys
+    sys.path.insert(0, "/root/app")
+    import pipeline
 
-    if "adjust_highlights" in result:
-        hl = result["adjust_highlights"]
-        val = hl.get("value", 0.0) if isinstance(hl, dict) else hl
-        result["adjust_highlights"] = {"value": _c(val, -35, 10)}
-    else:
-        result["adjust_highlights"] = {"value": 0.0}
+    return pipeline.render_batch(image, params_list, toolbox, use_lut=USE_LUT,
+                                 reference_edge=reference_edge)
 
-    if "adjust_shadows" in result:
-        sh = result["adjust_shadows"]
-        val = sh.get("value", 0.0) if isinstance(sh, dict) else sh
-        result["adjust_shadows"] = {"value": _c(val, -25, 35)}
-    else:
-        result["adjust_shadows"] = {"value": 0.0}
 
-    if "adjust_whites" in result:
-        wh = result["adjust_whites"]
-        val = wh.get("value", 0.0) if isinstance(wh, dict) else wh
-        result["adjust_whites"] = {"value": _c(val, -25, 8)}
-    else:
-        result["adjust_whites"] = {"value": 0.0}
+def _lerp_params(neutral: Any, value: Any, t: float) -> Any:
+    if isinstance(neutral, dict) and isinstance(value, dict):
+        return {k: _lerp_params(neutral.get(k), v, t) for k, v in value.items()}
+    if isinstance(neutral, (int, float)) and isinstance(value, (int, float)):
+        return neutral + (value - neutral) * t
+    return value
 
-    if "adjust_blacks" in result:
-        bl = result["adjust_blacks"]
-        val = bl.get("value", 0.0) if isinstance(bl, dict) else bl
-        result["adjust_blacks"] = {"value": _c(val, -20, 15)}
-    else:
-        result["adjust_blacks"] = {"value": 0.0}
-
-    if "adjust_temp_tint" in result:
-        tt = result["adjust_temp_tint"]
-        if isinstance(tt, dict):
-            t_val = _c(tt.get("temp", 0.0), -70, 70)
-            tint_val = _c(tt.get("tint", 0.0), -25, 25)
-            result["adjust_temp_tint"] = {"temp": t_val, "tint": tint_val}
-        else:
-            result["adjust_temp_tint"] = {"temp": 0.0, "tint": 0.0}
-    else:
-        result["adjust_temp_tint"] = {"temp": 0.0, "tint": 0.0}
 
-    if "adjust_saturation" in result:
-        sat = result["adjust_saturation"]
-        val = sat.get("scale", 1.0) if isinstance(sat, dict) else sat
-        result["adjust_saturation"] = {"scale": _c(val, 0.0, 1.4)}
-    else:
-        result["adjust_saturation"] = {"scale": 1.0}
+def scale_params(params: Dict, scale: float) -> Dict:
+    """
+    Interpolate a parameter set toward neutral: 1.0 keeps it, 0.0 leaves the
+    image unchanged. Style presets and LUT grades are kept as they are.
+    """
+    import sys
+    sys.path.insert(0, "/root/app")
+    import panel_program
+    import pipeline
 
-    if "adjust_vibrance" in result:
-        vib = result["adjust_vibrance"]
-        val = vib.get("strength", 0.0) if isinstance(vib, dict) else vib
-        result["adjust_vibrance"] = {"strength": _c(val, 0.0, 0.8)}
-    else:
-        result["adjust_vibrance"] = {"strength": 0.0}
+    clamped = pipeline.clamp_params(params)
+    result = {
+        tool_name: _lerp_params(neutral, clamped[tool_name], scale)
+        for tool_name, neutral in panel_program.NEUTRAL_PANEL.items()
+    }
 
+    for tool_name, tool_params in params.items():
+        if tool_name in result:
+            continue
+        tool_params = pipeline.normalize_tool_params(tool_name, tool_params)
+        result[tool_name] = {
+            k: v * scale if k in STRENGTH_KEYS and isinstance(v, (int, float)) else v
+            for k, v in tool_params.items()
+        }
     return result
 
 
-def normalize_tool_params(tool_name: str, tool_params: Any) -> Dict:
+def get_lineage(sess: Dict, path: str) -> List[Dict]:
+    """The edits that turn the original into the image at path."""
+    return list(sess.get("lineage", {}).get(os.path.basename(path), []))
+
+
+def get_render_source(sess: Dict, path: str) -> str:
+    """Path to render from: the proxy stands in for the original in proxy mode."""
+    if path == sess["original_path"]:
+        return sess.get("proxy_path") or path
+    return path
+
+
+def get_reference_edge(sess: Dict) -> Optional[int]:
     """
-    Normalize AI's various parameter formats to what our functions expect.
-    The AI can send params in MANY different formats - we handle them ALL here.
+    Long edge of the original, so grain rendered on a proxy is sampled from the
+    same field as the full-resolution export. None when renders are full size.
     """
-    if isinstance(tool_params, str):
-        if tool_name == "apply_style_preset":
-            return {"style": tool_params}
-        elif tool_name == "apply_grain":
-            try:
-                return {"amount": float(tool_params)}
-            except:
-                return {"amount": 0.03}
-        else:
-            return {}
-
-    if tool_params is None:
-        return {}
-
-    if isinstance(tool_params, list):
-        if tool_name == "apply_curves":
-            try:
-                shadows = (tool_params[0][1] - 0) * 2
-                midtones = (tool_params[2][1] - 128) / 2
-                highlights = (tool_params[4][1] - 255) * 2
-                return {"shadows": shadows, "midtones": midtones, "highlights": highlights}
-            except:
-                return {"shadows": 0, "midtones": 0, "highlights": 0}
-        return {}
-
-    if not isinstance(tool_params, dict):
-        return {}
-
-    normalized = tool_params.copy()
-
-    if tool_name == "apply_style_preset":
-        if "preset" in normalized and "style" not in normalized:
-            normalized["style"] = normalized.pop("preset")
-        if "name" in normalized and "style" not in normalized:
-            normalized["style"] = normalized.pop("name")
-        return {"style": normalized.get("style", "none")}
-
-    if tool_name == "apply_grain":
-        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.03
-        amount = float(amount)
-        if amount > 1.0:
-            amount = amount / 100.0
-        size = normalized.get("size", 1)
-        amount = min(0.08, amount)  # SAFETY CAP
-        return {"amount": amount, "size": int(min(2, max(1, size)))}
-
-    if tool_name == "apply_curves":
-        if "points" in normalized:
-            points = normalized["points"]
-            if isinstance(points, list) and len(points) >= 5:
-                try:
-                    return {
-                        "shadows": (points[0][1] - 0) * 2,
-                        "midtones": (points[2][1] - 128) / 2,
-                        "highlights": (points[4][1] - 255) * 2
-                    }
-                except:
-                    pass
-        return {
-            "shadows": normalized.get("shadows", 0),
-            "midtones": normalized.get("midtones", 0),
-            "highlights": normalized.get("highlights", 0)
-        }
+    if sess.get("proxy_path", sess["original_path"]) == sess["original_path"]:
+        return None
+    if not sess.get("original_edge"):
+        original = cv2.imread(sess["original_path"])
+        if original is None:
+            return None
+        sess["original_edge"] = max(original.shape[:2])
+    return sess["original_edge"]
 
-    if tool_name == "apply_vignette":
-        strength = normalized.get("strength") or normalized.get("amount") or normalized.get("intensity") or 0.4
-        radius = normalized.get("radius") or normalized.get("feather") or normalized.get("feathers") or normalized.get("size") or 0.75
-        strength = float(strength)
-        if strength > 1.0:
-            strength = strength / 100.0
-        radius = float(radius)
-        if radius > 1.0:
-            radius = radius / 100.0
-        strength = min(0.6, strength)  # SAFETY CAP
-        radius = min(0.9, max(0.4, radius))
-        return {"strength": strength, "radius": radius}
-
-    if tool_name == "apply_glow":
-        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.2
-        radius = normalized.get("radius") or normalized.get("size") or 21
-        intensity = min(0.35, float(intensity))
-        radius = int(radius)
-        if radius % 2 == 0:
-            radius += 1
-        return {"intensity": float(intensity), "radius": radius}
-
-    if tool_name == "apply_split_toning":
-        result = {
-            "shadow_hue": 220,
-            "shadow_sat": 0.25,
-            "highlight_hue": 40,
-            "highlight_sat": 0.2
-        }
 
-        if "shadow_color" in normalized:
-            color = normalized["shadow_color"]
-            if isinstance(color, list) and len(color) >= 3:
-                result["shadow_hue"] = rgb_to_hue(color)
-                result["shadow_sat"] = 0.3
-
-        if "highlight_color" in normalized:
-            color = normalized["highlight_color"]
-            if isinstance(color, list) and len(color) >= 3:
-                result["highlight_hue"] = rgb_to_hue(color)
-                result["highlight_sat"] = 0.3
-
-        for key in ["shadow_hue", "shadows_hue", "shadow_h"]:
-            if key in normalized:
-                result["shadow_hue"] = float(normalized[key])
-                break
-
-        for key in ["highlight_hue", "highlights_hue", "highlight_h"]:
-            if key in normalized:
-                result["highlight_hue"] = float(normalized[key])
-                break
-
-        for key in ["shadow_sat", "shadow_saturation", "shadows_sat", "shadow_s"]:
-            if key in normalized:
-                result["shadow_sat"] = float(normalized[key])
-                break
-
-        for key in ["highlight_sat", "highlight_saturation", "highlights_sat", "highlight_s"]:
-            if key in normalized:
-                result["highlight_sat"] = float(normalized[key])
-                break
-
-        if "shadows" in normalized and isinstance(normalized["shadows"], dict):
-            sh = normalized["shadows"]
-            if "hue" in sh:
-                result["shadow_hue"] = float(sh["hue"])
-            if "sat" in sh or "saturation" in sh:
-                result["shadow_sat"] = float(sh.get("sat") or sh.get("saturation"))
-
-        if "highlights" in normalized and isinstance(normalized["highlights"], dict):
-            hl = normalized["highlights"]
-            if "hue" in hl:
-                result["highlight_hue"] = float(hl["hue"])
-            if "sat" in hl or "saturation" in hl:
-                result["highlight_sat"] = float(hl.get("sat") or hl.get("saturation"))
-
-        return result
-
-    if tool_name == "apply_duotone":
-        dark = normalized.get("dark_color") or normalized.get("shadow_color") or normalized.get("color1") or [20, 0, 80]
-        light = normalized.get("light_color") or normalized.get("highlight_color") or normalized.get("color2") or [255, 200, 100]
-        if isinstance(dark, list):
-            dark = tuple(dark[:3])
-        if isinstance(light, list):
-            light = tuple(light[:3])
-        return {"dark_color": dark, "light_color": light}
-
-    if tool_name == "apply_haze":
-        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.15
-        color = normalized.get("color") or [200, 180, 160]
-        if isinstance(color, list):
-            color = tuple(color[:3])
-        return {"amount": float(amount), "color": color}
-
-    if tool_name == "apply_film_fade":
-        fade = normalized.get("fade_amount") or normalized.get("amount") or normalized.get("fade") or 0.25
-        black = normalized.get("black_fade") or normalized.get("black") or normalized.get("matte") or 0.1
-        return {"fade_amount": float(fade), "black_fade": float(black)}
-
-    if tool_name == "apply_clarity":
-        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.3
-        return {"amount": float(amount)}
-
-    if tool_name == "apply_dehaze":
-        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.4
-        return {"amount": float(amount)}
-
-    if tool_name == "apply_orton_effect":
-        blur = normalized.get("blur_amount") or normalized.get("blur") or normalized.get("radius") or 25
-        blend = normalized.get("blend") or normalized.get("amount") or normalized.get("strength") or 0.25
-        blur = int(blur)
-        if blur % 2 == 0:
-            blur += 1
-        return {"blur_amount": blur, "blend": float(blend)}
-
-    if tool_name == "apply_cross_process":
-        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.4
-        return {"intensity": float(intensity)}
-
-    if tool_name == "apply_bleach_bypass":
-        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.4
-        return {"intensity": float(intensity)}
-
-    if tool_name == "apply_teal_and_orange":
-        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.5
-        return {"intensity": float(intensity)}
-
-    if tool_name == "apply_lut_color_grade":
-        style = normalized.get("style") or normalized.get("lut") or normalized.get("name") or "neutral"
-        return {"style": str(style)}
-
-    return normalized
-
-
-def apply_panel_to_image(image: np.ndarray, params: Dict, toolbox: Dict) -> np.ndarray:
+def get_render_cache():
+    """The process-wide render cache, indexed under MOUNT_PATH/render_cache."""
+    global _render_cache
+    if _render_cache is None:
+        import sys
+        sys.path.insert(0, "/root/app")
+        import render_cache
+
+        _render_cache = render_cache.RenderCache(os.path.join(MOUNT_PATH, "render_cache"))
+    return _render_cache
+
+
+def get_render_key(source_path: str, params: Dict, sanitize: bool = True,
+                   reference_edge: Optional[int] = None) -> Optional[str]:
+    """Render cache key for params over the file at source_path."""
+    import sys
+    sys.path.insert(0, "/root/app")
+    import canonical
+    import render_cache
+
+    digest = get_render_cache().file_digest(source_path)
+    if digest is None:
+        return None
+    params_digest = canonical.canonicalize(params, sanitize).digest
+    return render_cache.make_key(digest, params_digest, use_lut=USE_LUT, reference_edge=reference_edge)
+
+
+def find_cached_render(sess: Dict, key: Optional[str], filename: str) -> Optional[str]:
     """
-    Apply editing parameters to an image.
-    Only applies tools that are explicitly in the params.
+    Path in this session of an earlier render for key. A render from another
+    session is copied in as filename, so lineage and finalize stay per session.
     """
-    img = image.copy()
-    clamped_params = clamp_params(params)
-
-    safe_tools = [
-        "adjust_exposure",
-        "adjust_contrast",
-        "adjust_highlights",
-        "adjust_shadows",
-        "adjust_whites",
-        "adjust_blacks",
-        "adjust_temp_tint",
-        "adjust_saturation",
-        "adjust_vibrance",
-        "adjust_color_mixer"
-    ]
+    if key is None:
+        return None
+    path = get_render_cache().get(key)
+    if path is None:
+        return None
+    if os.path.dirname(path) != sess["output_base"]:
+        dest = os.path.join(sess["output_base"], filename)
+        shutil.copyfile(path, dest)
+        path = dest
+    print(f"  ⚡ Render cache hit: {os.path.basename(path)}")
+    return path
 
-    for tool_name in safe_tools:
-        if tool_name in toolbox:
-            tool_func = toolbox[tool_name]
-            tool_params = clamped_params.get(tool_name, {})
-            try:
-                img = tool_func(img, **tool_params)
-            except Exception as e:
-                print(f"ERROR applying {tool_name}: {e}")
-
-    advanced_tools = [
-        "apply_split_toning",
-        "apply_color_overlay",
-        "apply_curves",
-        "apply_vignette",
-        "apply_glow",
-        "apply_grain",
-        "apply_duotone",
-        "apply_haze",
-        "apply_film_fade",
-        "apply_clarity",
-        "apply_dehaze",
-        "apply_orton_effect",
-        "apply_cross_process",
-        "apply_bleach_bypass",
-        "apply_teal_and_orange",
-        "apply_lut_color_grade",
-        "apply_style_preset"
-    ]
 
-    for tool_name in advanced_tools:
-        if tool_name in params and tool_name in toolbox:
-            tool_func = toolbox[tool_name]
-            raw_params = params[tool_name]
-            tool_params = normalize_tool_params(tool_name, raw_params)
+def store_render(key: str, path: str):
+    """Index the render at path under key (cache created on first use)."""
+    get_render_cache().put(key, path)
 
-            if tool_name == "apply_style_preset":
-                style = tool_params.get("style", "")
-                if not style or style == "none":
-                    continue
 
-            if not tool_params:
-                continue
+def render_to_file(source_path: str, params: Dict, toolbox: Dict, save_path: str,
+                   reference_edge: Optional[int] = None, sanitize: bool = True) -> bool:
+    """Render params over the image at source_path into save_path; False if unreadable."""
+    base_image = cv2.imread(source_path)
+    if base_image is None:
+        return False
+    cv2.imwrite(save_path, apply_panel_to_image(base_image, params, toolbox, reference_edge, sanitize))
+    return True
 
-            try:
-                print(f"  ✓ Applying {tool_name}: {tool_params}")
-                img = tool_func(img, **tool_params)
-            except Exception as e:
-                print(f"  ✗ ERROR applying {tool_name}: {e}")
 
+def replay_lineage(image: np.ndarray, lineage: List[Dict], toolbox: Dict,
+                   precision: str = "uint8") -> np.ndarray:
+    """Re-apply a recorded chain of edits to an image (used for full-res export)."""
+    import sys
+    sys.path.insert(0, "/root/app")
+    import pipeline
+    import render_workers
+
+    # Semantic params come out of convert_coordinates_to_params already clamped.
+    steps = [(step["params"], step["kind"] != "semantic") for step in lineage]
+    if USE_RENDER_PROCESSES:
+        return render_workers.render(image, steps, use_lut=USE_LUT, use_tiling=USE_TILING,
+                                     precision=precision)
+
+    img = image
+    for params, sanitize in steps:
+        img = pipeline.render(img, params, toolbox, sanitize=sanitize,
+                              use_lut=USE_LUT, use_tiling=USE_TILING, precision=precision)
     return img
 
 
@@ -548,9 +357,14 @@ async def root():
             "upload": "POST /upload (file + prompt) - Upload image and set editing goal",
             "generate": "POST /generate/{session_id} - Start first iteration",
             "iterate": "POST /iterate/{session_id} - Continue iterating (optional: base_filename)",
+            "generate_stream": "POST /generate/{session_id}/stream - Start first iteration, as server-sent events",
+            "iterate_stream": "POST /iterate/{session_id}/stream - Continue iterating, as server-sent events",
             "session": "GET /session/{session_id} - Get session info",
             "semantic_init": "POST /semantic/init/{session_id} - Analyze semantic axes",
-            "semantic_edit": "POST /semantic/edit/{session_id} - Apply semantic edits"
+            "semantic_edit": "POST /semantic/edit/{session_id} - Apply semantic edits",
+            "finalize": "POST /finalize/{session_id} (optional: filename) - Render at full resolution",
+            "candidates": "POST /candidates/{session_id} - Render candidate panels (optional: parameters, scales)",
+            "stats": "GET /stats - Worker pool queues, render timings and cache hit/miss counters"
         },  
         "style_presets": [
             "noir", "neo_noir", "dark_noir",
@@ -578,23 +392,41 @@ async def upload_image(
 
     file_path = os.path.join(session_dir, "original.jpg")
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    import sys
+    sys.path.insert(0, "/root/app")
+    import asset_registry
+
+    assets = {}
+    await run_blocking("io", asset_registry.AssetRegistry(assets).save_stream, file_path, file.file)
 
     if not prompt or len(prompt.strip()) == 0:
         raise HTTPException(400, "Prompt cannot be empty")
 
+    import proxy_pyramid
+
+    pyramid = {}
+    if PROXY_MODE:
+        try:
+            pyramid = await run_blocking("render", proxy_pyramid.build_pyramid, file_path, session_dir)
+            print(f"🔍 Proxy pyramid: {sorted(pyramid)}")
+        except Exception as e:
+            print(f"⚠️ Could not build proxy pyramid: {e}")
+
     session_state[session_id] = {
         "original_path": file_path,
         "current_path": file_path,
+        "proxy_path": proxy_pyramid.select_level(pyramid, file_path, PROXY_EDGE),
+        "pyramid": pyramid,
+        "lineage": {},
         "history": [],
         "iteration_count": 0,
         "prompt": prompt.strip(),
         "semantic_axes": None,
-        "output_base": session_dir
+        "output_base": session_dir,
+        "assets": assets
     }
 
-    image_volume.commit()
+    await run_blocking("io", image_volume.commit)
 
     return {
         "session_id": session_id,
@@ -630,9 +462,39 @@ async def get_session_info(session_id: str):
     }
 
 
-@web_app.post("/generate/{session_id}")
-async def start_generation(session_id: str):
-    """Start the first iteration of editing."""
+@web_app.get("/stats")
+async def get_stats():
+    """Worker pool queues and hit/miss counters of the in-process render caches."""
+    import sys
+    sys.path.insert(0, "/root/app")
+    import executors
+    import grain
+    import image_transport
+    import intermediate_cache
+    import lut3d
+    import model_client
+    import opencv_tools
+    import pipeline
+    import render_workers
+    import upload_cache
+
+    return {
+        "executors": executors.stats(),
+        "render_workers": render_workers.stats(),
+        "render_timings": pipeline.render_timings(),
+        "intermediate_cache": intermediate_cache.stats(),
+        "vignette_cache": opencv_tools.vignette_cache_stats(),
+        "grain_cache": grain.stats(),
+        "render_cache": get_render_cache().stats(),
+        "lut_cache": lut3d.cache_info()._asdict(),
+        "upload_cache": upload_cache.get_cache().stats(),
+        "image_transport": image_transport.stats(),
+        "model_client": model_client.stats(),
+    }
+
+
+def reset_generation(session_id: str):
+    """Clear a session's iterations so the next one starts from the original."""
     if session_id not in session_state:
         raise HTTPException(404, "Session not found")
 
@@ -646,12 +508,9 @@ async def start_generation(session_id: str):
     sess["current_path"] = sess["original_path"]
     session_state[session_id] = sess
 
-    return await run_iteration_logic(session_id)
-
 
-@web_app.post("/iterate/{session_id}")
-async def iterate(session_id: str, base_filename: Optional[str] = Form(None)):
-    """Continue iterating on the current edit."""
+def select_iteration_base(session_id: str, base_filename: Optional[str]) -> Optional[Dict]:
+    """Point the session at base_filename; returns the "done" response once out of iterations."""
     if session_id not in session_state:
         raise HTTPException(404, "Session not found")
 
@@ -672,14 +531,114 @@ async def iterate(session_id: str, base_filename: Optional[str] = Form(None)):
             "image_url": f"/images/{session_id}/{filename}",
             "iteration": sess["iteration_count"]
         }
+    return None
+
+
+@web_app.post("/generate/{session_id}")
+async def start_generation(session_id: str):
+    """Start the first iteration of editing."""
+    reset_generation(session_id)
+    return await run_iteration_logic(session_id)
+
 
+@web_app.post("/iterate/{session_id}")
+async def iterate(session_id: str, base_filename: Optional[str] = Form(None)):
+    """Continue iterating on the current edit."""
+    done = select_iteration_base(session_id, base_filename)
+    if done:
+        return done
     return await run_iteration_logic(session_id)
 
 
+@web_app.post("/generate/{session_id}/stream")
+async def start_generation_stream(session_id: str):
+    """Start the first iteration, streaming its progress as server-sent events."""
+    reset_generation(session_id)
+    return stream_iteration(session_id)
+
+
+@web_app.post("/iterate/{session_id}/stream")
+async def iterate_stream(session_id: str, base_filename: Optional[str] = Form(None)):
+    """Continue iterating, streaming its progress as server-sent events."""
+    return stream_iteration(session_id, done=select_iteration_base(session_id, base_filename))
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_iteration(session_id: str, done: Optional[Dict] = None) -> StreamingResponse:
+    """
+    Run an iteration as a text/event-stream of "params" (the VLM's reason and
+    parameters), "preview" (a small render as a JPEG data URL) and "result"
+    (the /iterate response), or a single "done" / "error" event.
+    """
+    async def events():
+        if done:
+            yield sse_event("done", done)
+            return
+        try:
+            async for event, data in iteration_events(session_id, preview=True):
+                yield sse_event(event, data)
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"  ✗ ERROR in streamed iteration: {e}")
+            yield sse_event("error", {"status_code": 500, "detail": str(e)})
+
+    # no-transform/X-Accel-Buffering stop proxies from holding events back
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"})
+
+
+def render_stream_preview(sess: Dict, base_path: str, params: Dict, toolbox: Dict,
+                          reference_edge: Optional[int]) -> Optional[str]:
+    """
+    Render params over a STREAM_PREVIEW_EDGE copy of the base and return it as
+    a JPEG data URL. Nothing is written to the volume.
+    """
+    import sys
+    sys.path.insert(0, "/root/app")
+    import proxy_pyramid
+
+    if base_path == sess["original_path"]:
+        source_path = proxy_pyramid.select_level(sess.get("pyramid"), base_path, STREAM_PREVIEW_EDGE)
+    else:
+        source_path = base_path
+    image = cv2.imread(source_path)
+    if image is None:
+        return None
+
+    h, w = image.shape[:2]
+    if max(h, w) > STREAM_PREVIEW_EDGE:
+        scale = STREAM_PREVIEW_EDGE / max(h, w)
+        image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    preview = apply_panel_to_image(image, params, toolbox, reference_edge or max(h, w))
+    ok, buf = cv2.imencode(".jpg", preview, [cv2.IMWRITE_JPEG_QUALITY, STREAM_PREVIEW_QUALITY])
+    if not ok:
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(buf.tobytes()).decode("ascii")
+
+
 async def run_iteration_logic(session_id: str):
     """Core iteration logic - calls AI and applies edits."""
+    async for event, data in iteration_events(session_id):
+        if event == "result":
+            return data
+
+
+async def iteration_events(session_id: str, preview: bool = False):
+    """
+    One iteration as a sequence of (event, data): "params" once the VLM has
+    answered, "preview" (only with preview=True, and not on a render cache
+    hit) and finally "result".
+    """
     import sys
     sys.path.insert(0, "/root/app")
+    import asset_registry
     import openrouter_agent
 
     try:
@@ -698,15 +657,25 @@ async def run_iteration_logic(session_id: str):
     print(f"💬 Prompt: {sess['prompt']}")
     print(f"{'='*60}")
 
-    preview_path = make_vlm_preview(sess["original_path"], width=VLM_PREVIEW_WIDTH)
+    # Hashes and URLs of the images already sent, so they are not re-read.
+    assets = asset_registry.AssetRegistry(sess.setdefault("assets", {}))
+
+    # The original never changes, so its preview is only made once.
+    preview_path = vlm_preview_path(sess["original_path"])
+    if preview_path not in assets:
+        preview_path = await run_blocking("io", make_vlm_preview, sess["original_path"],
+                                          width=VLM_PREVIEW_WIDTH, assets=assets)
     vlm_path = preview_path if preview_path else sess["original_path"]
 
-    response_json = openrouter_agent.get_next_step(
+    response_json = await run_blocking(
+        "model",
+        openrouter_agent.get_next_step,
         sess["prompt"],
         vlm_path,
         sess["history"],
         iteration=current_iter,
-        is_first=is_first
+        is_first=is_first,
+        assets=assets
     )
 
     params = response_json.get("parameters", {})
@@ -717,41 +686,69 @@ async def run_iteration_logic(session_id: str):
     creative_tools = [k for k in params.keys() if k.startswith("apply_")]
     print(f"📊 Basic tools: {len(basic_tools)} | Creative tools: {creative_tools if creative_tools else 'none'}")
 
+    yield "params", {
+        "iteration": current_iter,
+        "reason": reason,
+        "parameters": params,
+        "ai_status": status,
+    }
+
     if is_first:
-        base_image = cv2.imread(sess["original_path"])
+        base_path = sess["original_path"]
     else:
-        prev_path = sess["current_path"]
-        if os.path.exists(prev_path):
-            base_image = cv2.imread(prev_path)
+        base_path = sess["current_path"]
+        if os.path.exists(base_path):
             print(f"🔄 Building on previous iteration")
         else:
-            base_image = cv2.imread(sess["original_path"])
+            base_path = sess["original_path"]
             print(f"⚠️ Previous not found, using original")
 
-    if base_image is None:
-        raise HTTPException(500, "Failed to read image for editing")
-
-    toolbox = get_toolbox()
-    new_image = apply_panel_to_image(base_image, params, toolbox)
+    source_path = get_render_source(sess, base_path)
+    reference_edge = await run_blocking("io", get_reference_edge, sess)
+    render_key = await run_blocking("io", get_render_key, source_path, params, reference_edge=reference_edge)
 
     filename = f"{current_iter:02d}_final.jpg"
-    save_path = os.path.join(sess["output_base"], filename)
-    cv2.imwrite(save_path, new_image)
-    image_volume.commit()
+    save_path = await run_blocking("io", find_cached_render, sess, render_key, filename)
+    result_preview = None
 
-    result_preview = make_vlm_preview(save_path, width=VLM_PREVIEW_WIDTH)
+    if save_path:
+        filename = os.path.basename(save_path)
+        if os.path.exists(vlm_preview_path(save_path)):
+            result_preview = vlm_preview_path(save_path)
+    else:
+        toolbox = get_toolbox()
+        if preview:
+            image_data = await run_blocking("render", render_stream_preview,
+                                            sess, base_path, params, toolbox, reference_edge)
+            if image_data:
+                yield "preview", {"iteration": current_iter, "image_data": image_data}
+
+        save_path = os.path.join(sess["output_base"], filename)
+        if not await run_blocking("render", render_to_file,
+                                  source_path, params, toolbox, save_path, reference_edge):
+            raise HTTPException(500, "Failed to read image for editing")
+        if render_key:
+            await run_blocking("io", store_render, render_key, save_path)
+    await run_blocking("io", image_volume.commit)
+
+    result_preview = result_preview or await run_blocking("io", make_vlm_preview, save_path,
+                                                          width=VLM_PREVIEW_WIDTH, assets=assets)
     result_preview_path = result_preview if result_preview else save_path
 
     sess["iteration_count"] = current_iter
     sess["current_path"] = save_path
+    sess.setdefault("lineage", {})[filename] = get_lineage(sess, base_path) + [
+        {"kind": "panel", "params": params}
+    ]
     sess["history"].append({
         "parameters": params,
         "image_path": result_preview_path,
+        "base_path": base_path,
         "reason": reason
     })
     session_state[session_id] = sess
 
-    return {
+    yield "result", {
         "status": "success",
         "iteration": current_iter,
         "reason": reason,
@@ -777,7 +774,9 @@ async def semantic_init(session_id: str):
     print(f"\n🎨 Analyzing image for semantic axes...")
     print(f"Session: {session_id[:8]}...")
 
-    axes_info = semantic_editor.analyze_image_axes(
+    axes_info = await run_blocking(
+        "model",
+        semantic_editor.analyze_image_axes,
         sess["current_path"],
         user_prompt=sess.get("prompt", None)
     )
@@ -820,10 +819,27 @@ async def semantic_edit(session_id: str, request: SemanticEditRequest):
     params = semantic_editor.convert_coordinates_to_params(axis_vals, sess["semantic_axes"])
 
     filename = f"semantic_{uuid.uuid4().hex[:6]}.jpg"
-    out_path = os.path.join(sess["output_base"], filename)
-
-    semantic_editor.apply_params_to_image(base_image_path, params, out_path)
-    image_volume.commit()
+    source_path = get_render_source(sess, base_image_path)
+    reference_edge = await run_blocking("io", get_reference_edge, sess)
+    render_key = await run_blocking("io", get_render_key, source_path, params, sanitize=False,
+                                    reference_edge=reference_edge)
+
+    out_path = await run_blocking("io", find_cached_render, sess, render_key, filename)
+    if out_path:
+        filename = os.path.basename(out_path)
+    else:
+        out_path = os.path.join(sess["output_base"], filename)
+        if not await run_blocking("render", render_to_file, source_path, params, get_toolbox(),
+                                  out_path, reference_edge, sanitize=False):
+            raise HTTPException(500, "Failed to read image for editing")
+        if render_key:
+            await run_blocking("io", store_render, render_key, out_path)
+    await run_blocking("io", image_volume.commit)
+
+    sess.setdefault("lineage", {})[filename] = get_lineage(sess, base_image_path) + [
+        {"kind": "semantic", "params": params}
+    ]
+    session_state[session_id] = sess
 
     return {
         "image_url": f"/images/{session_id}/{filename}",
@@ -832,6 +848,142 @@ async def semantic_edit(session_id: str, request: SemanticEditRequest):
     }
 
 
+@web_app.post("/candidates/{session_id}")
+async def render_candidates(session_id: str, request: CandidatesRequest):
+    """
+    Render several candidate panels over one base image in a single batched pass.
+    Without explicit parameters, the latest VLM proposal is re-rendered on its
+    own base image at each of the given scales toward neutral. At most
+    MAX_CANDIDATES parameter sets or scales per request (422 otherwise).
+    """
+    if session_id not in session_state:
+        raise HTTPException(404, "Session not found")
+
+    sess = dict(session_state[session_id])
+
+    if request.parameters:
+        params_list = request.parameters
+        scales = [None] * len(params_list)
+        base_path = sess["current_path"]
+    else:
+        if not sess.get("history"):
+            raise HTTPException(400, "No proposal to build candidates from. Call /generate first.")
+        latest = sess["history"][-1]
+        scales = request.scales or CANDIDATE_SCALES
+        params_list = [scale_params(latest["parameters"], scale) for scale in scales]
+        base_path = latest.get("base_path", sess["original_path"])
+
+    if request.base_filename:
+        base_path = os.path.join(sess["output_base"], request.base_filename)
+        if not os.path.exists(base_path):
+            raise HTTPException(400, f"Base image not found: {request.base_filename}")
+
+    base_image = await run_blocking("io", cv2.imread, get_render_source(sess, base_path))
+    if base_image is None:
+        raise HTTPException(500, "Failed to read image for editing")
+
+    print(f"\n🎛️ Rendering {len(params_list)} candidates on {os.path.basename(base_path)}")
+    reference_edge = await run_blocking("io", get_reference_edge, sess)
+    images = await run_blocking("render", render_batch, base_image, params_list, get_toolbox(), reference_edge)
+
+    batch_id = uuid.uuid4().hex[:6]
+    base_lineage = get_lineage(sess, base_path)
+    lineage = sess.setdefault("lineage", {})
+    candidates = []
+
+    for idx, (image, params, scale) in enumerate(zip(images, params_list, scales)):
+        filename = f"candidate_{batch_id}_{idx}.jpg"
+        await run_blocking("io", cv2.imwrite, os.path.join(sess["output_base"], filename), image)
+        lineage[filename] = base_lineage + [{"kind": "panel", "params": params}]
+        candidates.append({
+            "index": idx,
+            "scale": scale,
+            "image_url": f"/images/{session_id}/{filename}",
+            "parameters": params
+        })
+
+    await run_blocking("io", image_volume.commit)
+    session_state[session_id] = sess
+
+    return {
+        "candidates": candidates,
+        "base_image_used": os.path.basename(base_path)
+    }
+
+
+@web_app.post("/finalize/{session_id}")
+async def finalize(session_id: str, filename: Optional[str] = Form(None)):
+    """Render an edited image at full resolution by replaying its edits on the original."""
+    if session_id not in session_state:
+        raise HTTPException(404, "Session not found")
+
+    sess = dict(session_state[session_id])
+    source_path = os.path.join(sess["output_base"], filename) if filename else sess["current_path"]
+    source_name = os.path.basename(source_path)
+
+    # Without a proxy every output is already full resolution.
+    if sess.get("proxy_path", sess["original_path"]) == sess["original_path"] or source_path == sess["original_path"]:
+        if not os.path.exists(source_path):
+            raise HTTPException(400, f"Image not found: {source_name}")
+        return {
+            "image_url": f"/images/{session_id}/{source_name}",
+            "source": source_name,
+            "steps": len(get_lineage(sess, source_path)),
+        }
+
+    if source_name not in sess.get("lineage", {}):
+        raise HTTPException(400, f"No edit history for {source_name}")
+    lineage = get_lineage(sess, source_path)
+
+    import sys
+    sys.path.insert(0, "/root/app")
+    import pipeline
+
+    precision = "float" if HIGH_PRECISION else "uint8"
+    original = await run_blocking("io", pipeline.load_image, sess["original_path"], precision)
+    if original is None:
+        raise HTTPException(500, "Failed to read original image")
+
+    print(f"\n🖼️ Finalizing {source_name} at {original.shape[1]}x{original.shape[0]} "
+          f"({len(lineage)} edits, {precision})")
+    full_image = await run_blocking("render", replay_lineage, original, lineage, get_toolbox(), precision)
+
+    full_name = f"{os.path.splitext(source_name)[0]}_full.jpg"
+    full_image = await run_blocking("render", pipeline.quantize, full_image)
+    await run_blocking("io", cv2.imwrite, os.path.join(sess["output_base"], full_name), full_image)
+    await run_blocking("io", image_volume.commit)
+
+    return {
+        "image_url": f"/images/{session_id}/{full_name}",
+        "source": source_name,
+        "steps": len(lineage),
+    }
+
+
+def load_preset_bank():
+    """Memory-map the style preset LUT bank from the volume, baking missing LUTs."""
+    import sys
+    sys.path.insert(0, "/root/app")
+    import preset_bank
+
+    preset_bank.BANK_DIR = os.path.join(MOUNT_PATH, "lut_bank")
+    try:
+        baked = preset_bank.load_bank()
+        print(f"🎨 Preset LUT bank ready at {preset_bank.BANK_DIR} ({baked} LUTs baked)")
+        if baked:
+            image_volume.commit()
+    except Exception as e:
+        print(f"✗ ERROR loading preset LUT bank: {e}")
+
+
+def start_render_workers():
+    """Start the render worker processes, which load the LUT bank from the volume."""
+    import sys
+    sys.path.insert(0, "/root/app")
+    import render_workers
+
+    render_workers.start(os.path.join(MOUNT_PATH, "lut_bank"), use_lut=USE_LUT)
+
 
 @app.function(
     image=full_image,
@@ -842,7 +994,7 @@ async def semantic_edit(session_id: str, request: SemanticEditRequest):
     volumes={MOUNT_PATH: image_volume},
     timeout=600,
     gpu="T4",
-    cpu=4.0,
+    cpu=CPU_CORES,
     memory=8192,
     allow_concurrent_inputs=10,
     min_containers=0,
@@ -851,6 +1003,12 @@ async def semantic_edit(session_id: str, request: SemanticEditRequest):
 def fastapi_app():
     os.makedirs(MOUNT_PATH, exist_ok=True)
 
+    if USE_LUT:
+        load_preset_bank()
+
+    if USE_RENDER_PROCESSES:
+        start_render_workers()
+
     if os.path.exists(MOUNT_PATH):
         web_app.mount("/images", StaticFiles(directory=MOUNT_PATH), name="images")
 
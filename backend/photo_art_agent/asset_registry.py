@@ -0,0 +1,85 @@
+"""
+Asset Registry - per-session record of image content hashes and remote URLs
+===========================================================================
+Every iteration sends the VLM the original's preview plus the preview of
+each earlier result, by URL. The registry records an image's content hash
+when the API writes it, hashed from the encoded bytes already in memory,
+and its remote URL the first time it is uploaded. Later iterations resolve
+the same paths to URLs from the registry without touching the disk.
+
+The registry wraps a plain dict kept in the session (sess["assets"]), so it
+is persisted with the session state: {path: {"digest": str, "url": str}}.
+"""
+
+import hashlib
+import io
+import os
+from typing import BinaryIO, Callable, Dict, Optional
+
+import cv2
+import numpy as np
+
+import upload_cache
+
+
+def digest_bytes(data: bytes) -> str:
+    """Content hash of file bytes, the same one upload_cache.read_file computes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class AssetRegistry:
+    """Content hashes and remote URLs of a session's images, keyed by path."""
+
+    def __init__(self, assets: Dict[str, Dict[str, str]]):
+        self.assets = assets
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.assets
+
+    def register(self, path: str, digest: str):
+        entry = self.assets.setdefault(path, {})
+        if entry.get("digest") != digest:
+            # New content at this path: any earlier URL is for other bytes.
+            entry.clear()
+            entry["digest"] = digest
+
+    def write_image(self, path: str, image: np.ndarray) -> bool:
+        """Encode and write an image, recording the hash of the written bytes."""
+        ok, buf = cv2.imencode(os.path.splitext(path)[1] or ".jpg", image)
+        if not ok:
+            return False
+        data = buf.tobytes()
+        with open(path, "wb") as f:
+            f.write(data)
+        self.register(path, digest_bytes(data))
+        return True
+
+    def save_stream(self, path: str, stream: BinaryIO):
+        """Copy an uploaded file to path, hashing it as it is written."""
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "wb") as f:
+            for chunk in iter(lambda: stream.read(upload_cache.CHUNK_BYTES), b""):
+                h.update(chunk)
+                f.write(chunk)
+        self.register(path, h.hexdigest())
+
+    def url(self, path: str, upload_fn: Callable[[io.BytesIO, str], Optional[str]]) -> Optional[str]:
+        """
+        Remote URL of the image at path. A recorded URL is returned without any
+        I/O; a recorded hash skips re-hashing; unknown paths are hashed once.
+        """
+        entry = self.assets.get(path)
+        if entry and entry.get("url"):
+            return entry["url"]
+
+        cache = upload_cache.get_cache()
+        if entry and entry.get("digest"):
+            url = cache.upload_known(entry["digest"], path, upload_fn)
+        else:
+            url = cache.upload(path, upload_fn)
+            digest = cache.known_digest(path)
+            if digest:
+                self.register(path, digest)
+        if url:
+            self.assets.setdefault(path, {})["url"] = url
+        return url
@@ -0,0 +1,309 @@
+"""
+Render benchmarks for the photo_art_agent tool chain.
+
+Usage:
+    python benchmark.py panel [--width 6000 --height 4000 --repeat 3]
+    python benchmark.py presets [--style noir --style cinematic ...]
+    python benchmark.py handles [--width 3000 --height 2000]
+    python benchmark.py tiled [--width 8000 --height 6000 --strip-mp 4]
+    python benchmark.py mixer [--width 6000 --height 4000 --falloff 4]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import lut3d
+import opencv_tools
+import panel_program
+import pipeline
+import preset_bank
+import tiled_render
+
+
+NEUTRAL_PANEL = panel_program.NEUTRAL_PANEL
+
+SAMPLE_PANEL = {
+    "adjust_exposure": {"value": -12.0},
+    "adjust_contrast": {"value": 1.15},
+    "adjust_highlights": {"value": -20.0},
+    "adjust_shadows": {"value": 15.0},
+    "adjust_whites": {"value": 0.0},
+    "adjust_blacks": {"value": 0.0},
+    "adjust_temp_tint": {"temp": -25.0, "tint": 4.0},
+    "adjust_saturation": {"scale": 0.9},
+    "adjust_vibrance": {"strength": 0.3},
+    "adjust_color_mixer": {
+        "red": {"hue_shift": 0, "sat_scale": 1.0, "lum_scale": 1.0},
+        "orange": {"hue_shift": 0, "sat_scale": 1.0, "lum_scale": 1.0},
+        "yellow": {"hue_shift": 0, "sat_scale": 1.0, "lum_scale": 1.0},
+        "green": {"hue_shift": 0, "sat_scale": 1.0, "lum_scale": 1.0},
+        "cyan": {"hue_shift": 0, "sat_scale": 1.0, "lum_scale": 1.0},
+        "blue": {"hue_shift": -8, "sat_scale": 1.2, "lum_scale": 0.95},
+        "purple": {"hue_shift": 0, "sat_scale": 1.0, "lum_scale": 1.0},
+    },
+}
+
+
+# Basic panel plus split toning: temp/tint and split toning share one LAB pass.
+TONED_PANEL = {
+    **NEUTRAL_PANEL,
+    "adjust_exposure": {"value": 6.0},
+    "adjust_temp_tint": {"temp": 20.0, "tint": -5.0},
+    "apply_split_toning": {"shadow_hue": 210, "shadow_sat": 0.3, "highlight_hue": 40, "highlight_sat": 0.2},
+}
+
+
+def make_test_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Smooth colour gradients plus texture, so every hue/tone band is populated."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(2, height // 64), max(2, width // 64), 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 6, (height, width, 1)).astype(np.float32)
+    return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+
+def run_sequential_panel(image: np.ndarray, params: dict) -> np.ndarray:
+    """The pre-fusion path: every panel tool runs on the full frame in order."""
+    img = image.copy()
+    for tool_name in panel_program.FUSED_TOOLS:
+        if tool_name in params or tool_name in panel_program.BASIC_TOOLS:
+            img = getattr(opencv_tools, tool_name)(img, **params.get(tool_name, {}))
+    return img
+
+
+def _time(fn, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def bench_panel(args):
+    image = make_test_image(args.width, args.height)
+    print(f"Image: {args.width}x{args.height} ({args.width * args.height / 1e6:.1f} MP)")
+
+    panels = {
+        "sample": SAMPLE_PANEL,
+        "toned": TONED_PANEL,
+        "neutral": NEUTRAL_PANEL,
+    }
+
+    for label, params in panels.items():
+        program = panel_program.compile_panel(params)
+        seq_time, seq_out = _time(lambda: run_sequential_panel(image, params), args.repeat)
+        fused_time, fused_out = _time(lambda: program.run(image), args.repeat)
+        lut_time, lut_out = _time(lambda: lut3d.compile_lut(params).apply(image), args.repeat)
+
+        trace = program.trace()
+        print(f"\n[{label}] program: {program.describe()}")
+        print(f"  {trace['passes']} passes, {trace['conversions']} colour conversions"
+              f" ({trace['conversions_saved']} saved), {trace['quantisations_saved']} uint8 round trips saved")
+        print(f"  sequential: {seq_time * 1000:8.1f} ms")
+        for name, elapsed, out in (("fused", fused_time, fused_out), ("lut", lut_time, lut_out)):
+            diff = np.abs(seq_out.astype(np.int16) - out.astype(np.int16))
+            print(f"  {name + ':':11s} {elapsed * 1000:8.1f} ms  ({seq_time / max(elapsed, 1e-9):.1f}x)"
+                  f"  mean |diff| {diff.mean():.2f}  p99 {np.percentile(diff, 99):.0f}  max |diff| {diff.max()}")
+
+
+def bench_presets(args):
+    image = make_test_image(args.width, args.height)
+    print(f"Image: {args.width}x{args.height} ({args.width * args.height / 1e6:.1f} MP)")
+    preset_bank.load_bank(styles=args.style)
+
+    for style in args.style or opencv_tools.STYLE_PRESETS:
+        np.random.seed(0)
+        ref_time, ref_out = _time(lambda: opencv_tools.apply_style_preset(image, style), args.repeat)
+        np.random.seed(0)
+        bank_time, bank_out = _time(lambda: preset_bank.apply_preset(image, style), args.repeat)
+        plan = preset_bank.get_plan(style)
+        diff = np.abs(ref_out.astype(np.int16) - bank_out.astype(np.int16))
+        print(f"  {style:22s} reference {ref_time * 1000:8.1f} ms  bank {bank_time * 1000:8.1f} ms"
+              f"  ({ref_time / max(bank_time, 1e-9):.1f}x, {plan.lut_count} LUT)"
+              f"  mean |diff| {diff.mean():.2f}  p99 {np.percentile(diff, 99):.0f}  max {diff.max()}")
+
+
+HANDLE_CHAIN = [
+    ("adjust_exposure", {"value": -12.0}),
+    ("adjust_contrast", {"value": 1.15}),
+    ("adjust_highlights", {"value": -20.0}),
+    ("adjust_shadows", {"value": 15.0}),
+    ("adjust_saturation", {"scale": 0.9}),
+    ("adjust_vibrance", {"strength": 0.3}),
+    ("adjust_color_mixer", {"blue": {"hue_shift": -8, "sat_scale": 1.2, "lum_scale": 0.95}}),
+    ("apply_split_toning", {"shadow_hue": 220, "shadow_sat": 0.2, "highlight_hue": 40, "highlight_sat": 0.1}),
+]
+
+
+def bench_handles(args):
+    image = make_test_image(args.width, args.height)
+    toolbox = lut3d._default_toolbox()
+    print(f"Image: {args.width}x{args.height} on {opencv_tools.DEVICE}")
+
+    def round_trips():
+        # What each tool's tensor branch does on its own: upload, run, download.
+        img = image
+        for tool_name, params in HANDLE_CHAIN:
+            img = toolbox[tool_name](opencv_tools.ImageHandle.from_bgr(img), **params).to_bgr()
+        return img
+
+    use_handles = opencv_tools.USE_HANDLES
+    opencv_tools.USE_HANDLES = True
+    try:
+        trip_time, trip_out = _time(round_trips, args.repeat)
+        handle_time, handle_out = _time(lambda: lut3d.run_stages(image, HANDLE_CHAIN, toolbox), args.repeat)
+    finally:
+        opencv_tools.USE_HANDLES = use_handles
+
+    diff = np.abs(trip_out.astype(np.int16) - handle_out.astype(np.int16))
+    print(f"  per-tool round trips: {trip_time * 1000:8.1f} ms  ({len(HANDLE_CHAIN)} uploads/quantisations)")
+    print(f"  resident handle:      {handle_time * 1000:8.1f} ms  ({trip_time / max(handle_time, 1e-9):.1f}x)"
+          f"  mean |diff| {diff.mean():.2f}")
+
+
+TILED_STAGES = [
+    ("panel", SAMPLE_PANEL),
+    ("apply_color_overlay", {"color": (255, 100, 50), "opacity": 0.15, "blend_mode": "overlay"}),
+    ("apply_teal_and_orange", {"intensity": 0.4}),
+    ("apply_vignette", {"strength": 0.4, "radius": 0.7}),
+    ("apply_glow", {"intensity": 0.2, "radius": 25}),
+]
+
+# Float renders: clarity's blur kernel is wider than on uint8, and dehaze
+# (untiled, whole frame) amplifies any seam the strips leave.
+FLOAT_TILED_STAGES = TILED_STAGES + [
+    ("apply_clarity", {"amount": 0.4}),
+    ("apply_dehaze", {"amount": 0.3}),
+]
+
+
+def _peak(fn):
+    # numpy reports its buffers to tracemalloc; OpenCV-internal buffers are not counted.
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def bench_tiled(args):
+    image = make_test_image(args.width, args.height)
+    toolbox = lut3d._default_toolbox()
+    print(f"Image: {args.width}x{args.height} ({image.nbytes / 1e6:.0f} MB uint8)")
+
+    full_time, full_peak, full_out = _peak(lambda: lut3d.render_stages(image, TILED_STAGES, toolbox))
+    tiled_time, tiled_peak, tiled_out = _peak(lambda: tiled_render.render_tiled(
+        image, TILED_STAGES, toolbox, strip_pixels=int(args.strip_mp * 1e6)))
+
+    print(f"  untiled: {full_time * 1000:8.1f} ms  peak numpy {full_peak / 1e6:8.0f} MB")
+    print(f"  tiled:   {tiled_time * 1000:8.1f} ms  peak numpy {tiled_peak / 1e6:8.0f} MB"
+          f"  identical: {np.array_equal(full_out, tiled_out)}")
+
+    float_image = pipeline.to_float(image)
+    full_out = lut3d.render_stages(float_image, FLOAT_TILED_STAGES, toolbox)
+    tiled_out = tiled_render.render_tiled(float_image, FLOAT_TILED_STAGES, toolbox,
+                                          strip_pixels=int(args.strip_mp * 1e6))
+    diff = np.abs(full_out - tiled_out).max(axis=(1, 2))
+    print(f"  float32 tiled vs untiled (with clarity, dehaze): max |diff| {diff.max():.4f}"
+          f"  rows differing {int((diff > 1e-3).sum())}")
+
+
+MIXER_PANELS = {
+    "one channel": {"blue": {"hue_shift": -8, "sat_scale": 1.2, "lum_scale": 0.95}},
+    "all channels": {
+        ch: {"hue_shift": (-1) ** i * (i + 2), "sat_scale": 1.0 + 0.05 * i, "lum_scale": 1.05 - 0.02 * i}
+        for i, ch in enumerate(panel_program.MIXER_CHANNELS)
+    },
+}
+
+
+def legacy_color_mixer(image, **params):
+    """The per-channel mask loop adjust_color_mixer used before the hue table."""
+    h, l, s = cv2.split(cv2.cvtColor(image, cv2.COLOR_BGR2HLS))
+    ranges = {
+        channel: (h >= lo) | (h <= hi) if lo > hi else (h >= lo) & (h <= hi)
+        for channel, (lo, hi) in opencv_tools.MIXER_BANDS.items()
+    }
+    for channel, cfg in params.items():
+        mask = ranges[channel]
+        h_float = h.astype(np.float32)
+        h_float[mask] = (h_float[mask] + cfg.get("hue_shift", 0)) % 180
+        h = h_float.astype(np.uint8)
+        s_float = s.astype(np.float32)
+        s_float[mask] *= cfg.get("sat_scale", 1.0)
+        s = np.clip(s_float, 0, 255).astype(np.uint8)
+        l_float = l.astype(np.float32)
+        l_float[mask] *= cfg.get("lum_scale", 1.0)
+        l = np.clip(l_float, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(cv2.merge((h, l, s)), cv2.COLOR_HLS2BGR)
+
+
+def bench_mixer(args):
+    image = make_test_image(args.width, args.height)
+    print(f"Image: {args.width}x{args.height} ({args.width * args.height / 1e6:.1f} MP)")
+
+    for label, params in MIXER_PANELS.items():
+        legacy_time, legacy_out = _time(lambda: legacy_color_mixer(image, **params), args.repeat)
+        table_time, table_out = _time(lambda: opencv_tools.adjust_color_mixer(image, **params), args.repeat)
+        smooth_time, smooth_out = _time(
+            lambda: opencv_tools.adjust_color_mixer(image, **params, falloff=args.falloff), args.repeat)
+
+        print(f"\n[{label}]")
+        print(f"  legacy loop: {legacy_time * 1000:8.1f} ms")
+        for name, elapsed, out in (("hue table", table_time, table_out),
+                                   (f"falloff {args.falloff:g}", smooth_time, smooth_out)):
+            diff = np.abs(legacy_out.astype(np.int16) - out.astype(np.int16))
+            print(f"  {name + ':':12s} {elapsed * 1000:8.1f} ms  ({legacy_time / max(elapsed, 1e-9):.1f}x)"
+                  f"  mean |diff| {diff.mean():.2f}  p99 {np.percentile(diff, 99):.0f}  max |diff| {diff.max()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="photo_art_agent render benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    panel = sub.add_parser("panel", help="fused panel program and 3D LUT vs sequential safe_tools")
+    panel.add_argument("--width", type=int, default=6000)
+    panel.add_argument("--height", type=int, default=4000)
+    panel.add_argument("--repeat", type=int, default=3)
+    panel.set_defaults(func=bench_panel)
+
+    presets = sub.add_parser("presets", help="preset LUT bank vs reference apply_style_preset")
+    presets.add_argument("--width", type=int, default=6000)
+    presets.add_argument("--height", type=int, default=4000)
+    presets.add_argument("--repeat", type=int, default=3)
+    presets.add_argument("--style", action="append", help="limit to these styles")
+    presets.set_defaults(func=bench_presets)
+
+    handles = sub.add_parser("handles", help="on-device ImageHandle chain vs per-tool round trips")
+    handles.add_argument("--width", type=int, default=3000)
+    handles.add_argument("--height", type=int, default=2000)
+    handles.add_argument("--repeat", type=int, default=3)
+    handles.set_defaults(func=bench_handles)
+
+    tiled = sub.add_parser("tiled", help="peak memory of strip rendering vs whole-frame rendering")
+    tiled.add_argument("--width", type=int, default=8000)
+    tiled.add_argument("--height", type=int, default=6000)
+    tiled.add_argument("--strip-mp", type=float, default=tiled_render.STRIP_PIXELS / 1e6)
+    tiled.set_defaults(func=bench_tiled)
+
+    mixer = sub.add_parser("mixer", help="hue-table colour mixer vs the per-channel mask loop")
+    mixer.add_argument("--width", type=int, default=6000)
+    mixer.add_argument("--height", type=int, default=4000)
+    mixer.add_argument("--repeat", type=int, default=3)
+    mixer.add_argument("--falloff", type=float, default=4.0)
+    mixer.set_defaults(func=bench_mixer)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
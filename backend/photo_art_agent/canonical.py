@@ -0,0 +1,183 @@
+"""
+Canonical Params - one frozen, hashable form for every parameter dict
+=====================================================================
+clamp_params and normalize_tool_params accept many shapes for the same edit
+({"value": x} or a bare number, "preset" or "style", curve point lists), so
+two semantically identical panels rarely compare equal as raw dicts.
+canonicalize() runs them through pipeline.canonical_params, then freezes the
+result: dicts become key-sorted FrozenDicts, lists become tuples, floats are
+rounded to ROUND_DIGITS and tools are kept in pipeline order. The frozen
+object carries a fast digest that is the key for the render cache, the LUT
+caches and candidate de-duplication, and records which tools are no-ops.
+"""
+
+import hashlib
+from typing import Any, Dict, FrozenSet, Iterator, Optional, Tuple
+
+import numpy as np
+
+import panel_program
+import pipeline
+
+
+# Decimal places floats are rounded to; well below one 8-bit level for every tool.
+ROUND_DIGITS = 4
+
+
+class FrozenDict(tuple):
+    """A dict frozen to a key-sorted tuple of (key, value) pairs."""
+
+    def get(self, key, default=None):
+        for k, v in self:
+            if k == key:
+                return v
+        return default
+
+
+def _freeze(value: Any, out: list) -> Any:
+    # Builds the frozen value and, in the same pass, its encoding for digest().
+    # Ints and floats encode alike, so {"value": 10} and {"value": 10.0} agree.
+    kind = type(value)
+    if kind is float:
+        # + 0.0 turns -0.0 into 0.0
+        value = round(value, ROUND_DIGITS) + 0.0
+        out.append(repr(value))
+        return value
+    if kind is str:
+        out.append(repr(value))
+        return value
+    if kind is int:
+        out.append(repr(float(value)))
+        return value
+
+    if isinstance(value, FrozenDict):
+        items = value
+    elif isinstance(value, dict):
+        items = sorted((str(k), v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        out.append("[")
+        frozen = tuple([_freeze(v, out) for v in value])
+        out.append("]")
+        return frozen
+    elif isinstance(value, (bool, np.bool_)):
+        out.append("T" if value else "F")
+        return bool(value)
+    elif isinstance(value, (int, np.integer)):
+        return _freeze(int(value), out)
+    elif isinstance(value, (float, np.floating)):
+        return _freeze(float(value), out)
+    else:
+        out.append(repr(value))
+        return value
+
+    out.append("{")
+    frozen_items = []
+    for k, v in items:
+        out.append(k)
+        out.append(":")
+        frozen_items.append((k, _freeze(v, out)))
+    out.append("}")
+    return FrozenDict(frozen_items)
+
+
+def _hash(out: list) -> str:
+    return hashlib.blake2b(",".join(out).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def freeze(value: Any) -> Any:
+    """Immutable, hashable, order-stable copy of a params value."""
+    return _freeze(value, [])
+
+
+def thaw(value: Any) -> Any:
+    """Plain dicts and lists back from a frozen value (tuples stay tuples)."""
+    if isinstance(value, FrozenDict):
+        return {k: thaw(v) for k, v in value}
+    if isinstance(value, tuple):
+        return tuple(thaw(v) for v in value)
+    return value
+
+
+def digest(value: Any) -> str:
+    """128-bit BLAKE2b of a (frozen or plain) params value."""
+    out: list = []
+    _freeze(value, out)
+    return _hash(out)
+
+
+def is_noop(tool_name: str, params: Dict) -> bool:
+    """True when a tool with these (normalised) params leaves the image unchanged."""
+    params = params or {}
+    if tool_name in panel_program.FUSED_TOOLS:
+        return panel_program.is_identity(tool_name, params)
+    if tool_name == "apply_lut_color_grade":
+        return params.get("style", "neutral") == "neutral"
+    if tool_name == "apply_style_preset":
+        return params.get("style", "none") in ("", "none")
+
+    spec = pipeline.REGISTRY.get(tool_name)
+    if spec is None or not spec.strength:
+        return False
+    return all(float(params.get(key, default)) == 0.0 for key, default in spec.strength.items())
+
+
+class CanonicalParams:
+    """
+    A canonicalised parameter set: every basic tool plus the creative tools in
+    use, frozen and in pipeline order. Equal objects render equal images.
+    """
+
+    __slots__ = ("tools", "noops", "digest", "_hash")
+
+    def __init__(self, tools: Tuple[Tuple[str, FrozenDict], ...], digest: str):
+        self.tools = tools
+        self.noops: FrozenSet[str] = frozenset(
+            name for name, params in tools if is_noop(name, thaw(params)))
+        self.digest = digest
+        self._hash = hash(digest)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CanonicalParams) and self.digest == other.digest
+
+    def __contains__(self, tool_name: str) -> bool:
+        return any(name == tool_name for name, _ in self.tools)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _ in self.tools)
+
+    def __repr__(self) -> str:
+        return f"CanonicalParams({self.digest[:12]}, {len(self.tools)} tools, {len(self.noops)} no-ops)"
+
+    def get(self, tool_name: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        for name, params in self.tools:
+            if name == tool_name:
+                return thaw(params)
+        return default
+
+    def active(self) -> Dict[str, Dict]:
+        """Plain params of the tools that change the image, in pipeline order."""
+        return {name: thaw(params) for name, params in self.tools if name not in self.noops}
+
+    def as_dict(self) -> Dict[str, Dict]:
+        """Plain params of every tool, no-ops included."""
+        return {name: thaw(params) for name, params in self.tools}
+
+
+def canonicalize(params: Dict, sanitize: bool = True) -> CanonicalParams:
+    """
+    Canonical form of a raw parameter dict. With sanitize=False the params are
+    taken as already clamped and normalised (semantic editor).
+    """
+    if isinstance(params, CanonicalParams):
+        return params
+    canonical = pipeline.canonical_params(params, sanitize)
+    out: list = []
+    tools = []
+    for spec in pipeline.STAGES:
+        if spec.name in canonical:
+            out.append(spec.name)
+            tools.append((spec.name, _freeze(canonical[spec.name], out)))
+    return CanonicalParams(tuple(tools), _hash(out))
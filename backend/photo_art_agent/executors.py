@@ -0,0 +1,163 @@
+"""
+Executors - bounded worker pools for blocking work in the async API
+===================================================================
+The FastAPI endpoints are async, but panel renders, cv2 image I/O, volume
+commits and the VLM calls (OpenAI SDK plus Cloudinary upload) all block. Run
+inline they stall every other request the container is serving. Each kind of
+work instead runs on its own bounded thread pool, awaited from the event loop:
+
+- RENDER: CPU-heavy renders. numpy and OpenCV release the GIL, so threads
+  run them in parallel; the bound keeps concurrent renders (and their memory)
+  near the core count.
+- IO: image reads/writes, file hashing, volume commits.
+- MODEL: remote model calls, which mostly wait on the network.
+
+Pools are sized from the container's CPU quota (cpu_quota), not the host's
+core count. A pool with a queue_limit rejects work beyond it with
+PoolSaturated, which the API turns into a 503, so a burst of renders is
+shed instead of piling up behind the workers.
+
+Every pool counts queued and running jobs, the deepest queue seen and the
+time jobs spent waiting versus running, for /stats.
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+def _cgroup_cpus() -> Optional[float]:
+    # cgroup v2 ("max 100000" when unlimited), then v1.
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def cpu_quota() -> int:
+    """
+    CPUs this container may use: CPU_QUOTA (set from the Modal function's cpu
+    reservation) if given, else the cgroup quota or the CPU affinity mask.
+    os.cpu_count() alone reports the host's cores.
+    """
+    configured = os.getenv("CPU_QUOTA")
+    if configured:
+        return max(1, math.floor(float(configured)))
+    try:
+        cpus = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        cpus = float(os.cpu_count() or 1)
+    cgroup = _cgroup_cpus()
+    if cgroup:
+        cpus = min(cpus, cgroup)
+    return max(1, math.floor(cpus))
+
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(max(1, cpu_quota() // 2))))
+# Renders waiting for a worker beyond this are rejected (503).
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", "16"))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+# One per concurrent request the container accepts (allow_concurrent_inputs).
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", "10"))
+
+
+class PoolSaturated(RuntimeError):
+    """A pool's queue is at its queue_limit."""
+
+
+class Pool:
+    """A named ThreadPoolExecutor that records queue depth and wait/run times."""
+
+    def __init__(self, name: str, workers: int, queue_limit: int = 0):
+        self.name = name
+        self.workers = workers
+        # Jobs allowed to wait for a worker; 0 means unbounded.
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_ms = 0.0
+        self.run_ms = 0.0
+
+    def _call(self, submitted: float, fn: Callable, args, kwargs) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_ms += (started - submitted) * 1000
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += ok
+                self.failed += not ok
+                self.run_ms += (time.perf_counter() - started) * 1000
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool and await its result; PoolSaturated if the queue is full."""
+        with self._lock:
+            if self.queue_limit and self.queued - self._idle() >= self.queue_limit:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.name} pool is busy ({self.queued} queued)")
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        # Context variables (grain.reference) follow the job into the worker.
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, context.run, self._call, time.perf_counter(), fn, args, kwargs)
+
+    def _idle(self) -> int:
+        # Workers free to take a job right away; called with the lock held.
+        return max(0, self.workers - self.running)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            done = max(1, self.completed + self.failed)
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_ms / done, 2),
+                "avg_run_ms": round(self.run_ms / done, 2),
+            }
+
+
+RENDER = Pool("render", RENDER_WORKERS, RENDER_QUEUE_LIMIT)
+IO = Pool("io", IO_WORKERS)
+MODEL = Pool("model", MODEL_WORKERS)
+
+POOLS = {pool.name: pool for pool in (RENDER, IO, MODEL)}
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    return {name: pool.stats() for name, pool in POOLS.items()}
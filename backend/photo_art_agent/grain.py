@@ -0,0 +1,135 @@
+"""
+Grain - deterministic, seedable film grain from a bank of noise textures
+=========================================================================
+A small bank of Gaussian noise textures is generated once at import. Grain
+is read from a virtual field at a reference resolution (by default the
+image's own), made of TEXTURE_SIZE tiles; each tile shows one bank texture at
+an offset picked by the seed. A proxy rendered with the original's long edge
+as reference (see reference()) samples the same field, so its grain is a
+subsample of the full-resolution grain, and a given (shape, amount, size,
+seed) always renders byte-identical grain. Grain fields are cached.
+"""
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+import intermediate_cache
+
+
+TEXTURE_SIZE = 256
+TEXTURE_COUNT = 8
+BANK_SEED = 20240611
+
+# Pixels per band when adding grain to an image.
+BAND_PIXELS = 1_000_000
+
+# i.i.d. noise has no spatial correlation, so any tile layout is seamless.
+_BANK = np.random.default_rng(BANK_SEED).standard_normal(
+    (TEXTURE_COUNT, TEXTURE_SIZE, TEXTURE_SIZE)).astype(np.float16)
+
+_field_cache = intermediate_cache.IntermediateCache(
+    int(os.getenv("GRAIN_CACHE_MB", "128")) * 1024 * 1024)
+
+# Long edge of the frame the grain field is defined at; None means the image's own.
+_reference_edge: ContextVar[Optional[int]] = ContextVar("grain_reference_edge", default=None)
+
+
+@contextmanager
+def reference(edge: Optional[int]):
+    """Render grain inside the block as if the image had a long edge of `edge`."""
+    token = _reference_edge.set(int(edge) if edge else None)
+    try:
+        yield
+    finally:
+        _reference_edge.reset(token)
+
+
+def _tile_layout(seed: int, grid: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Texture index and (row, column) offset of every tile of the field."""
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, TEXTURE_COUNT, (grid, grid))
+    offsets = rng.integers(0, TEXTURE_SIZE, (2, grid, grid))
+    return index, offsets[0], offsets[1]
+
+
+def _reference_coords(count: int, long_edge: int, reference_edge: int) -> np.ndarray:
+    """Reference-field cell under each of `count` pixel centres."""
+    coords = (np.arange(count) + 0.5) * (reference_edge / long_edge)
+    return np.minimum(coords.astype(np.int64), reference_edge - 1)
+
+
+def noise_field(rows: int, cols: int, seed: int = 0, reference_edge: Optional[int] = None) -> np.ndarray:
+    """Unit-variance float16 noise for a rows x cols image."""
+    long_edge = max(rows, cols)
+    reference_edge = reference_edge or long_edge
+    ys = _reference_coords(rows, long_edge, reference_edge)
+    xs = _reference_coords(cols, long_edge, reference_edge)
+    grid = -(-reference_edge // TEXTURE_SIZE)
+    index, row_offset, col_offset = _tile_layout(seed, grid)
+    field = np.empty((rows, cols), dtype=np.float16)
+
+    # Pixels of one tile form a rectangle, since the mapping is monotonic.
+    y_bounds = np.searchsorted(ys // TEXTURE_SIZE, np.arange(grid + 1))
+    x_bounds = np.searchsorted(xs // TEXTURE_SIZE, np.arange(grid + 1))
+    for ty in range(grid):
+        y0, y1 = y_bounds[ty], y_bounds[ty + 1]
+        if y0 == y1:
+            continue
+        for tx in range(grid):
+            x0, x1 = x_bounds[tx], x_bounds[tx + 1]
+            if x0 == x1:
+                continue
+            texture = _BANK[index[ty, tx]]
+            tile_rows = (ys[y0:y1] + row_offset[ty, tx]) % TEXTURE_SIZE
+            tile_cols = (xs[x0:x1] + col_offset[ty, tx]) % TEXTURE_SIZE
+            field[y0:y1, x0:x1] = texture[np.ix_(tile_rows, tile_cols)]
+    return field
+
+
+def grain_field(rows: int, cols: int, size: int = 1, seed: int = 0,
+                reference_edge: Optional[int] = None) -> np.ndarray:
+    """Cached float16 grain for a rows x cols frame; size 2 gives 2-pixel grain."""
+    reference_edge = reference_edge or max(rows, cols)
+
+    def compute():
+        # Size 2 grain is noise at half the (reference) resolution, upsampled.
+        field = noise_field(max(1, rows // size), max(1, cols // size), seed,
+                            max(1, reference_edge // size))
+        if size > 1:
+            field = cv2.resize(field.astype(np.float32), (cols, rows),
+                               interpolation=cv2.INTER_LINEAR).astype(np.float16)
+        return field
+
+    return _field_cache.get_or_compute(f"{rows}x{cols}", "grain",
+                                       (int(size), int(seed), int(reference_edge)), compute)
+
+
+def apply(image: np.ndarray, amount: float, size: int = 1, seed: int = 0,
+          row_offset: int = 0, full_shape: Optional[Tuple[int, ...]] = None) -> np.ndarray:
+    """Add grain of standard deviation amount * 40 levels to a uint8 or float32 image."""
+    rows, cols = image.shape[:2]
+    full_rows, full_cols = full_shape[:2] if full_shape is not None else (rows, cols)
+    field = grain_field(full_rows, full_cols, size, seed, _reference_edge.get())
+    field = field[row_offset:row_offset + rows]
+
+    out = np.empty_like(image)
+    scale = np.float32(amount * 40)
+    band = max(1, BAND_PIXELS // cols)
+    for y in range(0, rows, band):
+        noise = field[y:y + band].astype(np.float32)
+        noise *= scale
+        chunk = image[y:y + band].astype(np.float32)
+        chunk += noise[:, :, np.newaxis] if image.ndim == 3 else noise
+        np.clip(chunk, 0, 255, out=chunk)
+        out[y:y + band] = chunk
+    return out
+
+
+def stats() -> dict:
+    """Hit/miss counters of the grain field cache."""
+    return _field_cache.stats()
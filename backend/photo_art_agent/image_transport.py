@@ -0,0 +1,146 @@
+"""
+Image Transport - how an image reaches the VLM: inline data URI or remote URL
+=============================================================================
+A VLM message can carry an image either as a URL the provider fetches or as
+a base64 data URI inside the request. For the small previews the agent
+sends (212 px wide, a few KB) the Cloudinary upload round trip costs far
+more than the bytes, so those go inline; large images are still uploaded
+and sent by URL, keeping request bodies small.
+
+Modes (IMAGE_TRANSPORT):
+- "auto":   inline when the image fits INLINE_MAX_BYTES, otherwise remote.
+- "inline": always inline, at the lowest quality if nothing fits.
+- "remote": always upload and send the URL (the old behaviour).
+
+An image already stored as JPEG/WebP/PNG within the budget is inlined
+byte for byte. Anything else is re-encoded in INLINE_FORMAT at the highest
+quality in QUALITIES that fits.
+"""
+
+import base64
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import cv2
+
+
+MODE = os.getenv("IMAGE_TRANSPORT", "auto")
+# Largest encoded image (before base64, which adds a third) sent inline.
+INLINE_MAX_BYTES = int(os.getenv("IMAGE_INLINE_MAX_BYTES", str(256 * 1024)))
+# "jpeg" or "webp" for re-encoded images.
+INLINE_FORMAT = os.getenv("IMAGE_INLINE_FORMAT", "jpeg")
+# Quality ladder tried from the top when re-encoding.
+QUALITIES = (90, 80, 70, 60, 50)
+# Remembered (path, size, mtime_ns, force) -> data URI entries.
+MEMO_ENTRIES = 256
+
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp", ".png": "image/png"}
+ENCODINGS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+_memo: "OrderedDict[Tuple, Optional[str]]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"inline": 0, "remote": 0, "reencoded": 0, "inline_bytes": 0, "failed": 0}
+
+
+def _count(**deltas: int):
+    with _lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+
+
+def _data_uri(mime: str, data: bytes) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def encode_inline(path: str, max_bytes: int = INLINE_MAX_BYTES,
+                  force: bool = False) -> Optional[Tuple[str, int]]:
+    """
+    (data URI, encoded size) for the image at path, or None if it cannot be
+    read or, unless force, does not fit max_bytes at any quality.
+    """
+    size = os.path.getsize(path)
+    mime = MIME_TYPES.get(os.path.splitext(path)[1].lower())
+    if mime and size <= max_bytes:
+        with open(path, "rb") as f:
+            data = f.read()
+        return _data_uri(mime, data), len(data)
+
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    ext, mime, flag = ENCODINGS.get(INLINE_FORMAT, ENCODINGS["jpeg"])
+    data = None
+    for quality in QUALITIES:
+        ok, buf = cv2.imencode(ext, image, [flag, quality])
+        if not ok:
+            return None
+        data = buf.tobytes()
+        if len(data) <= max_bytes:
+            break
+    else:
+        if not force:
+            return None
+    _count(reencoded=1)
+    return _data_uri(mime, data), len(data)
+
+
+def _inline(path: str, force: bool) -> Optional[str]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_size, stat.st_mtime_ns, force)
+    with _lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            uri = _memo[key]
+            if uri:
+                _stats["inline"] += 1
+                _stats["inline_bytes"] += len(uri)
+            return uri
+
+    encoded = encode_inline(path, force=force)
+    uri = encoded[0] if encoded else None
+    with _lock:
+        _memo[key] = uri
+        while len(_memo) > MEMO_ENTRIES:
+            _memo.popitem(last=False)
+        if uri:
+            _stats["inline"] += 1
+            _stats["inline_bytes"] += len(uri)
+    return uri
+
+
+def image_url(path: str, upload: Callable[[str], Optional[str]],
+              mode: Optional[str] = None) -> Optional[str]:
+    """
+    URL for an image_url message part: a data URI or the URL returned by
+    upload(path). None if the image could not be sent either way.
+    """
+    mode = mode or MODE
+    if mode != "remote":
+        uri = _inline(path, force=mode == "inline")
+        if uri:
+            return uri
+
+    url = upload(path)
+    if url and url.startswith("http"):
+        _count(remote=1)
+        return url
+    _count(failed=1)
+    return None
+
+
+def is_image_url(url: Optional[str]) -> bool:
+    """Whether url can be sent to the model (remote URL or data URI)."""
+    return bool(url) and url.startswith(("http", "data:"))
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {"mode": MODE, "inline_max_bytes": INLINE_MAX_BYTES, **_stats}
@@ -0,0 +1,103 @@
+"""
+Intermediate Cache - content-addressed cache for spatial-effect intermediates
+=============================================================================
+apply_glow, apply_orton_effect, apply_clarity and apply_dehaze spend nearly
+all their time in large Gaussian blurs or CLAHE that depend only on the input
+image and a kernel size, not on the blend amount. Those intermediates are
+cached here keyed by (image digest, operation, parameters) in an LRU bounded
+by total bytes, so moving an intensity/blend slider on the same base image
+only redoes the blend.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+import numpy as np
+
+
+MAX_BYTES = int(os.getenv("INTERMEDIATE_CACHE_MB", "512")) * 1024 * 1024
+
+CacheKey = Tuple[str, str, Hashable]
+
+
+def image_digest(image: np.ndarray) -> str:
+    """Content hash of an array (shape, dtype and pixels)."""
+    h = hashlib.sha1(f"{image.shape}{image.dtype}".encode("utf-8"))
+    h.update(np.ascontiguousarray(image).data)
+    return h.hexdigest()
+
+
+class IntermediateCache:
+    """Thread-safe LRU of read-only numpy arrays, bounded by total nbytes."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, digest: str, op: str, params: Hashable,
+                       compute: Callable[[], np.ndarray]) -> np.ndarray:
+        key = (digest, op, params)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = compute()
+        # Shared between callers, so it must never be modified in place.
+        value.flags.writeable = False
+        self._put(key, value)
+        return value
+
+    def _put(self, key: CacheKey, value: np.ndarray):
+        if value.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = value
+            self._bytes += value.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = IntermediateCache()
+
+
+def cached(digest: str, op: str, params: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+    """Return the cached intermediate for (digest, op, params), computing it on a miss."""
+    return _cache.get_or_compute(digest, op, params, compute)
+
+
+def stats() -> Dict[str, int]:
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
@@ -0,0 +1,430 @@
+"""
+3D LUT baking for the per-pixel colour tools
+============================================
+A chain of pure per-pixel colour tools is evaluated once on an N x N x N BGR
+lattice and then applied to the full image with a single trilinear lookup,
+instead of running every tool over every pixel.
+
+Spatial tools (vignette, glow, grain, clarity, dehaze, orton) cannot be baked;
+render_stages() runs them as-is between the baked colour segments. Style
+presets with spatial steps are served from the on-disk bank in preset_bank.
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+import canonical
+import opencv_tools
+import panel_program
+import pipeline
+
+
+DEFAULT_SIZE = 33
+LUT_CACHE_SIZE = 64
+
+# Below this many pixels it is cheaper to run the tools than to bake a LUT.
+LUT_MIN_PIXELS = 250_000
+
+# Pixels per band in Lut3D.apply / apply_luts, sized so the gathers stay in cache.
+BAND_PIXELS = 65_536
+
+# Tools that are pure functions of the pixel colour (CPU implementations): the
+# pointwise panel stages plus the tools only style presets use.
+POINTWISE_TOOLS = pipeline.tools_of_kind("pointwise") | {
+    "apply_grayscale",
+    "apply_mono_blend",
+    "apply_shadow_tint",
+    "apply_red_boost",
+}
+
+# Pointwise tools that map each channel independently; a run of them is a
+# 256-entry per-channel curve and needs no 3D lattice.
+SEPARABLE_TOOLS = {
+    "adjust_exposure",
+    "adjust_contrast",
+    "apply_color_overlay",
+    "apply_curves",
+    "apply_haze",
+    "apply_film_fade",
+    "apply_red_boost",
+}
+
+# Tools whose output depends only on the grey level; everything pointwise after
+# them sees a grey image, so the whole run is a curve on the grey level.
+MONO_TOOLS = {"apply_grayscale", "apply_duotone"}
+
+POINTWISE_LUT_GRADES = {"neutral", "warm_contrast", "cool_matte", "faded_pastel"}
+
+Stage = Tuple[str, Dict[str, Any]]
+
+
+def is_pointwise(tool_name: str, params: Dict) -> bool:
+    """True when a (normalised) tool call can be baked into a colour LUT."""
+    if tool_name == "panel" or tool_name in POINTWISE_TOOLS:
+        return True
+    if tool_name == "apply_lut_color_grade":
+        return params.get("style", "neutral") in POINTWISE_LUT_GRADES
+    if tool_name == "apply_style_preset":
+        steps = opencv_tools.preset_steps(params.get("style", "none"))
+        return all(is_pointwise(name, step_params) for name, step_params in steps)
+    return False
+
+
+class Lut3D:
+    """A baked BGR -> BGR colour transform on a size^3 lattice."""
+
+    def __init__(self, table: np.ndarray, key: str = ""):
+        self.table = np.ascontiguousarray(table, dtype=np.float32)
+        self.size = table.shape[0]
+        self.key = key
+
+        # Lattice coordinate of every uint8 level, and the b-slice it falls in.
+        pos = np.arange(256, dtype=np.float32) * np.float32((self.size - 1) / 255.0)
+        self._pos = np.minimum(pos, self.size - 1).astype(np.float32)
+        self._slice = np.minimum(self._pos.astype(np.int32), self.size - 2)
+        self._slice_row = (self._slice * self.size).astype(np.float32)
+        self._slice_frac = (self._pos - self._slice).astype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    @property
+    def label(self) -> str:
+        return f"LUT {self.size}^3"
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        """
+        Apply the LUT to a BGR image with trilinear interpolation: uint8 in,
+        rounded uint8 out; float32 (0-255) in, unquantised float32 out.
+        """
+        return _apply_lattice_luts(image, [self])[0]
+
+    def _float_maps(self, b: np.ndarray, g: np.ndarray, r: np.ndarray):
+        """Lattice remap coordinates for float32 channels (the uint8 tables, unrounded)."""
+        top = np.float32(self.size - 1)
+        scale = np.float32((self.size - 1) / 255.0)
+        pos_b = np.clip(b * scale, 0, top)
+        slice_b = np.minimum(np.floor(pos_b), top - 1)
+        map_x = np.clip(r * scale, 0, top)
+        map_lo = np.clip(g * scale, 0, top) + slice_b * np.float32(self.size)
+        return map_x, map_lo, (pos_b - slice_b)
+
+
+def _apply_lattice_luts(image: np.ndarray, luts: List[Lut3D]) -> List[np.ndarray]:
+    """Apply same-size Lut3Ds to one image, computing the lattice maps once per band."""
+    ref = luts[0]
+    n = ref.size
+    quantise = image.dtype == np.uint8
+    # b-slices stacked vertically: row = b * n + g, column = r. Trilinear
+    # is then two bilinear cv2.remap lookups (slices b0, b0 + 1) and a lerp.
+    slices = [lut.table.reshape(n * n, n, 3) for lut in luts]
+    outs = [np.empty_like(image) for _ in luts]
+    rows = max(1, BAND_PIXELS // max(1, image.shape[1]))
+
+    for y in range(0, image.shape[0], rows):
+        b, g, r = cv2.split(image[y:y + rows])
+        if quantise:
+            map_x = ref._pos[r]
+            map_lo = ref._pos[g] + ref._slice_row[b]
+            frac = ref._slice_frac[b]
+        else:
+            map_x, map_lo, frac = ref._float_maps(b, g, r)
+        map_hi = map_lo + n
+        frac = frac[:, :, None]
+
+        for table, out in zip(slices, outs):
+            lo = cv2.remap(table, map_x, map_lo, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            hi = cv2.remap(table, map_x, map_hi, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+            hi -= lo
+            hi *= frac
+            hi += lo
+            if quantise:
+                hi += 0.5
+            np.clip(hi, 0, 255, out=hi)
+            out[y:y + rows] = hi
+    return outs
+
+
+def _apply_lattice_luts_torch(image: np.ndarray, luts: List[Lut3D]) -> List[np.ndarray]:
+    """Apply same-size Lut3Ds as one batched trilinear grid_sample on DEVICE."""
+    device = opencv_tools.DEVICE
+    # (N, b, g, r, 3) -> (N, C, D=b, H=g, W=r); grid coordinates are (x=r, y=g, z=b).
+    tables = torch.from_numpy(np.stack([np.asarray(lut.table) for lut in luts])).to(device)
+    tables = tables.permute(0, 4, 1, 2, 3)
+    coords = torch.from_numpy(image).to(device).float() * (2.0 / 255.0) - 1.0
+    grid = coords.flip(-1)[None, None].expand(len(luts), 1, *coords.shape)
+
+    out = F.grid_sample(tables, grid, mode="bilinear", align_corners=True)
+    out = out[:, :, 0].permute(0, 2, 3, 1).add_(0.5).clamp_(0, 255).to(torch.uint8)
+    return list(out.cpu().numpy())
+
+
+def apply_luts(image: np.ndarray, luts: List) -> List[np.ndarray]:
+    """
+    Apply several LUTs to the same image. Lut3Ds of one size share the
+    per-pixel lattice lookup, or run as one stacked tensor with USE_HANDLES.
+    """
+    lattice_luts = [lut for lut in luts if isinstance(lut, Lut3D)]
+    if len(lattice_luts) < 2 or len({lut.size for lut in lattice_luts}) != 1:
+        return [lut.apply(image) for lut in luts]
+
+    if opencv_tools.USE_HANDLES and image.dtype == np.uint8:
+        lattice_outs = iter(_apply_lattice_luts_torch(image, lattice_luts))
+    else:
+        lattice_outs = iter(_apply_lattice_luts(image, lattice_luts))
+    return [next(lattice_outs) if isinstance(lut, Lut3D) else lut.apply(image) for lut in luts]
+
+
+class Lut1D:
+    """Per-channel 256-entry curves, optionally driven by the grey level only."""
+
+    size = 256
+
+    def __init__(self, table: np.ndarray, mono: bool = False, key: str = ""):
+        self.table = np.ascontiguousarray(table, dtype=np.uint8).reshape(256, 1, 3)
+        self.mono = mono
+        self.key = key
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+    @property
+    def label(self) -> str:
+        return "curve (grey)" if self.mono else "curve"
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        if self.mono:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        if image.dtype == np.uint8:
+            return cv2.LUT(image, self.table)
+
+        # Float input: interpolate linearly between the 256 curve entries.
+        table = self.table.reshape(256, 3).astype(np.float32)
+        x = np.clip(image, 0, 255)
+        index = np.minimum(x.astype(np.int32), 254)
+        frac = x - index
+        out = np.empty_like(x)
+        for c in range(3):
+            lo = table[index[..., c], c]
+            hi = table[index[..., c] + 1, c]
+            out[..., c] = lo + (hi - lo) * frac[..., c]
+        return out
+
+
+def lut_kind(stages: List[Stage]) -> str:
+    """'mono', 'separable' or '3d': the cheapest LUT that represents the stages."""
+    if stages and stages[0][0] in MONO_TOOLS:
+        return "mono"
+    if all(tool_name in SEPARABLE_TOOLS for tool_name, _ in stages):
+        return "separable"
+    return "3d"
+
+
+def bake_curve(stages: List[Stage]) -> np.ndarray:
+    """Evaluate mono/separable stages on a grey ramp: a (256, 1, 3) uint8 table."""
+    ramp = np.repeat(np.arange(256, dtype=np.uint8).reshape(256, 1, 1), 3, axis=2)
+    return _to_uint8(run_stages(ramp, stages, _default_toolbox()))
+
+
+def lattice(size: int = DEFAULT_SIZE) -> np.ndarray:
+    """The size^3 BGR lattice as a float32 (size*size, size, 3) image, b slowest."""
+    nodes = np.linspace(0.0, 255.0, size, dtype=np.float32)
+    b, g, r = np.meshgrid(nodes, nodes, nodes, indexing="ij")
+    return np.stack([b, g, r], axis=-1).reshape(size * size, size, 3)
+
+
+def bake_lut(render_fn: Callable[[np.ndarray], np.ndarray], size: int = DEFAULT_SIZE, key: str = "") -> Lut3D:
+    """Bake render_fn (float32 BGR 0-255 in, float32 or uint8 BGR out) into a Lut3D."""
+    out = render_fn(lattice(size))
+    return Lut3D(np.asarray(out, dtype=np.float32).reshape(size, size, size, 3), key=key)
+
+
+def _to_uint8(img: np.ndarray) -> np.ndarray:
+    if img.dtype == np.uint8:
+        return img
+    return np.clip(img + 0.5, 0, 255).astype(np.uint8)
+
+
+def run_tool(tool: Callable, tool_name: str, image: np.ndarray, **params) -> np.ndarray:
+    """
+    Run a spatial tool on a uint8 or float32 image and return the same dtype.
+    Tools without a float path (opencv_tools.FLOAT_TOOLS) see a rounded copy.
+    """
+    if image.dtype == np.uint8 or tool_name in opencv_tools.FLOAT_TOOLS:
+        return tool(image, **params)
+
+    import preset_bank
+    if tool is preset_bank.apply_preset:
+        return tool(image, **params)
+    print(f"  ✗ {tool_name} has no float path, rounding to 8 bits for it")
+    return tool(_to_uint8(image), **params).astype(np.float32)
+
+
+def run_stages(image: np.ndarray, stages: List[Stage], toolbox: Dict[str, Callable]) -> np.ndarray:
+    """
+    Run stages directly; 'panel' stages go through the fused panel program.
+    With opencv_tools.USE_HANDLES, runs of HANDLE_TOOLS share one on-device
+    ImageHandle and are only brought back to uint8 BGR where a CPU tool needs it.
+    """
+    img = image
+    for tool_name, params in stages:
+        if tool_name == "panel":
+            img = panel_program.compile_panel(params).run(_to_uint8(opencv_tools.as_bgr(img)))
+        elif opencv_tools.USE_HANDLES and tool_name in opencv_tools.HANDLE_TOOLS:
+            if not isinstance(img, opencv_tools.ImageHandle):
+                img = opencv_tools.ImageHandle.from_bgr(_to_uint8(img))
+            img = toolbox[tool_name](img, **params)
+        else:
+            img = toolbox[tool_name](_to_uint8(opencv_tools.as_bgr(img)), **params)
+    return opencv_tools.as_bgr(img)
+
+
+def _stages_key(stages: List[Stage]) -> tuple:
+    """Frozen, hashable form of a stage list (see canonical.freeze)."""
+    return canonical.freeze([list(stage) for stage in stages])
+
+
+@lru_cache(maxsize=LUT_CACHE_SIZE)
+def _compile_cached(frozen: tuple, size: int):
+    stages = [tuple(stage) for stage in canonical.thaw(frozen)]
+    key = canonical.digest(frozen)
+    kind = lut_kind(stages)
+    if kind != "3d":
+        return Lut1D(bake_curve(stages), mono=kind == "mono", key=key)
+
+    def render(grid):
+        img = grid
+        # The first panel stage sees the exact lattice values in float.
+        if stages and stages[0][0] == "panel":
+            img = panel_program.compile_panel(stages[0][1]).run_float(grid.copy())
+            return run_stages(img, stages[1:], _default_toolbox())
+        return run_stages(np.rint(img), stages, _default_toolbox())
+
+    return bake_lut(render, size=size, key=key)
+
+
+def _default_toolbox() -> Dict[str, Callable]:
+    return {name: getattr(opencv_tools, name) for name in dir(opencv_tools)
+            if name.startswith(("adjust_", "apply_"))}
+
+
+def compile_stages(stages: List[Stage], size: int = DEFAULT_SIZE):
+    """Bake pointwise (tool_name, params) stages into a cached Lut1D or Lut3D."""
+    for tool_name, params in stages:
+        if not is_pointwise(tool_name, params):
+            raise ValueError(f"{tool_name} is a spatial tool and cannot be baked into a LUT")
+    return _compile_cached(_stages_key(stages), size)
+
+
+def compile_lut(spec, size: int = DEFAULT_SIZE):
+    """
+    Compile a colour LUT from a preset name or a params dict.
+    A params dict may hold clamped basic-panel values plus normalised
+    pointwise creative tools (apply_split_toning, apply_curves, ...).
+    """
+    if isinstance(spec, str):
+        return compile_stages([("apply_style_preset", {"style": opencv_tools.preset_name(spec)})], size)
+
+    basic = {k: v for k, v in spec.items() if k in panel_program.BASIC_TOOLS}
+    stages: List[Stage] = [("panel", basic)] if basic else []
+    stages += [(k, v) for k, v in spec.items() if k not in panel_program.BASIC_TOOLS]
+    return compile_stages(stages, size)
+
+
+def cache_info():
+    return _compile_cached.cache_info()
+
+
+def render_stages(image: np.ndarray, stages: List[Stage], toolbox: Dict[str, Callable],
+                  size: int = DEFAULT_SIZE, use_lut: bool = True) -> np.ndarray:
+    """
+    Render stages, baking each contiguous run of pointwise stages into one LUT
+    lookup. Spatial stages run directly on the image between LUT segments.
+    float32 images always go through the LUTs, which interpolate without
+    rounding, and come back as float32.
+    """
+    dtype = image.dtype
+    use_lut = dtype != np.uint8 or (use_lut and image.shape[0] * image.shape[1] >= LUT_MIN_PIXELS)
+    img = image
+    segment: List[Stage] = []
+
+    def flush(img):
+        if not segment:
+            return img
+        names = [name for name, _ in segment]
+        try:
+            if use_lut:
+                lut = compile_stages(list(segment), size)
+                print(f"  🎨 {lut.label} for {names}")
+                img = lut.apply(img)
+            else:
+                img = _to_uint8(run_stages(img, segment, toolbox))
+        except Exception as e:
+            print(f"  ✗ ERROR baking {names}: {e}, applying tools one by one")
+            for tool_name, params in segment:
+                try:
+                    img = _to_uint8(run_stages(img, [(tool_name, params)], toolbox)).astype(dtype)
+                except Exception as e:
+                    print(f"  ✗ ERROR applying {tool_name}: {e}")
+        segment.clear()
+        return img
+
+    for tool_name, params in stages:
+        if is_pointwise(tool_name, params):
+            segment.append((tool_name, params))
+            continue
+        img = flush(img)
+        try:
+            print(f"  ✓ Applying {tool_name}: {params}")
+            img = run_tool(toolbox[tool_name], tool_name, img, **params)
+        except Exception as e:
+            print(f"  ✗ ERROR applying {tool_name}: {e}")
+
+    return flush(img)
+
+
+def render_batch(image: np.ndarray, candidates: List[List[Stage]], toolbox: Dict[str, Callable],
+                 size: int = DEFAULT_SIZE) -> List[np.ndarray]:
+    """
+    Render several stage lists over the same image. Each candidate's leading
+    pointwise stages are baked to a LUT and all of them are applied in one
+    shared lookup pass; the remaining stages render per candidate.
+    Identical candidates are rendered once.
+    """
+    keys = [_stages_key(stages) for stages in candidates]
+    unique = list(dict.fromkeys(keys))
+    by_key = dict(zip(keys, candidates))
+
+    if image.shape[0] * image.shape[1] < LUT_MIN_PIXELS:
+        rendered = {key: render_stages(image, by_key[key], toolbox, size) for key in unique}
+        return [rendered[key] for key in keys]
+
+    heads, tails = {}, {}
+    for key in unique:
+        stages = by_key[key]
+        split = next((i for i, (name, params) in enumerate(stages) if not is_pointwise(name, params)), len(stages))
+        heads[key], tails[key] = stages[:split], stages[split:]
+
+    baked = [key for key in unique if heads[key]]
+    try:
+        luts = [compile_stages(heads[key], size) for key in baked]
+        print(f"  🎨 Batch: {len(luts)} LUTs applied in one pass for {len(unique)} candidates")
+        head_outs = dict(zip(baked, apply_luts(image, luts)))
+    except Exception as e:
+        print(f"  ✗ ERROR in batched LUT pass: {e}, rendering candidates one by one")
+        rendered = {key: render_stages(image, by_key[key], toolbox, size) for key in unique}
+        return [rendered[key] for key in keys]
+
+    rendered = {}
+    for key in unique:
+        out = head_outs.get(key, image)
+        rendered[key] = render_stages(out, tails[key], toolbox, size) if tails[key] else out
+    return [rendered[key] for key in keys]
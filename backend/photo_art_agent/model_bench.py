@@ -0,0 +1,189 @@
+"""
+Model client benchmark - model_client.ModelClient against a local stub server.
+
+Starts a stand-in for an OpenAI-compatible chat completions API on localhost
+and points ModelClient at it (as MODEL_BASE_URL would), so retries, limits
+and stats are checked offline. The stub picks its behaviour from the
+request's model name:
+
+- "ok":         answers after --latency seconds;
+- "flaky":      503 twice, then answers; the call succeeds after 2 retries;
+- "down":       always 503; the call fails after MAX_RETRIES retries;
+- "rate-limit": 429 with Retry-After once, then answers no sooner than that;
+- "slow":       answers after several seconds, past the call's deadline.
+
+It also checks that the per-endpoint concurrency cap holds (the stub never
+sees more requests at once than --concurrency), that a call queued past its
+deadline raises TimeoutError, and that stats() histograms count every attempt.
+
+Usage:
+    python model_bench.py [--latency 0.2 --concurrency 2 --calls 6 --retry-after 1]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+
+import model_client
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    """Answers chat completions, failing or stalling as the model name asks."""
+
+    latency = 0.2
+    retry_after = 1.0
+    slow_s = 3.0
+    calls = {}
+    # Per model, so a stalled "slow" request does not count against the others.
+    in_flight = {}
+    max_in_flight = {}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "ok")
+        with StubModelHandler.lock:
+            count = StubModelHandler.calls.get(model, 0)
+            StubModelHandler.calls[model] = count + 1
+            in_flight = StubModelHandler.in_flight.get(model, 0) + 1
+            StubModelHandler.in_flight[model] = in_flight
+            StubModelHandler.max_in_flight[model] = max(
+                StubModelHandler.max_in_flight.get(model, 0), in_flight)
+        try:
+            if model == "down" or (model == "flaky" and count < 2):
+                self._send(503, {"error": {"message": "stub unavailable"}})
+            elif model == "rate-limit" and count == 0:
+                self._send(429, {"error": {"message": "stub rate limit"}},
+                           {"Retry-After": str(self.retry_after)})
+            else:
+                time.sleep(self.slow_s if model == "slow" else self.latency)
+                self._send(200, {
+                    "id": f"stub-{count}", "object": "chat.completion", "created": 0, "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "ok"}}],
+                })
+        finally:
+            with StubModelHandler.lock:
+                StubModelHandler.in_flight[model] -= 1
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+        except OSError:
+            # The client gave up on a slow answer.
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def chat(client, model, **kwargs):
+    return client.call("chat.completions", model=model,
+                       messages=[{"role": "user", "content": "hi"}], **kwargs)
+
+
+async def run_checks(base_url, args):
+    checks = []
+
+    def check(name, ok, detail):
+        checks.append(ok)
+        print(f"  {'✓' if ok else '✗'} {name:<12} {detail}")
+
+    client = model_client.ModelClient(base_url, "stub-key", concurrency=args.concurrency)
+
+    start = time.perf_counter()
+    result = await chat(client, "flaky")
+    stats = client.stats()["endpoints"]["chat.completions"]
+    check("flaky 503", result.choices[0].message.content == "ok" and stats["retries"] == 2,
+          f"{stats['retries']} retries, {time.perf_counter() - start:.2f} s")
+
+    retries = stats["retries"]
+    try:
+        await chat(client, "down")
+        failed = None
+    except openai.APIStatusError as e:
+        failed = e.status_code
+    stats = client.stats()["endpoints"]["chat.completions"]
+    check("down 503", failed == 503 and stats["retries"] - retries == client.max_retries
+          and stats["failures"] == 1,
+          f"status {failed}, {stats['retries'] - retries} retries, {stats['failures']} failures")
+
+    start = time.perf_counter()
+    await chat(client, "rate-limit")
+    waited = time.perf_counter() - start
+    check("429", waited >= args.retry_after,
+          f"answered after {waited:.2f} s (Retry-After {args.retry_after:.1f} s)")
+
+    deadline = StubModelHandler.slow_s / 3
+    start = time.perf_counter()
+    try:
+        await chat(client, "slow", deadline_s=deadline)
+        error = None
+    except Exception as e:
+        error = type(e).__name__
+    elapsed = time.perf_counter() - start
+    check("slow", error is not None and elapsed < deadline + 0.5,
+          f"{error} after {elapsed:.2f} s (deadline {deadline:.1f} s)")
+
+    StubModelHandler.max_in_flight["ok"] = 0
+    start = time.perf_counter()
+    await asyncio.gather(*[chat(client, "ok") for _ in range(args.calls)])
+    elapsed = time.perf_counter() - start
+    waves = -(-args.calls // args.concurrency)
+    peak = StubModelHandler.max_in_flight["ok"]
+    check("concurrency", peak <= args.concurrency and elapsed >= waves * args.latency,
+          f"{args.calls} calls, at most {peak} at once, {elapsed:.2f} s")
+
+    # Calls behind a full semaphore spend their deadline waiting for a slot.
+    queued = model_client.ModelClient(base_url, "stub-key", concurrency=1)
+    results = await asyncio.gather(chat(queued, "ok"),
+                                   chat(queued, "ok", deadline_s=args.latency / 2),
+                                   return_exceptions=True)
+    check("deadline", not isinstance(results[0], Exception) and isinstance(results[1], TimeoutError),
+          f"queued call raised {type(results[1]).__name__}")
+
+    stats = client.stats()["endpoints"]["chat.completions"]
+    bucketed = sum(stats["latency_ms"].values())
+    check("histogram", bucketed == stats["attempts"] and stats["in_flight"] == 0,
+          f"{stats['attempts']} attempts, {bucketed} in buckets, avg {stats['avg_attempt_ms']} ms")
+    return checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="model client against a local stub server")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per stub answer")
+    parser.add_argument("--concurrency", type=int, default=2, help="client limit per endpoint")
+    parser.add_argument("--calls", type=int, default=6, help="concurrent calls for the limit check")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of the 429")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubModelHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubModelHandler.latency = args.latency
+    StubModelHandler.retry_after = args.retry_after
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    print(f"Stub model server on :{server.server_port}, {args.latency:.2f}s per answer, "
+          f"concurrency {args.concurrency}, max retries {model_client.MAX_RETRIES}")
+    checks = asyncio.run(run_checks(base_url, args))
+    failures = checks.count(False)
+    print(f"{sum(StubModelHandler.calls.values())} stub requests, {failures} failed checks")
+    server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Model Client - shared, pooled, retrying client for OpenAI-compatible model APIs
+===============================================================================
+openrouter_agent, semantic_editor and match_art_style all talk to OpenRouter.
+They share one ModelClient per (base URL, API key, headers) from get_client():
+
+- One httpx connection pool (HTTP/2 when h2 is installed) with keep-alive,
+  so calls reuse warm TLS connections instead of opening their own.
+- Retries of transient failures (connection errors, timeouts, 408/409/429,
+  5xx) with full-jitter exponential backoff, bounded by a per-call deadline;
+  a Retry-After from the server is honoured within that deadline.
+- A concurrency limit per endpoint ("chat.completions", "responses"), so a
+  burst of sessions queues here instead of tripping provider rate limits.
+- Latency histograms and retry/failure counts per endpoint, for /stats.
+
+The AsyncOpenAI client runs on one event loop owned by the ModelClient (a
+daemon thread), so its pool is usable from any thread or loop: async code
+awaits call(), worker threads use call_sync().
+"""
+
+import asyncio
+import importlib.util
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+
+# OpenRouter by default; point at a local OpenAI-compatible mock to test.
+BASE_URL = os.getenv("MODEL_BASE_URL", "https://openrouter.ai/api/v1")
+# In-flight requests per endpoint; further calls wait their turn.
+CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "8"))
+MAX_CONNECTIONS = int(os.getenv("MODEL_MAX_CONNECTIONS", "32"))
+KEEPALIVE_S = 90.0
+MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "3"))
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 8.0
+# Whole call, retries included.
+DEADLINE_S = float(os.getenv("MODEL_DEADLINE_S", "120"))
+# One attempt; the remaining deadline caps it further.
+ATTEMPT_TIMEOUT_S = float(os.getenv("MODEL_ATTEMPT_TIMEOUT_S", "60"))
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+RETRY_STATUSES = {408, 409, 429}
+# Upper bounds (ms) of the latency histogram buckets; the last one is open.
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRY_STATUSES or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.latency_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms: float):
+        self.attempts += 1
+        self.latency_ms += elapsed_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "avg_attempt_ms": round(self.latency_ms / max(1, self.attempts), 2),
+            "latency_ms": dict(zip(labels, self.buckets)),
+        }
+
+
+class ModelClient:
+    """An AsyncOpenAI client on its own event loop, with retries, limits and stats."""
+
+    def __init__(self, base_url: str = BASE_URL, api_key: Optional[str] = None,
+                 default_headers: Optional[Dict[str, str]] = None,
+                 concurrency: int = CONCURRENCY, max_retries: int = MAX_RETRIES):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _EndpointStats] = {}
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="model-client", daemon=True).start()
+        http_client = httpx.AsyncClient(
+            http2=HTTP2,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_CONNECTIONS,
+                                keepalive_expiry=KEEPALIVE_S),
+            timeout=httpx.Timeout(ATTEMPT_TIMEOUT_S, connect=10.0),
+        )
+        # Retries are done here, with the deadline; the SDK's own are off.
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key,
+                                  default_headers=default_headers, http_client=http_client,
+                                  max_retries=0)
+
+    def _endpoint(self, endpoint: str) -> Tuple[_EndpointStats, asyncio.Semaphore]:
+        with self._lock:
+            if endpoint not in self._stats:
+                self._stats[endpoint] = _EndpointStats()
+                self._limits[endpoint] = asyncio.Semaphore(self.concurrency)
+            return self._stats[endpoint], self._limits[endpoint]
+
+    def _count(self, stats: _EndpointStats, **deltas: int):
+        with self._lock:
+            for key, delta in deltas.items():
+                setattr(stats, key, getattr(stats, key) + delta)
+
+    def _record(self, stats: _EndpointStats, started: float):
+        with self._lock:
+            stats.record((time.perf_counter() - started) * 1000)
+
+    async def _call(self, endpoint: str, deadline_s: float, kwargs: Dict[str, Any]) -> Any:
+        method = self.client
+        for name in endpoint.split("."):
+            method = getattr(method, name)
+        stats, limit = self._endpoint(endpoint)
+        self._count(stats, calls=1)
+        deadline = time.monotonic() + deadline_s
+
+        async with limit:
+            self._count(stats, in_flight=1)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"{endpoint} deadline of {deadline_s:.0f}s exceeded")
+                    started = time.perf_counter()
+                    try:
+                        result = await method(**kwargs, timeout=min(ATTEMPT_TIMEOUT_S, remaining))
+                    except Exception as e:
+                        self._record(stats, started)
+                        if not _retryable(e) or attempt == self.max_retries:
+                            raise
+                        backoff = random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+                        delay = max(backoff, _retry_after(e) or 0.0)
+                        if time.monotonic() + delay >= deadline:
+                            raise
+                        print(f"  ⚠️ {endpoint} attempt {attempt + 1} failed ({type(e).__name__}), "
+                              f"retrying in {delay:.2f}s")
+                        self._count(stats, retries=1)
+                        await asyncio.sleep(delay)
+                        continue
+                    self._record(stats, started)
+                    return result
+            except Exception:
+                self._count(stats, failures=1)
+                raise
+            finally:
+                self._count(stats, in_flight=-1)
+
+    async def call(self, endpoint: str, deadline_s: float = DEADLINE_S, **kwargs) -> Any:
+        """
+        Await client.<endpoint>.create(**kwargs), e.g. call("chat.completions",
+        model=..., messages=...), from any event loop.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(f"{endpoint}.create", deadline_s, kwargs), self._loop)
+        return await asyncio.wrap_future(future)
+
+    def call_sync(self, endpoint: str, deadline_s: float = DEADLINE_S, **kwargs) -> Any:
+        """Blocking call() for worker threads (never from the client's own loop)."""
+        future = asyncio.run_coroutine_threadsafe(
+            self._call(f"{endpoint}.create", deadline_s, kwargs), self._loop)
+        return future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "base_url": self.base_url,
+                "http2": HTTP2,
+                "concurrency": self.concurrency,
+                "endpoints": {name.rsplit(".", 1)[0]: s.as_dict() for name, s in self._stats.items()},
+            }
+
+
+_clients: Dict[Tuple, ModelClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: str = BASE_URL, api_key: Optional[str] = None,
+               default_headers: Optional[Dict[str, str]] = None) -> ModelClient:
+    """The process-wide client for this base URL, key and headers."""
+    key = (base_url, api_key, tuple(sorted((default_headers or {}).items())))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = ModelClient(base_url, api_key, default_headers)
+        return _clients[key]
+
+
+def stats() -> Dict[str, Any]:
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {"clients": [c.stats() for c in clients]}
@@ -1,7 +1,14 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 import cv2
 import numpy as np
 import torch
 
+import grain
+import intermediate_cache
+
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 USE_GPU = torch.cuda.is_available()
 
@@ -10,41 +17,139 @@ if USE_GPU:
 else:
     print(" GPU not available, using CPU")
 
-def _to_tensor(image):
-    if USE_GPU:
+# Size of the frame being rendered relative to the frame the params are meant
+# for: a 1024 px proxy of a 4096 px original renders at 0.25, so blur sizes
+# given in pixels shrink with it and the proxy looks like the export scaled down.
+_spatial_scale: ContextVar[float] = ContextVar("spatial_scale", default=1.0)
+
+# Sigma (full-resolution pixels) of apply_clarity's blur.
+CLARITY_SIGMA = 10
+
+
+@contextmanager
+def spatial_scale(scale: float):
+    """Render pixel-sized params (blur radii) at scale within this block."""
+    token = _spatial_scale.set(float(scale) if scale else 1.0)
+    try:
+        yield
+    finally:
+        _spatial_scale.reset(token)
+
+
+def scaled_ksize(ksize) -> int:
+    """Odd Gaussian kernel size for a ksize given in full-resolution pixels."""
+    size = max(1, int(round(ksize * _spatial_scale.get())))
+    return size if size % 2 else size + 1
+
+
+class ImageHandle:
+    """
+    An RGB float CHW tensor (0-1) kept on DEVICE between tool calls.
+    Tools with a tensor branch accept a handle and return one, so a chain of
+    them does one upload and one download/quantisation in to_bgr().
+    """
+
+    def __init__(self, tensor):
+        self.tensor = tensor
+
+    @classmethod
+    def from_bgr(cls, image, device=None):
         rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         tensor = torch.from_numpy(rgb).float() / 255.0
-        return tensor.to(DEVICE).permute(2, 0, 1)
-    return image
+        return cls(tensor.to(device or DEVICE).permute(2, 0, 1))
 
-def _from_tensor(tensor_or_image):
-    if USE_GPU and isinstance(tensor_or_image, torch.Tensor):
-        img = tensor_or_image.permute(1, 2, 0).cpu().numpy()
+    @property
+    def shape(self):
+        _, h, w = self.tensor.shape
+        return (h, w, 3)
+
+    def to_bgr(self):
+        img = self.tensor.permute(1, 2, 0).cpu().numpy()
         img = (img * 255.0).clip(0, 255).astype(np.uint8)
         return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+# Tools whose tensor branch accepts and returns an ImageHandle.
+HANDLE_TOOLS = {
+    "adjust_exposure",
+    "adjust_contrast",
+    "adjust_highlights",
+    "adjust_shadows",
+    "adjust_whites",
+    "adjust_blacks",
+    "adjust_saturation",
+    "adjust_vibrance",
+    "adjust_color_mixer",
+    "apply_split_toning",
+}
+
+# Keep chains of HANDLE_TOOLS on-device (see lut3d.run_stages). Handles work
+# on the torch CPU backend too, but the tensor maths differs from the cv2
+# CPU branch, so CPU-only hosts keep the cv2 path by default.
+USE_HANDLES = USE_GPU
+
+
+# Spatial tools that also take a float32 BGR image (0-255) and then return
+# float32 unquantised; every tool takes and returns uint8 (see lut3d.run_tool).
+FLOAT_TOOLS = {
+    "apply_vignette",
+    "apply_glow",
+    "apply_grain",
+    "apply_clarity",
+    "apply_dehaze",
+    "apply_orton_effect",
+}
+
+
+def as_bgr(image):
+    if isinstance(image, ImageHandle):
+        return image.to_bgr()
+    return image
+
+def _from_unit(result, like):
+    """A 0-1 float result on like's scale: truncated uint8, or float32 0-255."""
+    if like.dtype == np.uint8:
+        return (np.clip(result, 0, 1) * 255).astype(np.uint8)
+    return (np.clip(result, 0, 1) * 255).astype(np.float32)
+
+def _use_tensor(image):
+    return USE_GPU or isinstance(image, ImageHandle)
+
+def _to_tensor(image):
+    if isinstance(image, ImageHandle):
+        return image.tensor
+    if USE_GPU:
+        return ImageHandle.from_bgr(image).tensor
+    return image
+
+def _from_tensor(tensor_or_image, source=None):
+    if isinstance(source, ImageHandle):
+        return ImageHandle(tensor_or_image)
+    if USE_GPU and isinstance(tensor_or_image, torch.Tensor):
+        return ImageHandle(tensor_or_image).to_bgr()
     return tensor_or_image
 
 
 def adjust_exposure(image, value=0.0):
 
-    if USE_GPU:
+    if _use_tensor(image):
         tensor = _to_tensor(image)
         tensor = tensor + (value / 255.0)
         tensor = torch.clamp(tensor, 0, 1)
-        return _from_tensor(tensor)
+        return _from_tensor(tensor, image)
     return cv2.convertScaleAbs(image, alpha=1.0, beta=value)
 
 def adjust_contrast(image, value=1.0):
 
-    if USE_GPU:
+    if _use_tensor(image):
         tensor = _to_tensor(image)
         tensor = (tensor - 0.5) * value + 0.5
         tensor = torch.clamp(tensor, 0, 1)
-        return _from_tensor(tensor)
+        return _from_tensor(tensor, image)
     return cv2.convertScaleAbs(image, alpha=value, beta=0)
 
 def _adjust_masked(image, value, threshold, mode):
-    if USE_GPU:
+    if _use_tensor(image):
         tensor = _to_tensor(image)
         r, g, b = tensor[0], tensor[1], tensor[2]
 
@@ -57,7 +162,7 @@ def _adjust_masked(image, value, threshold, mode):
         adjustment = (value / 255.0) * mask.unsqueeze(0)
         tensor = tensor + adjustment
         tensor = torch.clamp(tensor, 0, 1)
-        return _from_tensor(tensor)
+        return _from_tensor(tensor, image)
     else:
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         h, s, v = cv2.split(hsv)
@@ -108,7 +213,7 @@ def adjust_temp_tint(image, temp=0.0, tint=0.0):
 
 def adjust_saturation(image, scale=1.0):
 
-    if USE_GPU:
+    if _use_tensor(image):
         tensor = _to_tensor(image)
         r, g, b = tensor[0], tensor[1], tensor[2]
         gray = 0.299 * r + 0.587 * g + 0.114 * b
@@ -117,7 +222,7 @@ def adjust_saturation(image, scale=1.0):
         b = gray + (b - gray) * scale
         tensor = torch.stack([r, g, b])
         tensor = torch.clamp(tensor, 0, 1)
-        return _from_tensor(tensor)
+        return _from_tensor(tensor, image)
     else:
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         h, s, v = cv2.split(hsv)
@@ -128,7 +233,7 @@ def adjust_saturation(image, scale=1.0):
         return cv2.cvtColor(final_hsv, cv2.COLOR_HSV2BGR)
 
 def adjust_vibrance(image, strength=0.5):
-    if USE_GPU:
+    if _use_tensor(image):
         tensor = _to_tensor(image)
         r, g, b = tensor[0], tensor[1], tensor[2]
         gray = 0.299 * r + 0.587 * g + 0.114 * b
@@ -145,7 +250,7 @@ def adjust_vibrance(image, strength=0.5):
 
         tensor = torch.stack([r, g, b])
         tensor = torch.clamp(tensor, 0, 1)
-        return _from_tensor(tensor)
+        return _from_tensor(tensor, image)
     else:
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         h, s, v = cv2.split(hsv)
@@ -157,6 +262,64 @@ def adjust_vibrance(image, strength=0.5):
         final_hsv = cv2.merge((h, s, v))
         return cv2.cvtColor(final_hsv, cv2.COLOR_HSV2BGR)
 
+# Colour mixer hue bands on OpenCV's 0-179 hue scale, inclusive; red wraps.
+MIXER_BANDS = {
+    "red": (170, 10),
+    "orange": (11, 25),
+    "yellow": (26, 34),
+    "green": (35, 85),
+    "cyan": (86, 100),
+    "blue": (101, 130),
+    "purple": (131, 169),
+}
+
+
+def _band_distance(lo, hi):
+    """Circular distance of every hue 0-179 to the band [lo, hi]."""
+    hues = np.arange(180)
+    members = (hues >= lo) | (hues <= hi) if lo > hi else (hues >= lo) & (hues <= hi)
+    diff = np.abs(hues[:, None] - hues[members][None, :])
+    return np.minimum(diff, 180 - diff).min(axis=1)
+
+
+def mixer_table(params, falloff=0.0):
+    """
+    Per-hue (hue_shift, sat_scale, lum_scale) for the 180 OpenCV hues, as a
+    float32 (180, 3) table. Bands are hard edged by default; with falloff > 0
+    each band's weight fades out linearly over that many hue steps past its
+    edges and overlapping bands are blended.
+    """
+    table = np.zeros((180, 3), dtype=np.float32)
+    weights = np.zeros(180, dtype=np.float32)
+
+    for channel, (lo, hi) in MIXER_BANDS.items():
+        cfg = params.get(channel) or {}
+        distance = _band_distance(lo, hi)
+        if falloff > 0:
+            weight = np.clip(1.0 - distance / float(falloff), 0.0, 1.0).astype(np.float32)
+        else:
+            weight = (distance == 0).astype(np.float32)
+        values = np.array([cfg.get("hue_shift", 0), cfg.get("sat_scale", 1.0), cfg.get("lum_scale", 1.0)],
+                          dtype=np.float32)
+        table += weight[:, None] * values
+        weights += weight
+
+    return table / weights[:, None]
+
+
+def _mixer_luts(table):
+    """uint8 lookups for the CPU mixer: new hue by hue, new S/L as (256, 256) tables by [hue, value]."""
+    # 8-bit HLS hue can round up to 180, which is red; pad the table to 256 rows.
+    hues = np.arange(256, dtype=np.float32)
+    table = table[np.arange(256) % 180]
+    hue_lut = ((hues + table[:, 0]) % 180).astype(np.uint8)
+
+    levels = np.arange(256, dtype=np.float32)
+    sat_lut = np.clip(table[:, 1:2] * levels, 0, 255).astype(np.uint8)
+    lum_lut = np.clip(table[:, 2:3] * levels, 0, 255).astype(np.uint8)
+    return hue_lut, sat_lut, lum_lut
+
+
 def adjust_color_mixer(
     image,
     red=None,
@@ -165,7 +328,8 @@ def adjust_color_mixer(
     green=None,
     cyan=None,
     blue=None,
-    purple=None
+    purple=None,
+    falloff=0.0
 ):
 
     params = {
@@ -177,102 +341,55 @@ def adjust_color_mixer(
         "blue": blue,
         "purple": purple
     }
+    # One (hue_shift, sat_scale, lum_scale) row per hue: every active channel is
+    # applied in a single gather per pixel.
+    table = mixer_table(params, falloff)
 
-    if USE_GPU:
+    if _use_tensor(image):
         tensor = _to_tensor(image)
         r, g, b = tensor[0], tensor[1], tensor[2]
 
-        max_val = torch.max(torch.stack([r, g, b]), dim=0)[0]
-        min_val = torch.min(torch.stack([r, g, b]), dim=0)[0]
-        delta = max_val - min_val
-        h = torch.zeros_like(r)
-        mask_r = (max_val == r) & (delta != 0)
-        mask_g = (max_val == g) & (delta != 0)
-        mask_b = (max_val == b) & (delta != 0)
-        h[mask_r] = (((g[mask_r] - b[mask_r]) / (delta[mask_r] + 1e-6)) % 6) / 6.0
-        h[mask_g] = (((b[mask_g] - r[mask_g]) / (delta[mask_g] + 1e-6)) + 2) / 6.0
-        h[mask_b] = (((r[mask_b] - g[mask_b]) / (delta[mask_b] + 1e-6)) + 4) / 6.0
-        h = h * 180.0
-
-        ranges = {
-            'red': (h <= 10) | (h >= 170),
-            'orange': (h >= 11) & (h <= 25),
-            'yellow': (h >= 26) & (h <= 34),
-            'green': (h >= 35) & (h <= 85),
-            'cyan': (h >= 86) & (h <= 100),
-            'blue': (h >= 101) & (h <= 130),
-            'purple': (h >= 131) & (h <= 169)
-        }
-
-        for channel, cfg in params.items():
-            if cfg is None:
-                continue
-            mask = ranges[channel]
-
-            hue_shift = cfg.get("hue_shift", 0)
-            sat_scale = cfg.get("sat_scale", 1.0)
-            lum_scale = cfg.get("lum_scale", 1.0)
-
-            hue_shift_norm = hue_shift / 180.0
-            if hue_shift_norm != 0:
-                angle = hue_shift_norm * 2 * 3.14159
-                cos_a, sin_a = torch.cos(angle), torch.sin(angle)
-                r_new = r * cos_a - g * sin_a
-                g_new = r * sin_a + g * cos_a
-                r = torch.where(mask, r_new, r)
-                g = torch.where(mask, g_new, g)
-
-            gray = 0.299 * r + 0.587 * g + 0.114 * b
-            r = torch.where(mask, gray + (r - gray) * sat_scale * lum_scale, r)
-            g = torch.where(mask, gray + (g - gray) * sat_scale * lum_scale, g)
-            b = torch.where(mask, gray + (b - gray) * sat_scale * lum_scale, b)
+        max_val = torch.max(tensor, dim=0)[0]
+        min_val = torch.min(tensor, dim=0)[0]
+        delta = max_val - min_val + 1e-6
+        h = torch.where(max_val == b, (r - g) / delta + 4,
+                        torch.where(max_val == g, (b - r) / delta + 2, ((g - b) / delta) % 6))
+        h = torch.where(max_val > min_val, h * 30.0, torch.zeros_like(h))
+        index = h.long().clamp_(0, 179)
+
+        # cos/sin of the hue rotation and the chroma factor for every hue.
+        angle = table[:, 0] / 180.0 * 2 * 3.14159
+        factors = torch.from_numpy(np.stack([np.cos(angle), np.sin(angle), table[:, 1] * table[:, 2]], axis=1))
+        cos_a, sin_a, chroma = factors.to(tensor.device)[index].unbind(-1)
+
+        r, g = r * cos_a - g * sin_a, r * sin_a + g * cos_a
+        gray = 0.299 * r + 0.587 * g + 0.114 * b
+        r = gray + (r - gray) * chroma
+        g = gray + (g - gray) * chroma
+        b = gray + (b - gray) * chroma
 
         tensor = torch.stack([r, g, b])
         tensor = torch.clamp(tensor, 0, 1)
-        return _from_tensor(tensor)
+        return _from_tensor(tensor, image)
 
     hls = cv2.cvtColor(image, cv2.COLOR_BGR2HLS)
     h, l, s = cv2.split(hls)
 
-    ranges = {
-        'red': (h <= 10) | (h >= 170),
-        'orange': (h >= 11) & (h <= 25),
-        'yellow': (h >= 26) & (h <= 34),
-        'green': (h >= 35) & (h <= 85),
-        'cyan': (h >= 86) & (h <= 100),
-        'blue': (h >= 101) & (h <= 130),
-        'purple': (h >= 131) & (h <= 169)
-    }
-
-    for channel, cfg in params.items():
-        if cfg is None:
-            continue
-        mask = ranges[channel]
-
-        hue_shift = cfg.get("hue_shift", 0)
-        sat_scale = cfg.get("sat_scale", 1.0)
-        lum_scale = cfg.get("lum_scale", 1.0)
-
-        h_float = h.astype(np.float32)
-        h_float[mask] = (h_float[mask] + hue_shift) % 180
-        h = h_float.astype(np.uint8)
-
-        s_float = s.astype(np.float32)
-        s_float[mask] *= sat_scale
-        s = np.clip(s_float, 0, 255).astype(np.uint8)
-
-        l_float = l.astype(np.float32)
-        l_float[mask] *= lum_scale
-        l = np.clip(l_float, 0, 255).astype(np.uint8)
+    hue_lut, sat_lut, lum_lut = _mixer_luts(table)
+    # A nearest-neighbour remap with integer maps is a vectorised 2D gather:
+    # x is the S or L value, y the hue.
+    rows = h.astype(np.int16)
+    s = cv2.remap(sat_lut, cv2.merge((s.astype(np.int16), rows)), None, cv2.INTER_NEAREST)
+    l = cv2.remap(lum_lut, cv2.merge((l.astype(np.int16), rows)), None, cv2.INTER_NEAREST)
+    h = cv2.LUT(h, hue_lut)
 
     final_hls = cv2.merge((h, l, s))
     return cv2.cvtColor(final_hls, cv2.COLOR_HLS2BGR)
 
 
-
 def apply_split_toning(image, shadow_hue=220, shadow_sat=0.3, highlight_hue=40, highlight_sat=0.2):
 
-    if USE_GPU:
+    if _use_tensor(image):
         tensor = _to_tensor(image)
         r, g, b = tensor[0], tensor[1], tensor[2]
         luminance = 0.299 * r + 0.587 * g + 0.114 * b
@@ -303,7 +420,7 @@ def apply_split_toning(image, shadow_hue=220, shadow_sat=0.3, highlight_hue=40,
 
         tensor = torch.stack([r, g, b])
         tensor = torch.clamp(tensor, 0, 1)
-        return _from_tensor(tensor)
+        return _from_tensor(tensor, image)
     else:
         lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB).astype(np.float32)
         l, a, b_ch = cv2.split(lab)
@@ -380,43 +497,88 @@ def apply_curves(image, shadows=0, midtones=0, highlights=0, points=None, curve=
 
 
 
-def apply_vignette(image, strength=0.5, radius=0.8):
+# Vignette gain maps, keyed by frame shape and params and shared across calls.
+_vignette_cache = intermediate_cache.IntermediateCache(
+    int(os.getenv("VIGNETTE_CACHE_MB", "256")) * 1024 * 1024)
 
-    rows, cols = image.shape[:2]
+# Gains are stored as uint16 fixed point: gain * VIGNETTE_GAIN_SCALE, up to 2.0.
+VIGNETTE_GAIN_SCALE = 32768
+
+# Pixels per band when building or applying a gain map.
+VIGNETTE_BAND_PIXELS = 1_000_000
+
+
+def _vignette_gain(rows, cols, strength, radius):
+    """Full-frame uint16 gain map, built in row bands to bound float temporaries."""
+    gain = np.empty((rows, cols), dtype=np.uint16)
     center_x, center_y = cols / 2, rows / 2
     max_dist = np.sqrt(center_x**2 + center_y**2)
+    band = max(1, VIGNETTE_BAND_PIXELS // cols)
 
-    Y, X = np.ogrid[:rows, :cols]
-    dist = np.sqrt((X - center_x)**2 + (Y - center_y)**2)
-    dist_norm = dist / max_dist
+    for y in range(0, rows, band):
+        Y, X = np.ogrid[y:min(rows, y + band), :cols]
+        dist = np.sqrt((X - center_x)**2 + (Y - center_y)**2)
+        dist_norm = dist / max_dist
+        vignette = 1 - strength * np.clip((dist_norm - radius) / (1 - radius), 0, 1) ** 2
+        gain[y:y + band] = np.clip(np.rint(vignette * VIGNETTE_GAIN_SCALE), 0, 65535)
+    return gain
 
-    vignette = 1 - strength * np.clip((dist_norm - radius) / (1 - radius), 0, 1) ** 2
-    vignette = vignette[:, :, np.newaxis]
 
-    result = image.astype(np.float32) * vignette
-    return np.clip(result, 0, 255).astype(np.uint8)
+def vignette_cache_stats():
+    return _vignette_cache.stats()
+
+
+def apply_vignette(image, strength=0.5, radius=0.8, row_offset=0, full_shape=None):
+
+    # row_offset/full_shape place a strip of a larger image (tiled rendering).
+    rows, cols = image.shape[:2]
+    full_rows, full_cols = full_shape[:2] if full_shape is not None else (rows, cols)
+
+    key = (float(strength), float(radius))
+    gain = _vignette_cache.get_or_compute(
+        f"{full_rows}x{full_cols}", "vignette", key,
+        lambda: _vignette_gain(full_rows, full_cols, *key))
+    gain = gain[row_offset:row_offset + rows]
+
+    # Scale one band at a time into a reused float buffer.
+    out = np.empty_like(image)
+    band = max(1, VIGNETTE_BAND_PIXELS // cols)
+    buffer = np.empty((min(band, rows),) + image.shape[1:], dtype=np.float32)
+    for y in range(0, rows, band):
+        chunk = buffer[:min(band, rows - y)]
+        scale = gain[y:y + band].astype(np.float32)
+        scale *= np.float32(1.0 / VIGNETTE_GAIN_SCALE)
+        np.multiply(image[y:y + band], scale[:, :, np.newaxis] if image.ndim == 3 else scale, out=chunk)
+        # Gains are non-negative, so only the upper bound needs clipping.
+        np.minimum(chunk, 255, out=chunk)
+        out[y:y + band] = chunk
+    return out
 
 
 def apply_glow(image, intensity=0.3, radius=21):
 
-    if radius % 2 == 0:
-        radius += 1
+    radius = scaled_ksize(radius)
 
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, highlights = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY)
+    def highlight_mask():
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        _, highlights = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY)
+        return cv2.GaussianBlur(highlights, (radius, radius), 0)
 
-    glow = cv2.GaussianBlur(image, (radius, radius), 0)
-    glow_mask = cv2.GaussianBlur(highlights, (radius, radius), 0)
+    digest = intermediate_cache.image_digest(image)
+    glow = intermediate_cache.cached(digest, "gaussian_blur", (radius, radius),
+                                     lambda: cv2.GaussianBlur(image, (radius, radius), 0))
+    glow_mask = intermediate_cache.cached(digest, "glow_mask", radius, highlight_mask)
     glow_mask = glow_mask[:, :, np.newaxis] / 255.0
 
     base = image.astype(np.float32) / 255.0
     glow = glow.astype(np.float32) / 255.0
 
     result = 1 - (1 - base) * (1 - glow * glow_mask * intensity)
-    return (np.clip(result, 0, 1) * 255).astype(np.uint8)
+    return _from_unit(result, image)
 
 
-def apply_grain(image, amount=0.03, size=1, strength=None, intensity=None):
+def apply_grain(image, amount=0.03, size=1, strength=None, intensity=None, seed=0,
+                row_offset=0, full_shape=None):
 
     if strength is not None:
         amount = strength
@@ -430,13 +592,8 @@ def apply_grain(image, amount=0.03, size=1, strength=None, intensity=None):
 
     size = max(1, min(2, int(size)))
 
-    rows, cols = image.shape[:2]
-    grain = np.random.normal(0, 1, (rows // size, cols // size))
-    grain = cv2.resize(grain, (cols, rows), interpolation=cv2.INTER_LINEAR)
-    grain = grain[:, :, np.newaxis] * amount * 40
-
-    result = image.astype(np.float32) + grain
-    return np.clip(result, 0, 255).astype(np.uint8)
+    # Seeded texture-bank grain: identical on every re-render of the same panel.
+    return grain.apply(image, amount, size, int(seed), row_offset, full_shape)
 
 
 def apply_duotone(image, dark_color=(20, 0, 80), light_color=(255, 200, 100)):
@@ -472,41 +629,76 @@ def apply_film_fade(image, fade_amount=0.3, black_fade=0.15):
 
 def apply_clarity(image, amount=0.5):
 
-    blur = cv2.GaussianBlur(image, (0, 0), 10)
+    sigma = CLARITY_SIGMA * _spatial_scale.get()
+    blur = intermediate_cache.cached(intermediate_cache.image_digest(image), "gaussian_blur", (0, sigma),
+                                     lambda: cv2.GaussianBlur(image, (0, 0), sigma))
 
     if amount >= 0:
         result = cv2.addWeighted(image, 1 + amount, blur, -amount, 0)
     else:
         result = cv2.addWeighted(image, 1 + amount, blur, -amount, 0)
 
-    return np.clip(result, 0, 255).astype(np.uint8)
+    return np.clip(result, 0, 255).astype(image.dtype)
 
 
 def apply_dehaze(image, amount=0.5):
-    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    clip_limit = 2.0 + amount * 2
+    if image.dtype != np.uint8:
+        return _dehaze_float(image, clip_limit)
+
+    digest = intermediate_cache.image_digest(image)
+    lab = intermediate_cache.cached(digest, "lab", None,
+                                    lambda: cv2.cvtColor(image, cv2.COLOR_BGR2LAB))
     l, a, b = cv2.split(lab)
 
-    clahe = cv2.createCLAHE(clipLimit=2.0 + amount * 2, tileGridSize=(8, 8))
-    l = clahe.apply(l)
+    def equalize():
+        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
+        return clahe.apply(l)
+
+    l = intermediate_cache.cached(digest, "clahe_l", clip_limit, equalize)
 
     result = cv2.merge([l, a, b])
     return cv2.cvtColor(result, cv2.COLOR_LAB2BGR)
 
 
+def _dehaze_float(image, clip_limit):
+    # CLAHE's histogram is 8-bit, so equalise the rounded L channel (0-255 as in
+    # the uint8 path) and add back the fraction it dropped.
+    lab = cv2.cvtColor(image * np.float32(1.0 / 255.0), cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    l *= 2.55
+    l8 = np.clip(np.rint(l), 0, 255).astype(np.uint8)
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
+    l -= l8
+    l += clahe.apply(l8)
+    l *= np.float32(1.0 / 2.55)
+
+    result = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+    result *= 255.0
+    return np.clip(result, 0, 255, out=result)
+
+
 def apply_orton_effect(image, blur_amount=25, blend=0.3):
 
-    if blur_amount % 2 == 0:
-        blur_amount += 1
+    blur_amount = scaled_ksize(blur_amount)
+
+    def bright_blur():
+        if image.dtype != np.uint8:
+            # convertScaleAbs semantics without quantising
+            bright = np.minimum(np.abs(image * 1.3 + 20), 255).astype(np.float32)
+        else:
+            bright = cv2.convertScaleAbs(image, alpha=1.3, beta=20)
+        return cv2.GaussianBlur(bright, (blur_amount, blur_amount), 0)
 
-    bright = cv2.convertScaleAbs(image, alpha=1.3, beta=20)
-    blur = cv2.GaussianBlur(bright, (blur_amount, blur_amount), 0)
+    blur = intermediate_cache.cached(intermediate_cache.image_digest(image), "orton_blur",
+                                     blur_amount, bright_blur)
 
     base = image.astype(np.float32) / 255.0
     overlay = blur.astype(np.float32) / 255.0
     multiplied = base * overlay * 1.5
 
     result = base * (1 - blend) + multiplied * blend
-    return (np.clip(result, 0, 1) * 255).astype(np.uint8)
+    return _from_unit(result, image)
 
 
 def apply_cross_process(image, intensity=0.5):
@@ -607,321 +799,353 @@ def apply_lut_color_grade(image, style="neutral"):
 
 
 
+def apply_grayscale(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def apply_mono_blend(image, color_amount=0.3):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    mask = gray.astype(np.float32) / 255.0
+    mask = np.clip(mask * 2 - 0.5, 0, 1)[:, :, np.newaxis]
+    return (gray_bgr.astype(np.float32) * (1 - mask * color_amount) +
+            image.astype(np.float32) * mask * color_amount).astype(np.uint8)
+
+
+def apply_shadow_tint(image, blue=10, green=6):
+    b, g, r = cv2.split(image.astype(np.float32))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+    shadow_mask = np.clip(1 - gray * 2, 0, 1)
+    b = b + shadow_mask * blue
+    g = g + shadow_mask * green
+    return cv2.merge([np.clip(b, 0, 255).astype(np.uint8),
+                      np.clip(g, 0, 255).astype(np.uint8),
+                      np.clip(r, 0, 255).astype(np.uint8)])
+
+
+def apply_red_boost(image, scale=1.05):
+    b, g, r = cv2.split(image.astype(np.float32))
+    r = r * scale
+    return cv2.merge([b.astype(np.uint8), g.astype(np.uint8),
+                      np.clip(r, 0, 255).astype(np.uint8)])
+
+
+# Each style is an ordered list of (tool_name, kwargs) steps over the tools above.
+PRESET_ALIASES = {
+    "classic_noir": "noir",
+    "vintage": "vintage_film",
+    "cinematic": "cinematic_teal_orange",
+}
+
+STYLE_PRESETS = {
+    "noir": [
+        ("apply_grayscale", {}),
+        ("adjust_contrast", {"value": 1.25}),
+        ("apply_curves", {"shadows": -15, "midtones": 5, "highlights": 10}),
+        ("apply_vignette", {"strength": 0.45, "radius": 0.6}),
+        ("apply_grain", {"amount": 0.03, "size": 1}),
+    ],
+    "neo_noir": [
+        ("apply_mono_blend", {"color_amount": 0.3}),
+        ("adjust_contrast", {"value": 1.3}),
+        ("apply_split_toning", {"shadow_hue": 240, "shadow_sat": 0.15,
+                                "highlight_hue": 350, "highlight_sat": 0.1}),
+        ("apply_vignette", {"strength": 0.5, "radius": 0.6}),
+    ],
+    "dark_noir": [
+        ("apply_grayscale", {}),
+        ("adjust_exposure", {"value": -20}),
+        ("adjust_contrast", {"value": 1.35}),
+        ("apply_curves", {"shadows": -20, "midtones": 0, "highlights": 10}),
+        ("apply_vignette", {"strength": 0.6, "radius": 0.5}),
+        ("apply_grain", {"amount": 0.04, "size": 1}),
+    ],
+    "night": [
+        ("adjust_exposure", {"value": -20}),
+        ("apply_split_toning", {"shadow_hue": 220, "shadow_sat": 0.35,
+                                "highlight_hue": 200, "highlight_sat": 0.15}),
+        ("adjust_contrast", {"value": 1.15}),
+        ("adjust_saturation", {"scale": 0.85}),
+        ("apply_vignette", {"strength": 0.5, "radius": 0.65}),
+    ],
+    "deep_night": [
+        ("adjust_exposure", {"value": -35}),
+        ("apply_split_toning", {"shadow_hue": 230, "shadow_sat": 0.4,
+                                "highlight_hue": 210, "highlight_sat": 0.2}),
+        ("adjust_contrast", {"value": 1.2}),
+        ("adjust_saturation", {"scale": 0.7}),
+        ("apply_vignette", {"strength": 0.6, "radius": 0.55}),
+        ("apply_grain", {"amount": 0.025, "size": 1}),
+    ],
+    "blue_hour": [
+        ("adjust_exposure", {"value": -12}),
+        ("apply_split_toning", {"shadow_hue": 235, "shadow_sat": 0.35,
+                                "highlight_hue": 280, "highlight_sat": 0.15}),
+        ("adjust_temp_tint", {"temp": -20, "tint": 3}),
+        ("adjust_saturation", {"scale": 0.9}),
+        ("apply_haze", {"amount": 0.05, "color": (200, 180, 220)}),
+    ],
+    "midnight": [
+        ("adjust_exposure", {"value": -30}),
+        ("apply_split_toning", {"shadow_hue": 240, "shadow_sat": 0.45,
+                                "highlight_hue": 220, "highlight_sat": 0.2}),
+        ("adjust_contrast", {"value": 1.25}),
+        ("adjust_saturation", {"scale": 0.6}),
+        ("apply_vignette", {"strength": 0.6, "radius": 0.5}),
+    ],
+    "cyberpunk": [
+        ("apply_split_toning", {"shadow_hue": 280, "shadow_sat": 0.3,
+                                "highlight_hue": 180, "highlight_sat": 0.25}),
+        ("apply_color_overlay", {"color": (255, 0, 120), "opacity": 0.08, "blend_mode": "screen"}),
+        ("adjust_contrast", {"value": 1.2}),
+        ("adjust_saturation", {"scale": 1.25}),
+        ("apply_vignette", {"strength": 0.4, "radius": 0.7}),
+        ("apply_glow", {"intensity": 0.2, "radius": 25}),
+    ],
+    "neon": [
+        ("adjust_saturation", {"scale": 1.4}),
+        ("adjust_vibrance", {"strength": 0.4}),
+        ("adjust_contrast", {"value": 1.2}),
+        ("apply_glow", {"intensity": 0.25, "radius": 25}),
+        ("apply_vignette", {"strength": 0.4, "radius": 0.7}),
+    ],
+    "synthwave": [
+        ("apply_split_toning", {"shadow_hue": 270, "shadow_sat": 0.35,
+                                "highlight_hue": 320, "highlight_sat": 0.25}),
+        ("apply_color_overlay", {"color": (255, 50, 150), "opacity": 0.1, "blend_mode": "screen"}),
+        ("adjust_contrast", {"value": 1.15}),
+        ("adjust_saturation", {"scale": 1.3}),
+        ("apply_glow", {"intensity": 0.2, "radius": 31}),
+        ("apply_grain", {"amount": 0.025, "size": 1}),
+    ],
+    "blade_runner": [
+        ("apply_teal_and_orange", {"intensity": 0.4}),
+        ("apply_haze", {"amount": 0.08, "color": (180, 160, 140)}),
+        ("adjust_contrast", {"value": 1.15}),
+        ("apply_split_toning", {"shadow_hue": 190, "shadow_sat": 0.2,
+                                "highlight_hue": 35, "highlight_sat": 0.25}),
+        ("apply_vignette", {"strength": 0.4, "radius": 0.7}),
+        ("apply_glow", {"intensity": 0.12, "radius": 21}),
+    ],
+    "moody_blue": [
+        ("apply_split_toning", {"shadow_hue": 215, "shadow_sat": 0.35,
+                                "highlight_hue": 225, "highlight_sat": 0.15}),
+        ("adjust_saturation", {"scale": 0.75}),
+        ("adjust_exposure", {"value": -12}),
+        ("adjust_contrast", {"value": 1.1}),
+        ("apply_haze", {"amount": 0.06, "color": (180, 190, 220)}),
+        ("apply_vignette", {"strength": 0.4, "radius": 0.7}),
+    ],
+    "moody_dark": [
+        ("adjust_exposure", {"value": -18}),
+        ("adjust_contrast", {"value": 1.2}),
+        ("adjust_saturation", {"scale": 0.8}),
+        ("apply_curves", {"shadows": -15, "midtones": -5, "highlights": 0}),
+        ("apply_vignette", {"strength": 0.5, "radius": 0.6}),
+    ],
+    "atmospheric": [
+        ("adjust_exposure", {"value": -8}),
+        ("apply_haze", {"amount": 0.1, "color": (190, 185, 200)}),
+        ("apply_split_toning", {"shadow_hue": 220, "shadow_sat": 0.2,
+                                "highlight_hue": 45, "highlight_sat": 0.1}),
+        ("adjust_contrast", {"value": 0.95}),
+        ("adjust_saturation", {"scale": 0.88}),
+    ],
+    "dramatic": [
+        ("adjust_contrast", {"value": 1.25}),
+        ("apply_curves", {"shadows": -15, "midtones": 8, "highlights": 10}),
+        ("adjust_saturation", {"scale": 1.1}),
+        ("apply_vignette", {"strength": 0.5, "radius": 0.6}),
+        ("apply_clarity", {"amount": 0.25}),
+    ],
+    "vintage_film": [
+        ("apply_film_fade", {"fade_amount": 0.15, "black_fade": 0.08}),
+        ("apply_split_toning", {"shadow_hue": 35, "shadow_sat": 0.18,
+                                "highlight_hue": 50, "highlight_sat": 0.12}),
+        ("adjust_saturation", {"scale": 0.88}),
+        ("adjust_contrast", {"value": 0.95}),
+        ("apply_grain", {"amount": 0.025, "size": 1}),
+        ("apply_vignette", {"strength": 0.35, "radius": 0.75}),
+    ],
+    "retro_70s": [
+        ("apply_cross_process", {"intensity": 0.25}),
+        ("apply_film_fade", {"fade_amount": 0.2, "black_fade": 0.1}),
+        ("apply_split_toning", {"shadow_hue": 30, "shadow_sat": 0.2,
+                                "highlight_hue": 55, "highlight_sat": 0.18}),
+        ("adjust_saturation", {"scale": 0.9}),
+        ("apply_grain", {"amount": 0.03, "size": 1}),
+        ("apply_vignette", {"strength": 0.4, "radius": 0.7}),
+    ],
+    "polaroid": [
+        ("apply_film_fade", {"fade_amount": 0.15, "black_fade": 0.08}),
+        ("apply_split_toning", {"shadow_hue": 45, "shadow_sat": 0.15,
+                                "highlight_hue": 180, "highlight_sat": 0.08}),
+        ("adjust_contrast", {"value": 1.02}),
+        ("adjust_saturation", {"scale": 0.9}),
+        ("apply_shadow_tint", {"blue": 10, "green": 6}),
+        ("apply_vignette", {"strength": 0.3, "radius": 0.8}),
+    ],
+    "kodachrome": [
+        ("adjust_saturation", {"scale": 1.15}),
+        ("adjust_contrast", {"value": 1.1}),
+        ("apply_split_toning", {"shadow_hue": 220, "shadow_sat": 0.1,
+                                "highlight_hue": 40, "highlight_sat": 0.15}),
+        ("apply_red_boost", {"scale": 1.05}),
+        ("apply_grain", {"amount": 0.02, "size": 1}),
+    ],
+    "cinematic_teal_orange": [
+        ("apply_teal_and_orange", {"intensity": 0.4}),
+        ("adjust_contrast", {"value": 1.12}),
+        ("apply_curves", {"shadows": -8, "midtones": 0, "highlights": 5}),
+        ("apply_vignette", {"strength": 0.35, "radius": 0.72}),
+        ("apply_film_fade", {"fade_amount": 0.08, "black_fade": 0.04}),
+    ],
+    "blockbuster": [
+        ("apply_teal_and_orange", {"intensity": 0.45}),
+        ("adjust_contrast", {"value": 1.18}),
+        ("adjust_saturation", {"scale": 1.08}),
+        ("apply_vignette", {"strength": 0.38, "radius": 0.7}),
+        ("apply_glow", {"intensity": 0.1, "radius": 21}),
+    ],
+    "indie_film": [
+        ("adjust_saturation", {"scale": 0.88}),
+        ("apply_film_fade", {"fade_amount": 0.12, "black_fade": 0.06}),
+        ("apply_split_toning", {"shadow_hue": 200, "shadow_sat": 0.12,
+                                "highlight_hue": 45, "highlight_sat": 0.08}),
+        ("adjust_contrast", {"value": 1.03}),
+        ("apply_grain", {"amount": 0.025, "size": 1}),
+    ],
+    "golden_hour": [
+        ("apply_split_toning", {"shadow_hue": 30, "shadow_sat": 0.12,
+                                "highlight_hue": 50, "highlight_sat": 0.2}),
+        ("adjust_temp_tint", {"temp": 20, "tint": 4}),
+        ("adjust_saturation", {"scale": 1.1}),
+        ("apply_glow", {"intensity": 0.1, "radius": 31}),
+        ("apply_haze", {"amount": 0.03, "color": (255, 240, 210)}),
+    ],
+    "morning_light": [
+        ("adjust_temp_tint", {"temp": 12, "tint": 2}),
+        ("adjust_exposure", {"value": 8}),
+        ("apply_split_toning", {"shadow_hue": 220, "shadow_sat": 0.06,
+                                "highlight_hue": 45, "highlight_sat": 0.15}),
+        ("adjust_saturation", {"scale": 1.05}),
+        ("apply_glow", {"intensity": 0.08, "radius": 25}),
+        ("apply_haze", {"amount": 0.02, "color": (255, 248, 240)}),
+    ],
+    "sunrise": [
+        ("apply_split_toning", {"shadow_hue": 250, "shadow_sat": 0.1,
+                                "highlight_hue": 35, "highlight_sat": 0.22}),
+        ("adjust_temp_tint", {"temp": 18, "tint": 6}),
+        ("adjust_saturation", {"scale": 1.12}),
+        ("apply_glow", {"intensity": 0.12, "radius": 31}),
+    ],
+    "sunset": [
+        ("apply_split_toning", {"shadow_hue": 285, "shadow_sat": 0.12,
+                                "highlight_hue": 28, "highlight_sat": 0.28}),
+        ("adjust_temp_tint", {"temp": 25, "tint": 10}),
+        ("adjust_saturation", {"scale": 1.2}),
+        ("adjust_vibrance", {"strength": 0.3}),
+        ("apply_glow", {"intensity": 0.12, "radius": 31}),
+    ],
+    "warm_glow": [
+        ("adjust_temp_tint", {"temp": 22, "tint": 4}),
+        ("adjust_saturation", {"scale": 1.08}),
+        ("apply_orton_effect", {"blur_amount": 25, "blend": 0.18}),
+        ("apply_split_toning", {"shadow_hue": 35, "shadow_sat": 0.1,
+                                "highlight_hue": 50, "highlight_sat": 0.15}),
+    ],
+    "magic_hour": [
+        ("apply_split_toning", {"shadow_hue": 280, "shadow_sat": 0.08,
+                                "highlight_hue": 40, "highlight_sat": 0.25}),
+        ("adjust_temp_tint", {"temp": 20, "tint": 8}),
+        ("adjust_saturation", {"scale": 1.12}),
+        ("apply_orton_effect", {"blur_amount": 21, "blend": 0.15}),
+        ("apply_haze", {"amount": 0.04, "color": (255, 235, 210)}),
+    ],
+    "black_and_white": [
+        ("apply_grayscale", {}),
+        ("adjust_contrast", {"value": 1.1}),
+    ],
+    "high_contrast_bw": [
+        ("apply_grayscale", {}),
+        ("adjust_contrast", {"value": 1.3}),
+        ("apply_curves", {"shadows": -15, "midtones": 8, "highlights": 12}),
+    ],
+    "film_noir_bw": [
+        ("apply_grayscale", {}),
+        ("adjust_contrast", {"value": 1.35}),
+        ("apply_curves", {"shadows": -18, "midtones": 5, "highlights": 15}),
+        ("apply_vignette", {"strength": 0.55, "radius": 0.55}),
+        ("apply_grain", {"amount": 0.035, "size": 1}),
+    ],
+    "silver": [
+        ("apply_grayscale", {}),
+        ("adjust_exposure", {"value": 8}),
+        ("adjust_contrast", {"value": 1.15}),
+        ("apply_curves", {"shadows": 8, "midtones": 5, "highlights": 0}),
+    ],
+    "dream": [
+        ("apply_orton_effect", {"blur_amount": 25, "blend": 0.22}),
+        ("adjust_saturation", {"scale": 0.92}),
+        ("apply_split_toning", {"shadow_hue": 260, "shadow_sat": 0.12,
+                                "highlight_hue": 50, "highlight_sat": 0.1}),
+        ("apply_haze", {"amount": 0.08, "color": (220, 210, 230)}),
+        ("apply_glow", {"intensity": 0.18, "radius": 35}),
+    ],
+    "ethereal": [
+        ("adjust_exposure", {"value": 15}),
+        ("adjust_contrast", {"value": 0.9}),
+        ("adjust_saturation", {"scale": 0.85}),
+        ("apply_orton_effect", {"blur_amount": 21, "blend": 0.2}),
+        ("apply_haze", {"amount": 0.1, "color": (240, 235, 250)}),
+        ("apply_glow", {"intensity": 0.22, "radius": 41}),
+    ],
+    "horror": [
+        ("adjust_exposure", {"value": -15}),
+        ("adjust_saturation", {"scale": 0.7}),
+        ("apply_split_toning", {"shadow_hue": 160, "shadow_sat": 0.25,
+                                "highlight_hue": 40, "highlight_sat": 0.1}),
+        ("adjust_contrast", {"value": 1.2}),
+        ("apply_vignette", {"strength": 0.6, "radius": 0.5}),
+        ("apply_grain", {"amount": 0.03, "size": 1}),
+    ],
+    "western": [
+        ("apply_split_toning", {"shadow_hue": 35, "shadow_sat": 0.22,
+                                "highlight_hue": 45, "highlight_sat": 0.18}),
+        ("adjust_temp_tint", {"temp": 20, "tint": 6}),
+        ("adjust_saturation", {"scale": 0.92}),
+        ("apply_haze", {"amount": 0.08, "color": (220, 200, 170)}),
+        ("apply_film_fade", {"fade_amount": 0.12, "black_fade": 0.06}),
+        ("apply_vignette", {"strength": 0.35, "radius": 0.75}),
+    ],
+    "underwater": [
+        ("apply_split_toning", {"shadow_hue": 195, "shadow_sat": 0.35,
+                                "highlight_hue": 180, "highlight_sat": 0.3}),
+        ("adjust_temp_tint", {"temp": -30, "tint": -10}),
+        ("adjust_saturation", {"scale": 0.85}),
+        ("apply_haze", {"amount": 0.18, "color": (180, 200, 180)}),
+        ("adjust_contrast", {"value": 0.9}),
+    ],
+}
+
+
+def preset_name(style):
+    style = (style or "").lower().replace("-", "_").replace(" ", "_")
+    return PRESET_ALIASES.get(style, style)
+
+
+def preset_steps(style):
+    return STYLE_PRESETS.get(preset_name(style), [])
+
+
 def apply_style_preset(image, style="none"):
 
     if style == "none" or not style:
         return image
 
     result = image.copy()
-    style = style.lower().replace("-", "_").replace(" ", "_")
-
-    if style in ["noir", "classic_noir"]:
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
-        result = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        result = adjust_contrast(result, value=1.25)
-        result = apply_curves(result, shadows=-15, midtones=5, highlights=10)
-        result = apply_vignette(result, strength=0.45, radius=0.6)
-        result = apply_grain(result, amount=0.03, size=1)
-
-    elif style == "neo_noir":
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
-        gray_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        mask = gray.astype(np.float32) / 255.0
-        mask = np.clip(mask * 2 - 0.5, 0, 1)[:, :, np.newaxis]
-        result = (gray_bgr.astype(np.float32) * (1 - mask * 0.3) +
-                  result.astype(np.float32) * mask * 0.3).astype(np.uint8)
-        result = adjust_contrast(result, value=1.3)
-        result = apply_split_toning(result, shadow_hue=240, shadow_sat=0.15,
-                                   highlight_hue=350, highlight_sat=0.1)
-        result = apply_vignette(result, strength=0.5, radius=0.6)
-
-    elif style == "dark_noir":
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
-        result = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        result = adjust_exposure(result, value=-20)
-        result = adjust_contrast(result, value=1.35)
-        result = apply_curves(result, shadows=-20, midtones=0, highlights=10)
-        result = apply_vignette(result, strength=0.6, radius=0.5)
-        result = apply_grain(result, amount=0.04, size=1)
-
-    elif style == "night":
-        result = adjust_exposure(result, value=-20)
-        result = apply_split_toning(result, shadow_hue=220, shadow_sat=0.35,
-                                   highlight_hue=200, highlight_sat=0.15)
-        result = adjust_contrast(result, value=1.15)
-        result = adjust_saturation(result, scale=0.85)
-        result = apply_vignette(result, strength=0.5, radius=0.65)
-
-    elif style == "deep_night":
-        result = adjust_exposure(result, value=-35)
-        result = apply_split_toning(result, shadow_hue=230, shadow_sat=0.4,
-                                   highlight_hue=210, highlight_sat=0.2)
-        result = adjust_contrast(result, value=1.2)
-        result = adjust_saturation(result, scale=0.7)
-        result = apply_vignette(result, strength=0.6, radius=0.55)
-        result = apply_grain(result, amount=0.025, size=1)
-
-    elif style == "blue_hour":
-        result = adjust_exposure(result, value=-12)
-        result = apply_split_toning(result, shadow_hue=235, shadow_sat=0.35,
-                                   highlight_hue=280, highlight_sat=0.15)
-        result = adjust_temp_tint(result, temp=-20, tint=3)
-        result = adjust_saturation(result, scale=0.9)
-        result = apply_haze(result, amount=0.05, color=(200, 180, 220))
-
-    elif style == "midnight":
-        result = adjust_exposure(result, value=-30)
-        result = apply_split_toning(result, shadow_hue=240, shadow_sat=0.45,
-                                   highlight_hue=220, highlight_sat=0.2)
-        result = adjust_contrast(result, value=1.25)
-        result = adjust_saturation(result, scale=0.6)
-        result = apply_vignette(result, strength=0.6, radius=0.5)
-
-    elif style == "cyberpunk":
-        result = apply_split_toning(result, shadow_hue=280, shadow_sat=0.3,
-                                   highlight_hue=180, highlight_sat=0.25)
-        result = apply_color_overlay(result, color=(255, 0, 120), opacity=0.08, blend_mode="screen")
-        result = adjust_contrast(result, value=1.2)
-        result = adjust_saturation(result, scale=1.25)
-        result = apply_vignette(result, strength=0.4, radius=0.7)
-        result = apply_glow(result, intensity=0.2, radius=25)
-
-    elif style == "neon":
-        result = adjust_saturation(result, scale=1.4)
-        result = adjust_vibrance(result, strength=0.4)
-        result = adjust_contrast(result, value=1.2)
-        result = apply_glow(result, intensity=0.25, radius=25)
-        result = apply_vignette(result, strength=0.4, radius=0.7)
-
-    elif style == "synthwave":
-        result = apply_split_toning(result, shadow_hue=270, shadow_sat=0.35,
-                                   highlight_hue=320, highlight_sat=0.25)
-        result = apply_color_overlay(result, color=(255, 50, 150), opacity=0.1, blend_mode="screen")
-        result = adjust_contrast(result, value=1.15)
-        result = adjust_saturation(result, scale=1.3)
-        result = apply_glow(result, intensity=0.2, radius=31)
-        result = apply_grain(result, amount=0.025, size=1)
-
-    elif style == "blade_runner":
-        result = apply_teal_and_orange(result, intensity=0.4)
-        result = apply_haze(result, amount=0.08, color=(180, 160, 140))
-        result = adjust_contrast(result, value=1.15)
-        result = apply_split_toning(result, shadow_hue=190, shadow_sat=0.2,
-                                   highlight_hue=35, highlight_sat=0.25)
-        result = apply_vignette(result, strength=0.4, radius=0.7)
-        result = apply_glow(result, intensity=0.12, radius=21)
-
-    elif style == "moody_blue":
-        result = apply_split_toning(result, shadow_hue=215, shadow_sat=0.35,
-                                   highlight_hue=225, highlight_sat=0.15)
-        result = adjust_saturation(result, scale=0.75)
-        result = adjust_exposure(result, value=-12)
-        result = adjust_contrast(result, value=1.1)
-        result = apply_haze(result, amount=0.06, color=(180, 190, 220))
-        result = apply_vignette(result, strength=0.4, radius=0.7)
-
-    elif style == "moody_dark":
-        result = adjust_exposure(result, value=-18)
-        result = adjust_contrast(result, value=1.2)
-        result = adjust_saturation(result, scale=0.8)
-        result = apply_curves(result, shadows=-15, midtones=-5, highlights=0)
-        result = apply_vignette(result, strength=0.5, radius=0.6)
-
-    elif style == "atmospheric":
-        result = adjust_exposure(result, value=-8)
-        result = apply_haze(result, amount=0.1, color=(190, 185, 200))
-        result = apply_split_toning(result, shadow_hue=220, shadow_sat=0.2,
-                                   highlight_hue=45, highlight_sat=0.1)
-        result = adjust_contrast(result, value=0.95)
-        result = adjust_saturation(result, scale=0.88)
-
-    elif style == "dramatic":
-        result = adjust_contrast(result, value=1.25)
-        result = apply_curves(result, shadows=-15, midtones=8, highlights=10)
-        result = adjust_saturation(result, scale=1.1)
-        result = apply_vignette(result, strength=0.5, radius=0.6)
-        result = apply_clarity(result, amount=0.25)
-
-    elif style in ["vintage_film", "vintage"]:
-        result = apply_film_fade(result, fade_amount=0.15, black_fade=0.08)
-        result = apply_split_toning(result, shadow_hue=35, shadow_sat=0.18,
-                                   highlight_hue=50, highlight_sat=0.12)
-        result = adjust_saturation(result, scale=0.88)
-        result = adjust_contrast(result, value=0.95)
-        result = apply_grain(result, amount=0.025, size=1)
-        result = apply_vignette(result, strength=0.35, radius=0.75)
-
-    elif style == "retro_70s":
-        result = apply_cross_process(result, intensity=0.25)
-        result = apply_film_fade(result, fade_amount=0.2, black_fade=0.1)
-        result = apply_split_toning(result, shadow_hue=30, shadow_sat=0.2,
-                                   highlight_hue=55, highlight_sat=0.18)
-        result = adjust_saturation(result, scale=0.9)
-        result = apply_grain(result, amount=0.03, size=1)
-        result = apply_vignette(result, strength=0.4, radius=0.7)
-
-    elif style == "polaroid":
-        result = apply_film_fade(result, fade_amount=0.15, black_fade=0.08)
-        result = apply_split_toning(result, shadow_hue=45, shadow_sat=0.15,
-                                   highlight_hue=180, highlight_sat=0.08)
-        result = adjust_contrast(result, value=1.02)
-        result = adjust_saturation(result, scale=0.9)
-        b, g, r = cv2.split(result.astype(np.float32))
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
-        shadow_mask = np.clip(1 - gray * 2, 0, 1)
-        b = b + shadow_mask * 10
-        g = g + shadow_mask * 6
-        result = cv2.merge([np.clip(b, 0, 255).astype(np.uint8),
-                           np.clip(g, 0, 255).astype(np.uint8),
-                           np.clip(r, 0, 255).astype(np.uint8)])
-        result = apply_vignette(result, strength=0.3, radius=0.8)
-
-    elif style == "kodachrome":
-        result = adjust_saturation(result, scale=1.15)
-        result = adjust_contrast(result, value=1.1)
-        result = apply_split_toning(result, shadow_hue=220, shadow_sat=0.1,
-                                   highlight_hue=40, highlight_sat=0.15)
-        b, g, r = cv2.split(result.astype(np.float32))
-        r = r * 1.05
-        result = cv2.merge([b.astype(np.uint8), g.astype(np.uint8),
-                           np.clip(r, 0, 255).astype(np.uint8)])
-        result = apply_grain(result, amount=0.02, size=1)
-
-    elif style in ["cinematic_teal_orange", "cinematic"]:
-        result = apply_teal_and_orange(result, intensity=0.4)
-        result = adjust_contrast(result, value=1.12)
-        result = apply_curves(result, shadows=-8, midtones=0, highlights=5)
-        result = apply_vignette(result, strength=0.35, radius=0.72)
-        result = apply_film_fade(result, fade_amount=0.08, black_fade=0.04)
-
-    elif style == "blockbuster":
-        result = apply_teal_and_orange(result, intensity=0.45)
-        result = adjust_contrast(result, value=1.18)
-        result = adjust_saturation(result, scale=1.08)
-        result = apply_vignette(result, strength=0.38, radius=0.7)
-        result = apply_glow(result, intensity=0.1, radius=21)
-
-    elif style == "indie_film":
-        result = adjust_saturation(result, scale=0.88)
-        result = apply_film_fade(result, fade_amount=0.12, black_fade=0.06)
-        result = apply_split_toning(result, shadow_hue=200, shadow_sat=0.12,
-                                   highlight_hue=45, highlight_sat=0.08)
-        result = adjust_contrast(result, value=1.03)
-        result = apply_grain(result, amount=0.025, size=1)
-
-    elif style == "golden_hour":
-        result = apply_split_toning(result, shadow_hue=30, shadow_sat=0.12,
-                                   highlight_hue=50, highlight_sat=0.2)
-        result = adjust_temp_tint(result, temp=20, tint=4)
-        result = adjust_saturation(result, scale=1.1)
-        result = apply_glow(result, intensity=0.1, radius=31)
-        result = apply_haze(result, amount=0.03, color=(255, 240, 210))
-
-    elif style == "morning_light":
-        result = adjust_temp_tint(result, temp=12, tint=2)
-        result = adjust_exposure(result, value=8)
-        result = apply_split_toning(result, shadow_hue=220, shadow_sat=0.06,
-                                   highlight_hue=45, highlight_sat=0.15)
-        result = adjust_saturation(result, scale=1.05)
-        result = apply_glow(result, intensity=0.08, radius=25)
-        result = apply_haze(result, amount=0.02, color=(255, 248, 240))
-
-    elif style == "sunrise":
-        result = apply_split_toning(result, shadow_hue=250, shadow_sat=0.1,
-                                   highlight_hue=35, highlight_sat=0.22)
-        result = adjust_temp_tint(result, temp=18, tint=6)
-        result = adjust_saturation(result, scale=1.12)
-        result = apply_glow(result, intensity=0.12, radius=31)
-
-    elif style == "sunset":
-        result = apply_split_toning(result, shadow_hue=285, shadow_sat=0.12,
-                                   highlight_hue=28, highlight_sat=0.28)
-        result = adjust_temp_tint(result, temp=25, tint=10)
-        result = adjust_saturation(result, scale=1.2)
-        result = adjust_vibrance(result, strength=0.3)
-        result = apply_glow(result, intensity=0.12, radius=31)
-
-    elif style == "warm_glow":
-        result = adjust_temp_tint(result, temp=22, tint=4)
-        result = adjust_saturation(result, scale=1.08)
-        result = apply_orton_effect(result, blur_amount=25, blend=0.18)
-        result = apply_split_toning(result, shadow_hue=35, shadow_sat=0.1,
-                                   highlight_hue=50, highlight_sat=0.15)
-
-    elif style == "magic_hour":
-        result = apply_split_toning(result, shadow_hue=280, shadow_sat=0.08,
-                                   highlight_hue=40, highlight_sat=0.25)
-        result = adjust_temp_tint(result, temp=20, tint=8)
-        result = adjust_saturation(result, scale=1.12)
-        result = apply_orton_effect(result, blur_amount=21, blend=0.15)
-        result = apply_haze(result, amount=0.04, color=(255, 235, 210))
-
-    elif style == "black_and_white":
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
-        result = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        result = adjust_contrast(result, value=1.1)
-
-    elif style == "high_contrast_bw":
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
-        result = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        result = adjust_contrast(result, value=1.3)
-        result = apply_curves(result, shadows=-15, midtones=8, highlights=12)
-
-    elif style == "film_noir_bw":
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
-        result = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        result = adjust_contrast(result, value=1.35)
-        result = apply_curves(result, shadows=-18, midtones=5, highlights=15)
-        result = apply_vignette(result, strength=0.55, radius=0.55)
-        result = apply_grain(result, amount=0.035, size=1)
-
-    elif style == "silver":
-        gray = cv2.cvtColor(result, cv2.COLOR_BGR2GRAY)
-        result = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        result = adjust_exposure(result, value=8)
-        result = adjust_contrast(result, value=1.15)
-        result = apply_curves(result, shadows=8, midtones=5, highlights=0)
-
-    elif style == "dream":
-        result = apply_orton_effect(result, blur_amount=25, blend=0.22)
-        result = adjust_saturation(result, scale=0.92)
-        result = apply_split_toning(result, shadow_hue=260, shadow_sat=0.12,
-                                   highlight_hue=50, highlight_sat=0.1)
-        result = apply_haze(result, amount=0.08, color=(220, 210, 230))
-        result = apply_glow(result, intensity=0.18, radius=35)
-
-    elif style == "ethereal":
-        result = adjust_exposure(result, value=15)
-        result = adjust_contrast(result, value=0.9)
-        result = adjust_saturation(result, scale=0.85)
-        result = apply_orton_effect(result, blur_amount=21, blend=0.2)
-        result = apply_haze(result, amount=0.1, color=(240, 235, 250))
-        result = apply_glow(result, intensity=0.22, radius=41)
-
-    elif style == "horror":
-        result = adjust_exposure(result, value=-15)
-        result = adjust_saturation(result, scale=0.7)
-        result = apply_split_toning(result, shadow_hue=160, shadow_sat=0.25,
-                                   highlight_hue=40, highlight_sat=0.1)
-        result = adjust_contrast(result, value=1.2)
-        result = apply_vignette(result, strength=0.6, radius=0.5)
-        result = apply_grain(result, amount=0.03, size=1)
-
-    elif style == "western":
-        result = apply_split_toning(result, shadow_hue=35, shadow_sat=0.22,
-                                   highlight_hue=45, highlight_sat=0.18)
-        result = adjust_temp_tint(result, temp=20, tint=6)
-        result = adjust_saturation(result, scale=0.92)
-        result = apply_haze(result, amount=0.08, color=(220, 200, 170))
-        result = apply_film_fade(result, fade_amount=0.12, black_fade=0.06)
-        result = apply_vignette(result, strength=0.35, radius=0.75)
-
-    elif style == "underwater":
-        result = apply_split_toning(result, shadow_hue=195, shadow_sat=0.35,
-                                   highlight_hue=180, highlight_sat=0.3)
-        result = adjust_temp_tint(result, temp=-30, tint=-10)
-        result = adjust_saturation(result, scale=0.85)
-        result = apply_haze(result, amount=0.18, color=(180, 200, 180))
-        result = adjust_contrast(result, value=0.9)
+    for tool_name, params in preset_steps(style):
+        result = globals()[tool_name](result, **params)
 
     return result
@@ -4,10 +4,14 @@ load_dotenv()
 import json
 import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from pathlib import Path
-from openai import OpenAI
 import sys
 
+import image_transport
+import model_client
+import upload_cache
+
 sys.stdout.reconfigure(encoding='utf-8')
 
 try:
@@ -24,8 +28,9 @@ except Exception as exc:
     raise RuntimeError("cloudinary SDK is required. Install with: pip install cloudinary") from exc
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+# Shared with the other modules: one connection pool, retries with backoff.
+client = model_client.get_client(
+    base_url=model_client.BASE_URL,
     api_key=OPENROUTER_API_KEY
 )
 
@@ -36,19 +41,23 @@ SAVE_PAYLOADS = True
 PAYLOAD_DIR = "payloads_qwen_openrouter"
 os.makedirs(PAYLOAD_DIR, exist_ok=True)
 
+# Images of one call (original + up to 5 previews) are uploaded in parallel;
+# an upload not finished UPLOAD_TIMEOUT_S after it started is left out of the message.
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "6"))
+UPLOAD_TIMEOUT_S = float(os.getenv("UPLOAD_TIMEOUT_S", "20"))
+# How often a queued upload is checked for having started.
+UPLOAD_POLL_S = 0.05
+
 
 cloudinary.config(
     CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME"),
 CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY"),
 CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET"),
+    # Upload API base URL; point at a local stub server to test uploads offline.
+    upload_prefix=os.getenv("CLOUDINARY_UPLOAD_PREFIX"),
     secure=False,
 )
 
-CACHE_PATH = os.path.join(PAYLOAD_DIR, "cloudinary_cache.json")
-if not os.path.exists(CACHE_PATH):
-    with open(CACHE_PATH, "w", encoding="utf8") as f:
-        json.dump({}, f)
-
 SYSTEM_PROMPT_FIRST = """You are PhotoArtAgent, an expert photo editor with access to BOTH basic adjustments AND creative effects.
 
 ═══════════════════════════════════════════════════════════════════════════════
@@ -316,54 +325,70 @@ def _ensure_full_parameters(parsed):
     return parsed
 
 
-def _load_cache():
-    try:
-        with open(CACHE_PATH, "r", encoding="utf8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-def _save_cache(cache):
-    try:
-        with open(CACHE_PATH, "w", encoding="utf8") as f:
-            json.dump(cache, f, indent=2)
-    except Exception:
-        pass
+def _cloudinary_upload(file_obj, digest):
+    # Named by content digest, so one URL always serves the same bytes.
+    res = cloudinary.uploader.upload(
+        file_obj,
+        resource_type="image",
+        public_id=digest,
+        overwrite=False,
+        timeout=UPLOAD_TIMEOUT_S
+    )
+    secure_url = res.get("secure_url")
+    if not secure_url:
+        raise RuntimeError("Cloudinary upload missing secure_url")
+    return secure_url
 
 
 def _upload_to_cloudinary(local_path):
-    cache = _load_cache()
     lp = str(Path(local_path).resolve()).replace("\\", "/")
-
-    import hashlib
-    with open(lp, "rb") as f:
-        md5 = hashlib.md5(f.read()).hexdigest()
-
-    cache_key = f"{lp}::{md5}"
-
-    if cache_key in cache:
-        return cache[cache_key]
-
     try:
-        res = cloudinary.uploader.upload(
-            lp,
-            resource_type="image",
-            use_filename=True,
-            unique_filename=False,
-            overwrite=True
-        )
-        secure_url = res.get("secure_url")
-        if secure_url:
-            cache[cache_key] = secure_url
-            _save_cache(cache)
-            return secure_url
-        else:
-            raise RuntimeError("Cloudinary upload missing secure_url")
+        return upload_cache.get_cache().upload(lp, _cloudinary_upload)
     except Exception:
         return None
 
 
+def _await_upload(future, started, index):
+    """Result of an upload future, allowing UPLOAD_TIMEOUT_S from when it started running."""
+    while True:
+        begun = started.get(index)
+        wait = UPLOAD_POLL_S if begun is None else begun + UPLOAD_TIMEOUT_S - time.monotonic()
+        try:
+            return future.result(timeout=max(0.0, wait))
+        except FuturesTimeout:
+            if begun is not None:
+                raise
+
+
+def _resolve_image_urls(paths, to_image_url):
+    """
+    to_image_url(p) for every path, at most UPLOAD_WORKERS at a time on a pool
+    of this call's own, so one session's uploads never queue behind another's.
+    URLs come back in the order of paths; an upload that fails, or is still
+    running UPLOAD_TIMEOUT_S after it started, gives None.
+    """
+    started = {}
+
+    def resolve(index, path):
+        started[index] = time.monotonic()
+        return to_image_url(path)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(UPLOAD_WORKERS, len(paths))),
+                              thread_name_prefix="upload-")
+    futures = [pool.submit(resolve, i, p) for i, p in enumerate(paths)]
+    # A late upload still finishes in the background and lands in the cache.
+    pool.shutdown(wait=False)
+
+    urls = []
+    for i, (p, future) in enumerate(zip(paths, futures)):
+        try:
+            urls.append(_await_upload(future, started, i))
+        except Exception as e:
+            print(f" Upload of {os.path.basename(p)} failed: {str(e) or 'timed out'}")
+            urls.append(None)
+    return urls
+
+
 def get_analysis(user_prompt, image_path):
     prompt = f"""User goal: "{user_prompt}"
 
@@ -377,7 +402,7 @@ Analyze image and describe editing strategy:
 
 Output: Plain language strategy (no parameters)."""
 
-    img_url = _upload_to_cloudinary(image_path)
+    img_url = image_transport.image_url(image_path, _upload_to_cloudinary)
     messages = [
         {"role": "system", "content": "You are an expert photo editing strategist."},
         {"role": "user", "content": [
@@ -386,7 +411,8 @@ Output: Plain language strategy (no parameters)."""
         ]}
     ]
 
-    resp = client.chat.completions.create(
+    resp = client.call_sync(
+        "chat.completions",
         model=MODEL_NAME,
         messages=messages,
         extra_headers={"HTTP-Referer": "https://google.com", "X-Title": "Planner"}
@@ -394,13 +420,20 @@ Output: Plain language strategy (no parameters)."""
     return resp.choices[0].message.content.strip()
 
 
-def get_next_step(user_prompt, original_image_path, history, iteration=1, is_first=True):
+def get_next_step(user_prompt, original_image_path, history, iteration=1, is_first=True, assets=None):
+    """assets: the session's AssetRegistry; images already in it are not re-read."""
     print(f"\n Iteration {iteration} - Preparing API call...")
 
+    def upload(p):
+        if assets is not None:
+            try:
+                return assets.url(p, _cloudinary_upload)
+            except Exception:
+                return None
+        return _upload_to_cloudinary(p)
+
     def to_image_url(p):
-        p = str(Path(p).resolve()).replace("\\", "/")
-        url = _upload_to_cloudinary(p)
-        return url or p
+        return image_transport.image_url(p, upload)
 
     compact_history = []
     for idx, entry in enumerate(history[-3:], start=max(1, len(history) - 2)):
@@ -427,29 +460,29 @@ def get_next_step(user_prompt, original_image_path, history, iteration=1, is_fir
     print(f" Prompt size: {len(prompt_text)} chars")
     content = [{"type": "text", "text": prompt_text}]
 
-    if is_first:
-        orig_url = to_image_url(original_image_path)
-        if not (orig_url and orig_url.startswith("http")):
-            return _neutral_block("Cloudinary upload failed")
+    image_paths = [original_image_path]
+    if not is_first:
+        image_paths += [entry["image_path"] for entry in history if entry.get("image_path")]
 
-        content.append({"type": "image_url", "image_url": {"url": orig_url}})
-        print(f" Images sent: 1 (original only)")
+    upload_start = time.perf_counter()
+    urls = _resolve_image_urls(image_paths, to_image_url)
+    print(f" Resolved {len(urls)} image URL(s) in {time.perf_counter() - upload_start:.2f}s")
 
-    else:
-        orig_url = to_image_url(original_image_path)
-        if not (orig_url and orig_url.startswith("http")):
-            return _neutral_block("Cloudinary upload failed")
+    orig_url = urls[0]
+    if not image_transport.is_image_url(orig_url):
+        return _neutral_block("Image transport failed")
 
-        content.append({"type": "image_url", "image_url": {"url": orig_url}})
+    content.append({"type": "image_url", "image_url": {"url": orig_url}})
 
+    if is_first:
+        print(f" Images sent: 1 (original only)")
+
+    else:
         count = 1
-        for entry in history:
-            ip = entry.get("image_path")
-            if ip:
-                url = to_image_url(ip)
-                if url and url.startswith("http"):
-                    content.append({"type": "image_url", "image_url": {"url": url}})
-                    count += 1
+        for url in urls[1:]:
+            if image_transport.is_image_url(url):
+                content.append({"type": "image_url", "image_url": {"url": url}})
+                count += 1
 
         print(f" Images sent: {count} (original + {count - 1} previous previews)")
 
@@ -463,7 +496,8 @@ def get_next_step(user_prompt, original_image_path, history, iteration=1, is_fir
 
         print(f" Calling OpenRouter API (system prompt: {len(system_prompt)} chars)...")
 
-        resp = client.chat.completions.create(
+        resp = client.call_sync(
+            "chat.completions",
             model=MODEL_NAME,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -0,0 +1,280 @@
+"""
+Panel Program - fused renderer for the basic adjustment panel
+==============================================================
+Compiles a clamped parameter dict into a small program of float32 passes.
+Each pass converts to its colour space once, runs every adjacent stage that
+works in that space, and converts back without re-quantising to uint8.
+Identity stages (exposure 0, contrast 1.0, neutral mixer channels, ...) are
+dropped at compile time. Creative tools with a kernel here (FUSED_TOOLS) that
+directly follow the basic panel join it, so e.g. apply_split_toning shares the
+LAB conversion of adjust_temp_tint.
+
+The stage maths mirrors the CPU branch of the matching opencv_tools functions.
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+
+import opencv_tools
+import pipeline
+
+
+BASIC_TOOLS = pipeline.BASIC_TOOLS
+
+# Tools the program has a float kernel for, in pipeline order.
+FUSED_TOOLS = BASIC_TOOLS + ["apply_split_toning"]
+
+STAGE_SPACE = {name: pipeline.REGISTRY[name].space for name in FUSED_TOOLS}
+
+# Passes that need a cvtColor round trip; HSV edits are applied on BGR directly.
+CONVERTING_SPACES = {"lab", "hls"}
+
+# Pixels per band in PanelProgram.run; ~16 rows of a 24 MP frame.
+BAND_PIXELS = 96_000
+
+MIXER_CHANNELS = ["red", "orange", "yellow", "green", "cyan", "blue", "purple"]
+
+# Parameters under which every basic tool is an identity stage.
+NEUTRAL_PANEL = {
+    "adjust_exposure": {"value": 0.0},
+    "adjust_contrast": {"value": 1.0},
+    "adjust_highlights": {"value": 0.0},
+    "adjust_shadows": {"value": 0.0},
+    "adjust_whites": {"value": 0.0},
+    "adjust_blacks": {"value": 0.0},
+    "adjust_temp_tint": {"temp": 0.0, "tint": 0.0},
+    "adjust_saturation": {"scale": 1.0},
+    "adjust_vibrance": {"strength": 0.0},
+    "adjust_color_mixer": {
+        ch: {"hue_shift": 0, "sat_scale": 1.0, "lum_scale": 1.0}
+        for ch in MIXER_CHANNELS
+    },
+}
+
+# (tool, threshold, mode, sign) - same thresholds as opencv_tools.adjust_*
+MASKED_STAGES = {
+    "adjust_highlights": (200, "highlight", 1.0),
+    "adjust_shadows": (80, "shadow", -1.0),
+    "adjust_whites": (230, "highlight", 1.0),
+    "adjust_blacks": (40, "shadow", 1.0),
+}
+
+
+def _mixer_channel_is_neutral(cfg) -> bool:
+    if not isinstance(cfg, dict):
+        return True
+    return (float(cfg.get("hue_shift", 0)) == 0
+            and float(cfg.get("sat_scale", 1.0)) == 1.0
+            and float(cfg.get("lum_scale", 1.0)) == 1.0)
+
+
+def is_identity(tool_name: str, params: Dict) -> bool:
+    """True when a basic tool with these params leaves the image unchanged."""
+    params = params or {}
+    if tool_name in ("adjust_exposure", "adjust_highlights", "adjust_shadows",
+                     "adjust_whites", "adjust_blacks"):
+        return float(params.get("value", 0.0)) == 0.0
+    if tool_name == "adjust_contrast":
+        return float(params.get("value", 1.0)) == 1.0
+    if tool_name == "adjust_temp_tint":
+        return float(params.get("temp", 0.0)) == 0.0 and float(params.get("tint", 0.0)) == 0.0
+    if tool_name == "adjust_saturation":
+        return float(params.get("scale", 1.0)) == 1.0
+    if tool_name == "adjust_vibrance":
+        return float(params.get("strength", 0.0)) == 0.0
+    if tool_name == "adjust_color_mixer":
+        return all(_mixer_channel_is_neutral(params.get(ch)) for ch in MIXER_CHANNELS)
+    if tool_name == "apply_split_toning":
+        return float(params.get("shadow_sat", 0.3)) == 0.0 and float(params.get("highlight_sat", 0.2)) == 0.0
+    return False
+
+
+# --- stage kernels -----------------------------------------------------------
+# BGR and HSV/HLS S, V, L planes are kept on the 0-255 scale so thresholds and
+# offsets match the uint8 tools; hue stays in degrees (0-360).
+
+def _run_bgr(bgr: np.ndarray, stages: List[Tuple[str, Dict]]) -> np.ndarray:
+    for tool_name, params in stages:
+        if tool_name == "adjust_exposure":
+            bgr += float(params.get("value", 0.0))
+        else:
+            bgr *= float(params.get("value", 1.0))
+        # convertScaleAbs semantics: |alpha * x + beta| saturated to 255
+        np.abs(bgr, out=bgr)
+        np.minimum(bgr, 255.0, out=bgr)
+    return bgr
+
+
+def _run_hsv(bgr: np.ndarray, stages: List[Tuple[str, Dict]]) -> np.ndarray:
+    # HSV keeps hue fixed for every stage in this pass, so V and S edits are
+    # applied straight to the BGR planes: each channel sits at a hue-dependent
+    # fraction of the way from V down to min(B, G, R), and that fraction is
+    # preserved. No colour-space conversion is needed.
+    b, g, r = cv2.split(bgr)
+    v = cv2.max(cv2.max(b, g), r)
+    chroma = cv2.subtract(v, cv2.min(cv2.min(b, g), r))
+    s = cv2.divide(chroma, np.maximum(v, 1e-6), scale=255.0)
+    v_new = v.copy()
+
+    for tool_name, params in stages:
+        if tool_name in MASKED_STAGES:
+            threshold, mode, sign = MASKED_STAGES[tool_name]
+            value = sign * float(params.get("value", 0.0))
+            mask = v_new > threshold if mode == "highlight" else v_new <= threshold
+            np.add(v_new, value, out=v_new, where=mask)
+            np.clip(v_new, 0, 255, out=v_new)
+        elif tool_name == "adjust_saturation":
+            s *= float(params.get("scale", 1.0))
+            np.clip(s, 0, 255, out=s)
+        elif tool_name == "adjust_vibrance":
+            strength = float(params.get("strength", 0.0))
+            s += strength * (1.0 - s * (1.0 / 255.0)) * s
+            np.clip(s, 0, 255, out=s)
+
+    new_chroma = cv2.multiply(s, v_new, scale=1.0 / 255.0)
+    scale = cv2.divide(new_chroma, np.maximum(chroma, 1e-6))
+    planes = [cv2.subtract(v_new, cv2.multiply(cv2.subtract(v, plane), scale)) for plane in (b, g, r)]
+    return cv2.merge(planes)
+
+
+def _hue_to_ab(hue: float) -> Tuple[float, float]:
+    rad = np.radians(hue)
+    return float(np.sin(rad) * 40), float(np.cos(rad) * 40)
+
+
+def _run_lab(bgr: np.ndarray, stages: List[Tuple[str, Dict]]) -> np.ndarray:
+    # Float LAB: L in 0-100, a/b centred on 0 (uint8 LAB is L * 2.55, a/b + 128).
+    lab = cv2.cvtColor(bgr * (1.0 / 255.0), cv2.COLOR_BGR2LAB)
+    l, a, b_ch = cv2.split(lab)
+
+    for tool_name, params in stages:
+        if tool_name == "apply_split_toning":
+            l_norm = l * (1.0 / 100.0)
+            for mask, hue, sat in (
+                (np.clip(1.0 - l_norm * 2, 0, 1), params.get("shadow_hue", 220), params.get("shadow_sat", 0.3)),
+                (np.clip(l_norm * 2 - 1, 0, 1), params.get("highlight_hue", 40), params.get("highlight_sat", 0.2)),
+            ):
+                shift_a, shift_b = _hue_to_ab(float(hue))
+                a += mask * (shift_a * float(sat))
+                b_ch += mask * (shift_b * float(sat))
+        else:
+            b_ch += float(params.get("temp", 0.0)) * 0.25
+            a += float(params.get("tint", 0.0)) * 0.20
+        np.clip(b_ch, -128, 127, out=b_ch)
+        np.clip(a, -128, 127, out=a)
+
+    out = cv2.cvtColor(cv2.merge((l, a, b_ch)), cv2.COLOR_LAB2BGR)
+    out *= 255.0
+    np.clip(out, 0, 255, out=out)
+    return out
+
+
+def _run_hls(bgr: np.ndarray, stages: List[Tuple[str, Dict]]) -> np.ndarray:
+    hls = cv2.cvtColor(bgr * (1.0 / 255.0), cv2.COLOR_BGR2HLS)
+    h, l, s = cv2.split(hls)
+
+    for _, params in stages:
+        # Per-hue (shift, sat, lum) from the mixer table, gathered with cv2.LUT
+        # on the 8-bit hue index.
+        table = opencv_tools.mixer_table(params, float(params.get("falloff", 0.0)))
+        hue_index = (np.rint(h * 0.5).astype(np.int32) % 180).astype(np.uint8)
+        shift, sat, lum = (cv2.LUT(hue_index, np.resize(table[:, k], 256)) for k in range(3))
+        h = (h + 2.0 * shift) % 360.0
+        s = np.minimum(s * sat, 1.0)
+        l = np.minimum(l * lum, 1.0)
+
+    out = cv2.cvtColor(cv2.merge((h, l, s)), cv2.COLOR_HLS2BGR)
+    out *= 255.0
+    return out
+
+
+PASS_RUNNERS = {
+    "bgr": _run_bgr,
+    "hsv": _run_hsv,
+    "lab": _run_lab,
+    "hls": _run_hls,
+}
+
+
+class PanelProgram:
+    """A compiled basic panel: an ordered list of (colour space, stages) passes."""
+
+    def __init__(self, passes: List[Tuple[str, List[Tuple[str, Dict]]]], skipped: List[str]):
+        self.passes = passes
+        self.skipped = skipped
+
+    @property
+    def is_identity(self) -> bool:
+        return not self.passes
+
+    @property
+    def stages(self) -> List[str]:
+        return [tool_name for _, stages in self.passes for tool_name, _ in stages]
+
+    def run_float(self, bgr: np.ndarray) -> np.ndarray:
+        """Run the program on a float32 BGR image (0-255); may modify the input."""
+        for space, stages in self.passes:
+            bgr = PASS_RUNNERS[space](bgr, stages)
+        return bgr
+
+    def run(self, image: np.ndarray) -> np.ndarray:
+        """Run the program on a uint8 BGR image and quantise once at the end."""
+        if self.is_identity:
+            return image.copy()
+
+        # Every stage is per-pixel, so the image is streamed through the whole
+        # program in row bands small enough to stay in cache between passes.
+        out = np.empty_like(image)
+        rows = max(1, BAND_PIXELS // max(1, image.shape[1]))
+        for y in range(0, image.shape[0], rows):
+            band = self.run_float(image[y:y + rows].astype(np.float32))
+            band += 0.5
+            np.clip(band, 0, 255, out=band)
+            out[y:y + rows] = band
+        return out
+
+    def describe(self) -> str:
+        parts = [f"{space}[{', '.join(t for t, _ in stages)}]" for space, stages in self.passes]
+        return " -> ".join(parts) if parts else "identity"
+
+    def trace(self) -> Dict[str, int]:
+        """
+        Colour conversions and uint8 round trips of this program against running
+        its stages as separate tools (each converts there and back, and quantises).
+        """
+        tool_conversions = sum(2 for space, stages in self.passes if space != "bgr" for _ in stages)
+        conversions = sum(2 for space, _ in self.passes if space in CONVERTING_SPACES)
+        stages = len(self.stages)
+        return {
+            "stages": stages,
+            "passes": len(self.passes),
+            "conversions": conversions,
+            "conversions_saved": tool_conversions - conversions,
+            "quantisations_saved": max(0, stages - 1),
+        }
+
+
+def compile_panel(params: Dict) -> PanelProgram:
+    """
+    Compile clamped basic-panel params (see pipeline.clamp_params), plus any
+    normalised FUSED_TOOLS creative params, into a PanelProgram.
+    """
+    passes: List[Tuple[str, List[Tuple[str, Dict]]]] = []
+    skipped = []
+
+    for tool_name in FUSED_TOOLS:
+        if tool_name not in params and tool_name not in BASIC_TOOLS:
+            continue
+        tool_params = params.get(tool_name) or {}
+        if is_identity(tool_name, tool_params):
+            skipped.append(tool_name)
+            continue
+
+        space = STAGE_SPACE[tool_name]
+        if passes and passes[-1][0] == space:
+            passes[-1][1].append((tool_name, tool_params))
+        else:
+            passes.append((space, [(tool_name, tool_params)]))
+
+    return PanelProgram(passes, skipped)
@@ -0,0 +1,713 @@
+"""
+Pipeline - the one panel executor shared by the API, the CLI and the semantic editor
+====================================================================================
+STAGES is a declarative registry of every panel tool in the order it runs. Each
+entry records whether the tool is pointwise (a pure function of the pixel
+colour, so it can be fused and baked into a LUT), spatial (needs neighbouring
+pixels), global (needs the whole frame) or dynamic (depends on its params), the
+colour space it works in, and its rough cost.
+
+A parameter dict is sanitised (canonical_params), turned
+into ordered stages (build_stages) and rendered (render) with the fused panel
+program, LUT baking and, for very large frames, strip tiling.
+
+render(..., precision="float") keeps every intermediate in float32 (0-255)
+from the decoded original, 16-bit PNG/TIFF included, to the encoder, where
+quantize() rounds to 8 bits once with a light dither instead of once per stage.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import opencv_tools
+
+
+class StageSpec(NamedTuple):
+    name: str
+    kind: str     # "pointwise", "spatial", "global" or "dynamic"
+    space: str    # colour space the tool converts to and works in
+    cost: float   # ms per megapixel, CPU implementation, single core, cold caches
+    # Params (with their defaults) that scale the effect; all zero is a no-op.
+    strength: Optional[Dict[str, float]] = None
+
+
+STAGES: List[StageSpec] = [
+    StageSpec("adjust_exposure", "pointwise", "bgr", 1),
+    StageSpec("adjust_contrast", "pointwise", "bgr", 2),
+    StageSpec("adjust_highlights", "pointwise", "hsv", 25),
+    StageSpec("adjust_shadows", "pointwise", "hsv", 23),
+    StageSpec("adjust_whites", "pointwise", "hsv", 26),
+    StageSpec("adjust_blacks", "pointwise", "hsv", 18),
+    StageSpec("adjust_temp_tint", "pointwise", "lab", 36),
+    StageSpec("adjust_saturation", "pointwise", "hsv", 13),
+    StageSpec("adjust_vibrance", "pointwise", "hsv", 19),
+    StageSpec("adjust_color_mixer", "pointwise", "hls", 26),
+    StageSpec("apply_split_toning", "pointwise", "lab", 134, {"shadow_sat": 0.3, "highlight_sat": 0.2}),
+    StageSpec("apply_color_overlay", "pointwise", "bgr", 103, {"opacity": 0.2}),
+    StageSpec("apply_curves", "pointwise", "bgr", 3, {"shadows": 0, "midtones": 0, "highlights": 0}),
+    StageSpec("apply_vignette", "spatial", "bgr", 34, {"strength": 0.5}),
+    StageSpec("apply_glow", "spatial", "gray", 142, {"intensity": 0.3}),
+    StageSpec("apply_grain", "spatial", "bgr", 31, {"amount": 0.03}),
+    StageSpec("apply_duotone", "pointwise", "gray", 48),
+    StageSpec("apply_haze", "pointwise", "bgr", 39, {"amount": 0.2}),
+    StageSpec("apply_film_fade", "pointwise", "bgr", 29, {"fade_amount": 0.3, "black_fade": 0.15}),
+    StageSpec("apply_clarity", "spatial", "bgr", 54, {"amount": 0.5}),
+    StageSpec("apply_dehaze", "global", "lab", 36),
+    StageSpec("apply_orton_effect", "spatial", "gray", 66, {"blend": 0.3}),
+    StageSpec("apply_cross_process", "pointwise", "bgr", 41, {"intensity": 0.5}),
+    StageSpec("apply_bleach_bypass", "pointwise", "gray", 11, {"intensity": 0.5}),
+    StageSpec("apply_teal_and_orange", "pointwise", "gray", 87, {"intensity": 0.5}),
+    # Pointwise except for the grades/presets with spatial steps (lut3d.is_pointwise).
+    StageSpec("apply_lut_color_grade", "dynamic", "bgr", 135),
+    StageSpec("apply_style_preset", "dynamic", "bgr", 221),
+]
+
+REGISTRY: Dict[str, StageSpec] = {spec.name: spec for spec in STAGES}
+
+# The basic adjustment panel; always present after clamp_params.
+BASIC_TOOLS = [spec.name for spec in STAGES if spec.name.startswith("adjust_")]
+
+# Older parameter keys mapped to their stage.
+PARAM_ALIASES = {"style_preset": "apply_style_preset"}
+
+# Cost model (ms per megapixel, single core) for what render_stages actually
+# runs: baked LUT lookups by lut3d.lut_kind, and fused panel passes by space.
+LUT_COST = {"3d": 49, "separable": 5, "mono": 6}
+PASS_COST = {"bgr": 6, "hsv": 28, "lab": 39, "hls": 59}
+
+# A render is reported as slow when it takes longer than this multiple of its
+# estimate plus a fixed allowance for small frames.
+SLOW_RENDER_FACTOR = 2.0
+SLOW_RENDER_SLACK_MS = 50.0
+
+_timings = {"renders": 0, "slow_renders": 0, "expected_ms": 0.0, "actual_ms": 0.0}
+_timings_lock = threading.Lock()
+
+
+def tools_of_kind(kind: str) -> set:
+    return {spec.name for spec in STAGES if spec.kind == kind}
+
+
+def get_toolbox(use_lut: bool = True) -> Dict[str, Callable]:
+    """Stage name -> tool function; presets come from the LUT bank when use_lut."""
+    toolbox = {spec.name: getattr(opencv_tools, spec.name) for spec in STAGES}
+    if use_lut:
+        import preset_bank
+        toolbox["apply_style_preset"] = preset_bank.apply_preset
+    return toolbox
+
+
+def clamp(value: float, mn: float, mx: float) -> float:
+    """Clamp a value to a range."""
+    try:
+        return max(mn, min(mx, float(value)))
+    except:
+        return mn
+
+
+def rgb_to_hue(rgb: List[int]) -> float:
+    """Convert RGB color [R,G,B] to hue (0-360)."""
+    if not rgb or len(rgb) < 3:
+        return 0
+    r, g, b = rgb[0] / 255.0, rgb[1] / 255.0, rgb[2] / 255.0
+    max_c = max(r, g, b)
+    min_c = min(r, g, b)
+    diff = max_c - min_c
+    if diff == 0:
+        return 0
+    if max_c == r:
+        hue = 60 * ((g - b) / diff % 6)
+    elif max_c == g:
+        hue = 60 * ((b - r) / diff + 2)
+    else:
+        hue = 60 * ((r - g) / diff + 4)
+    return hue if hue >= 0 else hue + 360
+
+
+def clamp_params(params: Dict) -> Dict:
+    """
+    Clamp parameters to balanced, safe ranges.
+    Key insight: Brightness controls need to be CONSERVATIVE to avoid washing out!
+    Color controls (temp, saturation) can be more aggressive.
+    """
+    def _c(val, mn, mx):
+        try:
+            return max(mn, min(mx, float(val)))
+        except:
+            return mn
+
+    result = params.copy()
+
+    mixer = result.get("adjust_color_mixer", {})
+    new_mixer = {}
+    for ch in ["red", "orange", "yellow", "green", "cyan", "blue", "purple"]:
+        cfg = mixer.get(ch, {})
+        if not isinstance(cfg, dict):
+            cfg = {}
+        hue = int(_c(cfg.get("hue_shift", 0), -20, 20))
+        sat = _c(cfg.get("sat_scale", 1.0), 0.5, 1.8)
+        lum = _c(cfg.get("lum_scale", 1.0), 0.7, 1.3)
+        new_mixer[ch] = {"hue_shift": hue, "sat_scale": sat, "lum_scale": lum}
+    # Optional smooth band edges (hue steps on the 0-179 scale).
+    if isinstance(mixer, dict) and mixer.get("falloff"):
+        new_mixer["falloff"] = _c(mixer["falloff"], 0.0, 15.0)
+    result["adjust_color_mixer"] = new_mixer
+
+    if "adjust_exposure" in result:
+        exp = result["adjust_exposure"]
+        val = exp.get("value", 0.0) if isinstance(exp, dict) else exp
+        result["adjust_exposure"] = {"value": _c(val, -35, 15)}
+    else:
+        result["adjust_exposure"] = {"value": 0.0}
+
+    if "adjust_contrast" in result:
+        con = result["adjust_contrast"]
+        val = con.get("value", 1.0) if isinstance(con, dict) else con
+        result["adjust_contrast"] = {"value": _c(val, 0.85, 1.35)}
+    else:
+        result["adjust_contrast"] = {"value": 1.0}
+
+    if "adjust_highlights" in result:
+        hl = result["adjust_highlights"]
+        val = hl.get("value", 0.0) if isinstance(hl, dict) else hl
+        result["adjust_highlights"] = {"value": _c(val, -35, 10)}
+    else:
+        result["adjust_highlights"] = {"value": 0.0}
+
+    if "adjust_shadows" in result:
+        sh = result["adjust_shadows"]
+        val = sh.get("value", 0.0) if isinstance(sh, dict) else sh
+        result["adjust_shadows"] = {"value": _c(val, -25, 35)}
+    else:
+        result["adjust_shadows"] = {"value": 0.0}
+
+    if "adjust_whites" in result:
+        wh = result["adjust_whites"]
+        val = wh.get("value", 0.0) if isinstance(wh, dict) else wh
+        result["adjust_whites"] = {"value": _c(val, -25, 8)}
+    else:
+        result["adjust_whites"] = {"value": 0.0}
+
+    if "adjust_blacks" in result:
+        bl = result["adjust_blacks"]
+        val = bl.get("value", 0.0) if isinstance(bl, dict) else bl
+        result["adjust_blacks"] = {"value": _c(val, -20, 15)}
+    else:
+        result["adjust_blacks"] = {"value": 0.0}
+
+    if "adjust_temp_tint" in result:
+        tt = result["adjust_temp_tint"]
+        if isinstance(tt, dict):
+            t_val = _c(tt.get("temp", 0.0), -70, 70)
+            tint_val = _c(tt.get("tint", 0.0), -25, 25)
+            result["adjust_temp_tint"] = {"temp": t_val, "tint": tint_val}
+        else:
+            result["adjust_temp_tint"] = {"temp": 0.0, "tint": 0.0}
+    else:
+        result["adjust_temp_tint"] = {"temp": 0.0, "tint": 0.0}
+
+    if "adjust_saturation" in result:
+        sat = result["adjust_saturation"]
+        val = sat.get("scale", 1.0) if isinstance(sat, dict) else sat
+        result["adjust_saturation"] = {"scale": _c(val, 0.0, 1.4)}
+    else:
+        result["adjust_saturation"] = {"scale": 1.0}
+
+    if "adjust_vibrance" in result:
+        vib = result["adjust_vibrance"]
+        val = vib.get("strength", 0.0) if isinstance(vib, dict) else vib
+        result["adjust_vibrance"] = {"strength": _c(val, 0.0, 0.8)}
+    else:
+        result["adjust_vibrance"] = {"strength": 0.0}
+
+    return result
+
+
+def normalize_tool_params(tool_name: str, tool_params: Any) -> Dict:
+    """
+    Normalize AI's various parameter formats to what our functions expect.
+    The AI can send params in MANY different formats - we handle them ALL here.
+    """
+    if isinstance(tool_params, str):
+        if tool_name == "apply_style_preset":
+            return {"style": tool_params}
+        elif tool_name == "apply_grain":
+            try:
+                return {"amount": float(tool_params)}
+            except:
+                return {"amount": 0.03}
+        else:
+            return {}
+
+    if tool_params is None:
+        return {}
+
+    if isinstance(tool_params, list):
+        if tool_name == "apply_curves":
+            try:
+                shadows = (tool_params[0][1] - 0) * 2
+                midtones = (tool_params[2][1] - 128) / 2
+                highlights = (tool_params[4][1] - 255) * 2
+                return {"shadows": shadows, "midtones": midtones, "highlights": highlights}
+            except:
+                return {"shadows": 0, "midtones": 0, "highlights": 0}
+        return {}
+
+    if not isinstance(tool_params, dict):
+        return {}
+
+    normalized = tool_params.copy()
+
+    if tool_name == "apply_style_preset":
+        if "preset" in normalized and "style" not in normalized:
+            normalized["style"] = normalized.pop("preset")
+        if "name" in normalized and "style" not in normalized:
+            normalized["style"] = normalized.pop("name")
+        return {"style": normalized.get("style", "none")}
+
+    if tool_name == "apply_grain":
+        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.03
+        amount = float(amount)
+        if amount > 1.0:
+            amount = amount / 100.0
+        size = normalized.get("size", 1)
+        amount = min(0.08, amount)  # SAFETY CAP
+        result = {"amount": amount, "size": int(min(2, max(1, size)))}
+        if "seed" in normalized:
+            try:
+                result["seed"] = int(normalized["seed"])
+            except:
+                pass
+        return result
+
+    if tool_name == "apply_curves":
+        if "points" in normalized:
+            points = normalized["points"]
+            if isinstance(points, list) and len(points) >= 5:
+                try:
+                    return {
+                        "shadows": (points[0][1] - 0) * 2,
+                        "midtones": (points[2][1] - 128) / 2,
+                        "highlights": (points[4][1] - 255) * 2
+                    }
+                except:
+                    pass
+        return {
+            "shadows": normalized.get("shadows", 0),
+            "midtones": normalized.get("midtones", 0),
+            "highlights": normalized.get("highlights", 0)
+        }
+
+    if tool_name == "apply_vignette":
+        strength = normalized.get("strength") or normalized.get("amount") or normalized.get("intensity") or 0.4
+        radius = normalized.get("radius") or normalized.get("feather") or normalized.get("feathers") or normalized.get("size") or 0.75
+        strength = float(strength)
+        if strength > 1.0:
+            strength = strength / 100.0
+        radius = float(radius)
+        if radius > 1.0:
+            radius = radius / 100.0
+        strength = min(0.6, strength)  # SAFETY CAP
+        radius = min(0.9, max(0.4, radius))
+        return {"strength": strength, "radius": radius}
+
+    if tool_name == "apply_glow":
+        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.2
+        radius = normalized.get("radius") or normalized.get("size") or 21
+        intensity = min(0.35, float(intensity))
+        radius = int(radius)
+        if radius % 2 == 0:
+            radius += 1
+        return {"intensity": float(intensity), "radius": radius}
+
+    if tool_name == "apply_split_toning":
+        result = {
+            "shadow_hue": 220,
+            "shadow_sat": 0.25,
+            "highlight_hue": 40,
+            "highlight_sat": 0.2
+        }
+
+        if "shadow_color" in normalized:
+            color = normalized["shadow_color"]
+            if isinstance(color, list) and len(color) >= 3:
+                result["shadow_hue"] = rgb_to_hue(color)
+                result["shadow_sat"] = 0.3
+
+        if "highlight_color" in normalized:
+            color = normalized["highlight_color"]
+            if isinstance(color, list) and len(color) >= 3:
+                result["highlight_hue"] = rgb_to_hue(color)
+                result["highlight_sat"] = 0.3
+
+        for key in ["shadow_hue", "shadows_hue", "shadow_h"]:
+            if key in normalized:
+                result["shadow_hue"] = float(normalized[key])
+                break
+
+        for key in ["highlight_hue", "highlights_hue", "highlight_h"]:
+            if key in normalized:
+                result["highlight_hue"] = float(normalized[key])
+                break
+
+        for key in ["shadow_sat", "shadow_saturation", "shadows_sat", "shadow_s"]:
+            if key in normalized:
+                result["shadow_sat"] = float(normalized[key])
+                break
+
+        for key in ["highlight_sat", "highlight_saturation", "highlights_sat", "highlight_s"]:
+            if key in normalized:
+                result["highlight_sat"] = float(normalized[key])
+                break
+
+        if "shadows" in normalized and isinstance(normalized["shadows"], dict):
+            sh = normalized["shadows"]
+            if "hue" in sh:
+                result["shadow_hue"] = float(sh["hue"])
+            if "sat" in sh or "saturation" in sh:
+                result["shadow_sat"] = float(sh.get("sat") or sh.get("saturation"))
+
+        if "highlights" in normalized and isinstance(normalized["highlights"], dict):
+            hl = normalized["highlights"]
+            if "hue" in hl:
+                result["highlight_hue"] = float(hl["hue"])
+            if "sat" in hl or "saturation" in hl:
+                result["highlight_sat"] = float(hl.get("sat") or hl.get("saturation"))
+
+        return result
+
+    if tool_name == "apply_duotone":
+        dark = normalized.get("dark_color") or normalized.get("shadow_color") or normalized.get("color1") or [20, 0, 80]
+        light = normalized.get("light_color") or normalized.get("highlight_color") or normalized.get("color2") or [255, 200, 100]
+        if isinstance(dark, list):
+            dark = tuple(dark[:3])
+        if isinstance(light, list):
+            light = tuple(light[:3])
+        return {"dark_color": dark, "light_color": light}
+
+    if tool_name == "apply_haze":
+        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.15
+        color = normalized.get("color") or [200, 180, 160]
+        if isinstance(color, list):
+            color = tuple(color[:3])
+        return {"amount": float(amount), "color": color}
+
+    if tool_name == "apply_film_fade":
+        fade = normalized.get("fade_amount") or normalized.get("amount") or normalized.get("fade") or 0.25
+        black = normalized.get("black_fade") or normalized.get("black") or normalized.get("matte") or 0.1
+        return {"fade_amount": float(fade), "black_fade": float(black)}
+
+    if tool_name == "apply_clarity":
+        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.3
+        return {"amount": float(amount)}
+
+    if tool_name == "apply_dehaze":
+        amount = normalized.get("amount") or normalized.get("strength") or normalized.get("intensity") or 0.4
+        return {"amount": float(amount)}
+
+    if tool_name == "apply_orton_effect":
+        blur = normalized.get("blur_amount") or normalized.get("blur") or normalized.get("radius") or 25
+        blend = normalized.get("blend") or normalized.get("amount") or normalized.get("strength") or 0.25
+        blur = int(blur)
+        if blur % 2 == 0:
+            blur += 1
+        return {"blur_amount": blur, "blend": float(blend)}
+
+    if tool_name == "apply_cross_process":
+        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.4
+        return {"intensity": float(intensity)}
+
+    if tool_name == "apply_bleach_bypass":
+        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.4
+        return {"intensity": float(intensity)}
+
+    if tool_name == "apply_teal_and_orange":
+        intensity = normalized.get("intensity") or normalized.get("amount") or normalized.get("strength") or 0.5
+        return {"intensity": float(intensity)}
+
+    if tool_name == "apply_lut_color_grade":
+        style = normalized.get("style") or normalized.get("lut") or normalized.get("name") or "neutral"
+        return {"style": str(style)}
+
+    return normalized
+
+
+def canonical_params(params: Dict, sanitize: bool = True) -> Dict:
+    """
+    The parameters a render actually uses: aliases resolved, every basic tool
+    clamped (or neutral), creative tools normalised, and tools that would do
+    nothing (empty params, style "none") dropped. Equal results render equal
+    images. With sanitize=False the params are taken as already clamped and
+    normalised (semantic editor).
+    """
+    import panel_program
+
+    params = {PARAM_ALIASES.get(name, name): value for name, value in params.items()}
+    if sanitize:
+        clamped = clamp_params(params)
+    else:
+        clamped = {**panel_program.NEUTRAL_PANEL, **params}
+
+    result = {name: clamped[name] for name in BASIC_TOOLS}
+    for spec in STAGES:
+        tool_name = spec.name
+        if tool_name in BASIC_TOOLS or tool_name not in params:
+            continue
+
+        raw_params = params[tool_name]
+        if sanitize:
+            tool_params = normalize_tool_params(tool_name, raw_params)
+        elif isinstance(raw_params, str):
+            tool_params = {"style": raw_params} if tool_name == "apply_style_preset" else {}
+        else:
+            tool_params = dict(raw_params)
+
+        if tool_name == "apply_style_preset":
+            style = tool_params.get("style", "")
+            if not style or style == "none":
+                continue
+
+        if tool_params:
+            result[tool_name] = tool_params
+    return result
+
+
+def build_stages(params, toolbox: Optional[Dict] = None, sanitize: bool = True) -> List:
+    """
+    Turn editing parameters (a raw dict or canonical.CanonicalParams) into
+    ordered (tool_name, params) render stages. Only includes tools that are
+    explicitly in the params; tools recorded as no-ops are skipped.
+    """
+    import canonical
+    import panel_program
+
+    toolbox = toolbox or get_toolbox()
+    frozen = canonical.canonicalize(params, sanitize)
+    plain = frozen.as_dict()
+    panel_params = {name: plain[name] for name in BASIC_TOOLS}
+    noops = [name for name in frozen.noops if name not in panel_program.FUSED_TOOLS]
+    stages = []
+
+    for spec in STAGES:
+        tool_name = spec.name
+        if tool_name in BASIC_TOOLS or tool_name not in plain or tool_name not in toolbox:
+            continue
+        if tool_name in noops:
+            continue
+        tool_params = plain[tool_name]
+
+        # Creative tools right after the basic panel join its program and
+        # share its colour conversions.
+        if not stages and tool_name in panel_program.FUSED_TOOLS:
+            panel_params[tool_name] = tool_params
+            continue
+
+        stages.append((tool_name, tool_params))
+
+    program = panel_program.compile_panel(panel_params)
+    if not program.is_identity:
+        stages.insert(0, ("panel", panel_params))
+
+    return stages
+
+
+def _stage_cost(tool_name: str, params: Dict, use_lut: bool) -> float:
+    """Estimated ms per megapixel of one stage run directly (not baked)."""
+    if tool_name == "panel":
+        import panel_program
+        return sum(PASS_COST[space] for space, _ in panel_program.compile_panel(params).passes)
+    if tool_name == "apply_style_preset" and use_lut:
+        import lut3d
+        import preset_bank
+        cost = 0.0
+        for name, payload in preset_bank.get_plan(params.get("style", "none")).stages:
+            if name != "lut":
+                cost += _stage_cost(name, payload, use_lut)
+            elif isinstance(payload, lut3d.Lut3D):
+                cost += LUT_COST["3d"]
+            else:
+                cost += LUT_COST["mono" if payload.mono else "separable"]
+        return cost
+    spec = REGISTRY.get(tool_name)
+    return spec.cost if spec else 50.0
+
+
+def estimate_cost(stages: List, shape: Tuple[int, ...], use_lut: bool = True) -> List[Tuple[str, float]]:
+    """
+    Expected ms of each step render_stages will run for these stages on a frame
+    of this shape: contiguous pointwise runs as one LUT lookup (or the tools
+    themselves below lut3d.LUT_MIN_PIXELS), other stages at their own cost.
+    """
+    import lut3d
+
+    pixels = shape[0] * shape[1]
+    mp = pixels / 1e6
+    use_lut = use_lut and pixels >= lut3d.LUT_MIN_PIXELS
+    steps: List[Tuple[str, float]] = []
+    segment: List = []
+
+    def flush():
+        if not segment:
+            return
+        if use_lut:
+            names = [name for name, _ in segment]
+            steps.append((f"lut{names}", LUT_COST[lut3d.lut_kind(segment)] * mp))
+        else:
+            steps.extend((name, _stage_cost(name, params, use_lut) * mp) for name, params in segment)
+        segment.clear()
+
+    for tool_name, params in stages:
+        if lut3d.is_pointwise(tool_name, params):
+            segment.append((tool_name, params))
+            continue
+        flush()
+        steps.append((tool_name, _stage_cost(tool_name, params, use_lut) * mp))
+    flush()
+    return steps
+
+
+def render_timings() -> Dict[str, float]:
+    """Totals of expected and actual render time since startup."""
+    with _timings_lock:
+        return dict(_timings)
+
+
+def _record_timing(shape: Tuple[int, ...], steps: List[Tuple[str, float]], actual_ms: float):
+    expected_ms = sum(ms for _, ms in steps)
+    slow = actual_ms > SLOW_RENDER_FACTOR * expected_ms + SLOW_RENDER_SLACK_MS
+    with _timings_lock:
+        _timings["renders"] += 1
+        _timings["slow_renders"] += int(slow)
+        _timings["expected_ms"] += expected_ms
+        _timings["actual_ms"] += actual_ms
+
+    print(f"  ⏱️ Render {shape[1]}x{shape[0]}: expected ~{expected_ms:.0f} ms, took {actual_ms:.0f} ms")
+    if slow:
+        breakdown = ", ".join(f"{name} ~{ms:.0f}" for name, ms in steps)
+        print(f"  ⚠️ Render {actual_ms / max(expected_ms, 1e-3):.1f}x slower than the cost model ({breakdown})")
+
+
+def _log_panel(stages: List):
+    import panel_program
+
+    for tool_name, params in stages:
+        if tool_name == "panel":
+            program = panel_program.compile_panel(params)
+            trace = program.trace()
+            print(f"  ⚡ Panel program: {program.describe()} ({len(program.skipped)} identity stages skipped, "
+                  f"{trace['conversions_saved']} colour conversions saved)")
+
+
+def render_stages(image: np.ndarray, stages: List, toolbox: Optional[Dict] = None,
+                  use_lut: bool = True, use_tiling: bool = True) -> np.ndarray:
+    """Render built stages; the input image is never modified."""
+    import lut3d
+    import tiled_render
+
+    toolbox = toolbox or get_toolbox(use_lut)
+    steps = estimate_cost(stages, image.shape, use_lut)
+    start = time.perf_counter()
+    # Very large frames render in strips to bound peak memory.
+    if use_tiling and image.shape[0] * image.shape[1] >= tiled_render.TILE_MIN_PIXELS:
+        result = tiled_render.render_tiled(image, stages, toolbox, use_lut=use_lut)
+    else:
+        # Contiguous colour-only stages are baked into one 3D LUT lookup each.
+        result = lut3d.render_stages(image.copy(), stages, toolbox, use_lut=use_lut)
+    _record_timing(image.shape, steps, (time.perf_counter() - start) * 1000)
+    _log_panel(stages)
+    return result
+
+
+def to_float(image: np.ndarray) -> np.ndarray:
+    """float32 copy of a uint8 or uint16 image on the 0-255 scale."""
+    if image.dtype == np.uint16:
+        return image.astype(np.float32) * np.float32(255.0 / 65535.0)
+    return image.astype(np.float32)
+
+
+def load_image(path: str, precision: str = "uint8") -> Optional[np.ndarray]:
+    """
+    Read a BGR image without the 8-bit downcast cv2.imread does by default, so
+    16-bit PNG and TIFF keep their precision in "float" mode. Like a plain
+    cv2.imread (used for proxies and previews), EXIF orientation is applied,
+    gray is expanded to BGR and alpha is dropped.
+    """
+    import cv2
+
+    image = cv2.imread(path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+
+    if precision == "float":
+        return to_float(image)
+    if image.dtype == np.uint16:
+        return (image >> 8).astype(np.uint8)
+    if image.dtype != np.uint8:
+        return quantize(image.astype(np.float32), dither=False)
+    return image
+
+
+def quantize(image: np.ndarray, dither: bool = True, seed: int = 0) -> np.ndarray:
+    """
+    Round a float32 (0-255) render to uint8 for encoding. The dither is
+    triangular noise of +-1 level from a fixed seed, which breaks up banding in
+    smooth gradients and keeps repeated exports of one edit identical.
+    """
+    if image.dtype == np.uint8:
+        return image
+    out = image.astype(np.float32, copy=True)
+    if dither:
+        rng = np.random.default_rng(seed)
+        out += rng.random(out.shape, dtype=np.float32)
+        out -= rng.random(out.shape, dtype=np.float32)
+    out += 0.5
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
+
+
+def proxy_scale(image: np.ndarray, reference_edge: Optional[int]) -> float:
+    """Long edge of image over reference_edge: the scale pixel-sized params render at."""
+    return max(image.shape[:2]) / reference_edge if reference_edge else 1.0
+
+
+def render(image: np.ndarray, params, toolbox: Optional[Dict] = None, sanitize: bool = True,
+           use_lut: bool = True, use_tiling: bool = True,
+           reference_edge: Optional[int] = None, precision: str = "uint8") -> np.ndarray:
+    """
+    Apply editing parameters to a BGR image. When rendering a proxy, pass the
+    original's long edge as reference_edge: seeded grain then matches the
+    export, and blur radii are scaled down to the proxy's size.
+    precision="float" renders in float32 (uint8/uint16 input is converted) and
+    returns float32 for quantize(); colour stages then always use the LUTs.
+    """
+    import grain
+    import opencv_tools
+
+    if precision == "float":
+        image = image if image.dtype == np.float32 else to_float(image)
+        use_lut = True
+    toolbox = toolbox or get_toolbox(use_lut)
+    stages = build_stages(params, toolbox, sanitize)
+    with grain.reference(reference_edge), opencv_tools.spatial_scale(proxy_scale(image, reference_edge)):
+        return render_stages(image, stages, toolbox, use_lut, use_tiling)
+
+
+def render_batch(image: np.ndarray, params_list: List[Dict], toolbox: Optional[Dict] = None,
+                 sanitize: bool = True, use_lut: bool = True,
+                 reference_edge: Optional[int] = None) -> List[np.ndarray]:
+    """Render several parameter sets over one image, sharing the colour lookup pass."""
+    import grain
+    import lut3d
+    import opencv_tools
+
+    toolbox = toolbox or get_toolbox(use_lut)
+    if not use_lut:
+        return [render(image, params, toolbox, sanitize, use_lut, reference_edge=reference_edge)
+                for params in params_list]
+
+    candidates = [build_stages(params, toolbox, sanitize) for params in params_list]
+    with grain.reference(reference_edge), opencv_tools.spatial_scale(proxy_scale(image, reference_edge)):
+        return lut3d.render_batch(image, candidates, toolbox)
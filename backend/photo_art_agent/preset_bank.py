@@ -0,0 +1,243 @@
+"""
+Preset LUT Bank - precompiled colour LUTs for apply_style_preset
+=================================================================
+Every style in opencv_tools.STYLE_PRESETS is split into colour segments (runs
+of per-pixel steps) and the spatial steps between them (vignette, glow, grain,
+clarity, orton). Each colour segment is baked once into a LUT (a 3D lattice, or
+a 256-entry curve for grey/per-channel segments), saved as a .npy file in the
+bank directory and memory-mapped on load, so a preset costs one LUT lookup per
+colour segment plus its spatial steps.
+
+Usage:
+    python preset_bank.py build [--bank-dir DIR]
+    python preset_bank.py verify [--tolerance 2.0] [--p99-tolerance 8] [--style noir ...]
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import canonical
+import lut3d
+import opencv_tools
+
+
+BANK_DIR = os.getenv(
+    "LUT_BANK_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "lut_bank"),
+)
+
+# Verification passes when the mean |diff| against apply_style_preset is at
+# most DEFAULT_TOLERANCE 8-bit levels and its 99th percentile at most
+# DEFAULT_P99_TOLERANCE, so banding on a small share of pixels is caught too.
+DEFAULT_TOLERANCE = 2.0
+DEFAULT_P99_TOLERANCE = 8.0
+
+Segment = Tuple[str, List[lut3d.Stage]]
+
+_PLANS: Dict[str, "PresetPlan"] = {}
+
+
+def split_preset(style: str) -> List[Segment]:
+    """Split a style into ("colour", steps) runs and ("spatial", [step]) stages."""
+    segments: List[Segment] = []
+    for tool_name, params in opencv_tools.preset_steps(style):
+        if lut3d.is_pointwise(tool_name, params):
+            if segments and segments[-1][0] == "colour":
+                segments[-1][1].append((tool_name, params))
+            else:
+                segments.append(("colour", [(tool_name, params)]))
+        else:
+            segments.append(("spatial", [(tool_name, params)]))
+    return segments
+
+
+def _lut_path(bank_dir: str, style: str, index: int, steps: List[lut3d.Stage], size: int) -> str:
+    # The recipe digest is part of the file name, so editing a preset in
+    # opencv_tools invalidates its baked LUT instead of serving a stale one.
+    digest = canonical.digest([steps, size])[:12]
+    return os.path.join(bank_dir, f"{style}.{index}.{size}.{digest}.npy")
+
+
+def _open_lut(path: str, steps: List[lut3d.Stage]):
+    key = os.path.basename(path)
+    table = np.load(path, mmap_mode="r")
+    kind = lut3d.lut_kind(steps)
+    if kind == "3d":
+        return lut3d.Lut3D(table, key=key)
+    return lut3d.Lut1D(table, mono=kind == "mono", key=key)
+
+
+def _load_or_bake(path: str, steps: List[lut3d.Stage], size: int):
+    """Memory-map a baked LUT from the bank, baking and saving it if missing."""
+    if os.path.exists(path):
+        try:
+            return _open_lut(path, steps), False
+        except (OSError, ValueError) as e:
+            print(f"  ✗ ERROR loading {os.path.basename(path)}: {e}, re-baking")
+
+    lut = lut3d.compile_stages(steps, size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, lut.table)
+    os.replace(tmp_path, path)
+    return _open_lut(path, steps), True
+
+
+class PresetPlan:
+    """A style compiled to baked colour LUTs and the spatial steps between them."""
+
+    def __init__(self, style: str, stages: List[Tuple[str, object]]):
+        self.style = style
+        # ("lut", Lut1D or Lut3D) or (tool_name, params)
+        self.stages = stages
+
+    @property
+    def lut_count(self) -> int:
+        return sum(1 for name, _ in self.stages if name == "lut")
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        result = image
+        for name, payload in self.stages:
+            if name == "lut":
+                result = payload.apply(result)
+            else:
+                result = lut3d.run_tool(getattr(opencv_tools, name), name, result, **payload)
+        return result
+
+    def describe(self) -> str:
+        parts = [f"lut[{payload.key}]" if name == "lut" else name for name, payload in self.stages]
+        return " -> ".join(parts) if parts else "identity"
+
+
+def compile_preset(style: str, bank_dir: Optional[str] = None,
+                   size: int = lut3d.DEFAULT_SIZE) -> Tuple[PresetPlan, int]:
+    """Build the PresetPlan for a style; returns (plan, number of LUTs baked)."""
+    style = opencv_tools.preset_name(style)
+    bank_dir = bank_dir or BANK_DIR
+    stages: List[Tuple[str, object]] = []
+    baked = 0
+
+    for index, (kind, steps) in enumerate(split_preset(style)):
+        if kind == "spatial":
+            stages.extend(steps)
+            continue
+        lut, was_baked = _load_or_bake(_lut_path(bank_dir, style, index, steps, size), steps, size)
+        stages.append(("lut", lut))
+        baked += was_baked
+
+    return PresetPlan(style, stages), baked
+
+
+def load_bank(bank_dir: Optional[str] = None, styles: Optional[List[str]] = None,
+              size: int = lut3d.DEFAULT_SIZE) -> int:
+    """Load (baking where missing) the plans for all styles; returns LUTs baked."""
+    baked = 0
+    for style in styles or opencv_tools.STYLE_PRESETS:
+        plan, count = compile_preset(style, bank_dir, size)
+        _PLANS[plan.style] = plan
+        baked += count
+    return baked
+
+
+def get_plan(style: str) -> PresetPlan:
+    style = opencv_tools.preset_name(style)
+    if style not in _PLANS:
+        _PLANS[style], _ = compile_preset(style)
+    return _PLANS[style]
+
+
+def apply_preset(image: np.ndarray, style: str = "none") -> np.ndarray:
+    """Drop-in replacement for opencv_tools.apply_style_preset backed by the bank."""
+    if style == "none" or not style:
+        return image
+    if opencv_tools.preset_name(style) not in opencv_tools.STYLE_PRESETS:
+        return image.copy()
+
+    try:
+        return get_plan(style).apply(image)
+    except Exception as e:
+        print(f"  ✗ ERROR applying preset bank for {style}: {e}, using reference preset")
+        return lut3d.run_tool(opencv_tools.apply_style_preset, "apply_style_preset", image, style=style)
+
+
+def _verification_image(width: int = 768, height: int = 512, seed: int = 0) -> np.ndarray:
+    """Smooth gradients plus noise, so every hue and tone band is populated."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 32, width // 32, 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 6, (height, width, 1)).astype(np.float32)
+    return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+
+def verify_bank(tolerance: float = DEFAULT_TOLERANCE, image: Optional[np.ndarray] = None,
+                styles: Optional[List[str]] = None,
+                p99_tolerance: float = DEFAULT_P99_TOLERANCE) -> Dict[str, Dict]:
+    """
+    Compare bank output against the reference apply_style_preset for each
+    style, gating on the mean and the 99th percentile of |diff|. The max is
+    reported but not gated: a lattice LUT interpolates across hard hue-band
+    edges (HLS/HSV masks, the colour mixer's bands), so a few pixels right at
+    a band edge can be tens of levels off. That is a known limitation.
+    """
+    image = _verification_image() if image is None else image
+    report = {}
+
+    for style in styles or opencv_tools.STYLE_PRESETS:
+        # Same seed on both sides so apply_grain draws identical noise.
+        np.random.seed(0)
+        reference = opencv_tools.apply_style_preset(image, style)
+        np.random.seed(0)
+        result = apply_preset(image, style)
+
+        diff = np.abs(reference.astype(np.int16) - result.astype(np.int16))
+        p99 = float(np.percentile(diff, 99))
+        report[style] = {
+            "mean": float(diff.mean()),
+            "p99": p99,
+            "max": int(diff.max()),
+            "luts": get_plan(style).lut_count,
+            "ok": bool(diff.mean() <= tolerance and p99 <= p99_tolerance),
+        }
+    return report
+
+
+def main():
+    global BANK_DIR
+
+    parser = argparse.ArgumentParser(description="apply_style_preset LUT bank")
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("--bank-dir", default=BANK_DIR)
+    parser.add_argument("--size", type=int, default=lut3d.DEFAULT_SIZE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--p99-tolerance", type=float, default=DEFAULT_P99_TOLERANCE)
+    parser.add_argument("--style", action="append", help="limit to these styles")
+    args = parser.parse_args()
+
+    BANK_DIR = args.bank_dir
+    baked = load_bank(args.bank_dir, args.style, args.size)
+    print(f"Bank: {args.bank_dir} ({len(_PLANS)} styles, {baked} LUTs baked)")
+
+    if args.command == "build":
+        for style, plan in _PLANS.items():
+            print(f"  {style:22s} {plan.describe()}")
+        return
+
+    report = verify_bank(args.tolerance, styles=args.style, p99_tolerance=args.p99_tolerance)
+    failed = [style for style, row in report.items() if not row["ok"]]
+    for style, row in report.items():
+        mark = "✓" if row["ok"] else "✗"
+        print(f"  {mark} {style:22s} luts {row['luts']}  mean |diff| {row['mean']:.2f}"
+              f"  p99 {row['p99']:.0f}  max {row['max']}")
+    print(f"{len(report) - len(failed)}/{len(report)} styles within tolerance "
+          f"(mean {args.tolerance}, p99 {args.p99_tolerance})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
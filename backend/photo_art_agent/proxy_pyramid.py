@@ -0,0 +1,57 @@
+"""
+Proxy Pyramid - reduced-resolution proxies for interactive rendering
+====================================================================
+At upload the original is reduced once into a pyramid of proxy levels (long
+edge 1024 and 512 px). Iterations and semantic edits render on a proxy level;
+the full-resolution render only runs on finalize, which replays the lineage
+of edits that produced an output on the original.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import cv2
+
+
+PROXY_LEVELS = [1024, 512]
+DEFAULT_PROXY_EDGE = 1024
+
+
+def build_pyramid(image_path: str, out_dir: str, levels: List[int] = PROXY_LEVELS) -> Dict[int, str]:
+    """
+    Write proxy levels of image_path into out_dir as proxy_<edge>.png.
+    Levels at or above the original's long edge are skipped.
+    Returns {long_edge: path}.
+    """
+    img = cv2.imread(image_path)
+    if img is None:
+        raise RuntimeError(f"Cannot read {image_path}")
+
+    pyramid = {}
+    level = img
+    original_edge = max(img.shape[:2])
+
+    # Each level is reduced from the one above it, so the cost is dominated by
+    # the first INTER_AREA pass over the original.
+    for edge in sorted(levels, reverse=True):
+        if edge >= original_edge:
+            continue
+        h, w = level.shape[:2]
+        scale = edge / max(h, w)
+        level = cv2.resize(level, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+        path = os.path.join(out_dir, f"proxy_{edge}.png")
+        cv2.imwrite(path, level)
+        pyramid[edge] = path
+
+    return pyramid
+
+
+def select_level(pyramid: Optional[Dict[int, str]], original_path: str,
+                 edge: int = DEFAULT_PROXY_EDGE) -> str:
+    """The smallest proxy with a long edge of at least `edge`, else the original."""
+    candidates = [int(e) for e in (pyramid or {}) if int(e) >= edge]
+    if not candidates:
+        return original_path
+    best = min(candidates)
+    return pyramid.get(best) or pyramid.get(str(best))
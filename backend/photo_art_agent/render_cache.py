@@ -0,0 +1,175 @@
+"""
+Render Cache - content-addressed cache of rendered panel results
+================================================================
+The same (base image, params) pair is often rendered more than once: a
+semantic slider dragged back to an earlier value, or /iterate re-run from the
+same base_filename. Renders are keyed by a hash of the base file's bytes and
+the digest of the canonical params (canonical.canonicalize), and the cache
+maps that key to the JPEG already written for it, so a hit returns the
+existing file without decoding or re-encoding anything.
+
+Entries live in an in-memory LRU and are also written as small index files
+under cache_dir on the /data volume, so they survive LRU eviction and
+container restarts. An entry is only trusted while its file still has the
+size and mtime it had when it was recorded. Keys include RENDER_VERSION, so
+renders cached on the volume by an older build are not served after the
+tool maths changes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+MAX_ENTRIES = int(os.getenv("RENDER_CACHE_ENTRIES", "2048"))
+
+# Bump whenever a change alters rendered pixels (tool maths, LUT baking,
+# grain, proxy scaling): it is part of every key.
+RENDER_VERSION = 3
+
+# Read size when hashing base files.
+CHUNK_BYTES = 1 << 20
+
+# (path, size, mtime_ns) of a rendered file
+Entry = Tuple[str, int, int]
+
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def make_key(base_digest: str, params_digest: str, **options: Any) -> str:
+    """Key for rendering canonical params (plus render options) over a base image."""
+    payload = json.dumps({"version": RENDER_VERSION, "base": base_digest, "params": params_digest,
+                          "options": options},
+                         sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Thread-safe LRU of render key -> output file, spilled to index files in cache_dir."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def file_digest(self, path: str) -> Optional[str]:
+        """SHA-1 of a file's bytes, remembered while its size and mtime are unchanged."""
+        stat = _stat(path)
+        if stat is None:
+            return None
+        memo_key = (path, *stat)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+            if digest is not None:
+                self._digests.move_to_end(memo_key)
+                return digest
+
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+
+        with self._lock:
+            self._digests[memo_key] = digest
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+        return digest
+
+    def _index_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_index(self, key: str) -> Optional[Entry]:
+        index_path = self._index_path(key)
+        if not index_path or not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["path"], int(data["size"]), int(data["mtime_ns"])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  ✗ ERROR reading render cache index {key[:12]}: {e}")
+            return None
+
+    def _remember(self, key: str, entry: Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the file rendered for key, or None if it is unknown or has changed."""
+        with self._lock:
+            entry = self._entries.get(key)
+        from_disk = entry is None
+        if from_disk:
+            entry = self._read_index(key)
+
+        if entry is None or _stat(entry[0]) != entry[1:]:
+            with self._lock:
+                self._entries.pop(key, None)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if from_disk:
+                self.disk_hits += 1
+            else:
+                self.hits += 1
+        self._remember(key, entry)
+        return entry[0]
+
+    def put(self, key: str, path: str):
+        """Record that path holds the render for key."""
+        stat = _stat(path)
+        if stat is None:
+            return
+        entry = (path, *stat)
+        self._remember(key, entry)
+
+        index_path = self._index_path(key)
+        if not index_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            # A unique temp file per writer: concurrent puts of one key must
+            # not write into each other's file before the rename.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), prefix=f"{key}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"path": path, "size": entry[1], "mtime_ns": entry[2]}, f)
+                os.replace(tmp_path, index_path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            print(f"  ✗ ERROR writing render cache index {key[:12]}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
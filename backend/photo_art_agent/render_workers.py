@@ -0,0 +1,206 @@
+"""
+Render Workers - process pool for panel renders with shared-memory handoff
+==========================================================================
+Renders run in long-lived worker processes instead of API threads, so the
+Python-level parts of opencv_tools (NumPy temporaries, per-channel loops) of
+concurrent sessions do not serialise on one GIL. Each worker is started once
+and warms the toolbox and the memory-mapped preset LUT bank up front.
+
+Images never go through pickle: the caller copies the decoded frame into a
+multiprocessing.shared_memory block, the worker renders from a view of it
+and writes the result into a second block the caller reads back. Only the
+params and block names cross the process boundary.
+
+Callers block in render() until a worker is free. The API calls it from
+the executors.RENDER pool, which rejects renders beyond RENDER_QUEUE_LIMIT
+with a 503. If the pool cannot start or breaks, renders fall back to the
+calling process.
+
+The worker count follows the container's CPU quota, and every worker gets
+an equal share of the render caches' memory budget (each process holds its
+own intermediate, vignette and grain caches).
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import executors
+
+
+WORKERS = int(os.getenv("RENDER_PROCESSES", str(max(1, executors.cpu_quota() // 2))))
+# Smallest per-worker cache budget (MB).
+MIN_CACHE_MB = 16
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (params, sanitize) - one pipeline.render call
+Step = Tuple[Dict, bool]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_stats = {"jobs": 0, "fallbacks": 0, "restarts": 0, "bytes_shared": 0}
+_settings = {"bank_dir": None, "use_lut": True}
+
+# Worker-side toolbox, built once by _init_worker.
+_toolbox = None
+
+
+def _worker_cache_budgets() -> Dict[str, str]:
+    """Cache size env vars for one worker: this process's budgets split across WORKERS."""
+    import grain
+    import intermediate_cache
+    import opencv_tools
+
+    budgets = {
+        "INTERMEDIATE_CACHE_MB": intermediate_cache.MAX_BYTES,
+        "VIGNETTE_CACHE_MB": opencv_tools._vignette_cache.max_bytes,
+        "GRAIN_CACHE_MB": grain._field_cache.max_bytes,
+    }
+    return {name: str(max(MIN_CACHE_MB, total // (1024 * 1024) // max(1, WORKERS)))
+            for name, total in budgets.items()}
+
+
+def _init_worker(app_dir: str, bank_dir: Optional[str], use_lut: bool, cache_budgets: Dict[str, str]):
+    global _toolbox
+    # Before the render modules are imported: they size their caches from these.
+    os.environ.update(cache_budgets)
+    sys.path.insert(0, app_dir)
+    import pipeline
+    import preset_bank
+
+    if bank_dir:
+        preset_bank.BANK_DIR = bank_dir
+    if use_lut:
+        try:
+            preset_bank.load_bank()
+        except Exception as e:
+            print(f"  ✗ ERROR loading preset LUT bank in render worker: {e}")
+    _toolbox = pipeline.get_toolbox(use_lut)
+    print(f"  ✓ Render worker {os.getpid()} ready")
+
+
+def _render_into(src_buf, dst_buf, shape, dtype, out_dtype, steps: List[Step],
+                 use_lut: bool, use_tiling: bool, reference_edge: Optional[int], precision: str):
+    import pipeline
+
+    image = np.ndarray(shape, dtype, buffer=src_buf)
+    for params, sanitize in steps:
+        image = pipeline.render(image, params, _toolbox, sanitize=sanitize, use_lut=use_lut,
+                                use_tiling=use_tiling, reference_edge=reference_edge,
+                                precision=precision)
+    np.ndarray(shape, out_dtype, buffer=dst_buf)[...] = image
+
+
+def _render_job(src_name: str, dst_name: str, shape, dtype, out_dtype, steps: List[Step],
+                use_lut: bool, use_tiling: bool, reference_edge: Optional[int], precision: str):
+    src = shared_memory.SharedMemory(name=src_name)
+    dst = shared_memory.SharedMemory(name=dst_name)
+    error = None
+    try:
+        _render_into(src.buf, dst.buf, shape, dtype, out_dtype, steps,
+                     use_lut, use_tiling, reference_edge, precision)
+    except Exception as e:
+        # Keep only the message: a live traceback would pin the buffer views.
+        error = f"{type(e).__name__}: {e}"
+    src.close()
+    dst.close()
+    if error:
+        raise RuntimeError(error)
+
+
+def start(bank_dir: Optional[str] = None, use_lut: bool = True) -> Optional[ProcessPoolExecutor]:
+    """Start the worker processes (once); later calls return the running pool."""
+    global _pool
+    import preset_bank
+
+    with _pool_lock:
+        # Workers read the bank from wherever this process has it.
+        _settings.update(bank_dir=bank_dir or _settings["bank_dir"] or preset_bank.BANK_DIR,
+                         use_lut=use_lut)
+        if _pool is None and WORKERS > 0:
+            try:
+                # spawn: forking a parent with live thread pools can deadlock.
+                _pool = ProcessPoolExecutor(
+                    max_workers=WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(APP_DIR, _settings["bank_dir"], use_lut, _worker_cache_budgets()),
+                )
+                print(f"🧵 Render workers: {WORKERS} processes")
+            except Exception as e:
+                print(f"✗ ERROR starting render workers: {e}")
+        return _pool
+
+
+def _count(**deltas: int):
+    with _pool_lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _render_local(image: np.ndarray, steps: List[Step], use_lut: bool, use_tiling: bool,
+                  reference_edge: Optional[int], precision: str) -> np.ndarray:
+    import pipeline
+
+    toolbox = pipeline.get_toolbox(use_lut)
+    for params, sanitize in steps:
+        image = pipeline.render(image, params, toolbox, sanitize=sanitize, use_lut=use_lut,
+                                use_tiling=use_tiling, reference_edge=reference_edge,
+                                precision=precision)
+    return image
+
+
+def render(image: np.ndarray, steps: List[Step], use_lut: bool = True, use_tiling: bool = True,
+           reference_edge: Optional[int] = None, precision: str = "uint8") -> np.ndarray:
+    """
+    Run render steps over image on a worker process, as pipeline.render would
+    one after another. Blocks until a worker has finished the job.
+    """
+    pool = start(use_lut=use_lut)
+    if pool is None:
+        _count(fallbacks=1)
+        return _render_local(image, steps, use_lut, use_tiling, reference_edge, precision)
+
+    image = np.ascontiguousarray(image)
+    out_dtype = np.dtype(np.float32) if precision == "float" else image.dtype
+    out_bytes = image.size * out_dtype.itemsize
+    src = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+    dst = shared_memory.SharedMemory(create=True, size=max(1, out_bytes))
+    try:
+        np.ndarray(image.shape, image.dtype, buffer=src.buf)[...] = image
+        future = pool.submit(_render_job, src.name, dst.name, image.shape, image.dtype, out_dtype,
+                             steps, use_lut, use_tiling, reference_edge, precision)
+        future.result()
+        _count(jobs=1, bytes_shared=image.nbytes + out_bytes)
+        return np.ndarray(image.shape, out_dtype, buffer=dst.buf).copy()
+    except BrokenProcessPool as e:
+        print(f"  ✗ ERROR render worker died: {e}, restarting the pool and rendering here")
+        shutdown()
+        _count(restarts=1, fallbacks=1)
+        return _render_local(image, steps, use_lut, use_tiling, reference_edge, precision)
+    finally:
+        src.close()
+        src.unlink()
+        dst.close()
+        dst.unlink()
+
+
+def stats() -> Dict[str, int]:
+    with _pool_lock:
+        return {"workers": WORKERS if _pool is not None else 0, **_stats}
@@ -4,12 +4,16 @@ load_dotenv()
 import json
 import cv2
 from pathlib import Path
-from openai import OpenAI
+
+import image_transport
+import model_client
+import upload_cache
 
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
+# Shared with the other modules: one connection pool, retries with backoff.
+client = model_client.get_client(
+    base_url=model_client.BASE_URL,
     api_key=OPENROUTER_API_KEY
 )
 
@@ -30,16 +34,19 @@ except:
     print(" Cloudinary not available, using local paths")
 
 
+def _cloudinary_upload(file_obj, digest):
+    res = cloudinary.uploader.upload(
+        file_obj,
+        resource_type="image",
+        public_id=digest,
+        overwrite=False
+    )
+    return res.get("secure_url")
+
+
 def upload_to_cloudinary(local_path):
     try:
-        res = cloudinary.uploader.upload(
-            local_path,
-            resource_type="image",
-            use_filename=True,
-            unique_filename=False,
-            overwrite=True
-        )
-        return res.get("secure_url")
+        return upload_cache.get_cache().upload(local_path, _cloudinary_upload)
     except Exception as e:
         print(f"Upload error: {e}")
         return None
@@ -48,12 +55,12 @@ def upload_to_cloudinary(local_path):
 def analyze_image_axes(image_path, user_prompt=None):
     print("\nAnalyzing image for semantic axes...")
 
-    img_url = upload_to_cloudinary(image_path)
+    img_url = image_transport.image_url(image_path, upload_to_cloudinary)
     if not img_url:
-        print(" Cloudinary upload failed, using fallback axes")
+        print(" Image could not be sent, using fallback axes")
         return get_fallback_axes()
 
-    print("Image uploaded successfully, requesting AI analysis...")
+    print("Image ready, requesting AI analysis...")
 
     goal_text = ""
     if user_prompt:
@@ -151,7 +158,8 @@ OUTPUT ONLY VALID JSON:
 
     try:
         print("Sending request to AI model...")
-        resp = client.chat.completions.create(
+        resp = client.call_sync(
+            "chat.completions",
             model=MODEL_NAME,
             messages=[
                 {
@@ -593,56 +601,23 @@ def convert_coordinates_to_params(axis_vals, axes_info):
 
 
 def apply_params_to_image(image_path, params, output_path):
-    from opencv_tools import (
-        adjust_exposure, adjust_contrast, adjust_highlights,
-        adjust_shadows, adjust_whites, adjust_blacks,
-        adjust_temp_tint, adjust_saturation, adjust_vibrance,
-        adjust_color_mixer,
-        apply_split_toning, apply_color_overlay, apply_curves,
-        apply_vignette, apply_glow, apply_grain, apply_duotone,
-        apply_haze, apply_style_preset
-    )
-
     img = cv2.imread(image_path)
     if img is None:
         raise RuntimeError(f"Cannot read {image_path}")
 
-    if "style_preset" in params:
-        img = apply_style_preset(img, style=params["style_preset"])
-
-    img = adjust_exposure(img, **params.get("adjust_exposure", {}))
-    img = adjust_contrast(img, **params.get("adjust_contrast", {}))
-    img = adjust_highlights(img, **params.get("adjust_highlights", {}))
-    img = adjust_shadows(img, **params.get("adjust_shadows", {}))
-    img = adjust_whites(img, **params.get("adjust_whites", {}))
-    img = adjust_blacks(img, **params.get("adjust_blacks", {}))
-    img = adjust_temp_tint(img, **params.get("adjust_temp_tint", {}))
-    img = adjust_saturation(img, **params.get("adjust_saturation", {}))
-    img = adjust_vibrance(img, **params.get("adjust_vibrance", {}))
-    img = adjust_color_mixer(img, **params.get("adjust_color_mixer", {}))
-
-    if "apply_split_toning" in params:
-        img = apply_split_toning(img, **params["apply_split_toning"])
-    if "apply_color_overlay" in params:
-        img = apply_color_overlay(img, **params["apply_color_overlay"])
-    if "apply_curves" in params:
-        img = apply_curves(img, **params["apply_curves"])
-
-    if "apply_vignette" in params:
-        img = apply_vignette(img, **params["apply_vignette"])
-    if "apply_glow" in params:
-        img = apply_glow(img, **params["apply_glow"])
-    if "apply_grain" in params:
-        img = apply_grain(img, **params["apply_grain"])
-    if "apply_duotone" in params:
-        img = apply_duotone(img, **params["apply_duotone"])
-    if "apply_haze" in params:
-        img = apply_haze(img, **params["apply_haze"])
+    img = render_params(img, params)
 
     cv2.imwrite(output_path, img)
     return output_path
 
 
+def render_params(img, params):
+    import pipeline
+
+    # convert_coordinates_to_params already clamps to the semantic ranges.
+    return pipeline.render(img, params, sanitize=False)
+
+
 def interactive_semantic_editor(final_image_path, output_dir,prompt=None):
 
     print(" SEMANTIC EDITOR MODE (2 AXES)")
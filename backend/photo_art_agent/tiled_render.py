@@ -0,0 +1,161 @@
+"""
+Tiled Render - memory-bounded strip rendering for very large images
+===================================================================
+Runs the render stages over horizontal strips, so float temporaries scale
+with one strip instead of the whole frame. Blur-based tools read a halo of
+extra rows above and below each strip; pointwise stages need none, so their
+output is bit-identical to the untiled path. Position-dependent tools
+(vignette, grain) are told the strip's row offset and the full image shape.
+Tools that look at the whole frame (CLAHE in dehaze) run untiled between
+the strip passes.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import lut3d
+import opencv_tools
+import pipeline
+import preset_bank
+
+
+# Pixels per strip (before halo). Peak memory is a small multiple of this.
+STRIP_PIXELS = 4_000_000
+
+# Images smaller than this render untiled.
+TILE_MIN_PIXELS = 16_000_000
+
+# Whole-frame tools: they cannot be split into strips.
+GLOBAL_TOOLS = pipeline.tools_of_kind("global")
+
+# Tools that take row_offset/full_shape to render a strip as part of the frame.
+POSITIONAL_TOOLS = {"apply_vignette", "apply_grain"}
+
+# (label, fn(strip, row_offset, full_shape) -> strip, halo rows or None if global)
+Op = Tuple[str, Callable, Optional[int]]
+
+
+def gaussian_halo(sigma: float, dtype) -> int:
+    """
+    Rows a cv2.GaussianBlur with ksize (0, 0) reads on each side. OpenCV sizes
+    the kernel at 3 sigma per side for 8-bit images and 4 sigma otherwise.
+    """
+    per_side = 3 if np.dtype(dtype) == np.uint8 else 4
+    ksize = int(round(sigma * per_side * 2 + 1)) | 1
+    return ksize // 2 + 1
+
+
+def tool_halo(tool_name: str, params: Dict, dtype=np.uint8) -> Optional[int]:
+    """Rows of context a spatial tool needs on each side of a dtype image, or None if it is global."""
+    if tool_name in GLOBAL_TOOLS:
+        return None
+    if tool_name == "apply_glow":
+        return int(params.get("radius", 21)) // 2 + 1
+    if tool_name == "apply_orton_effect":
+        return int(params.get("blur_amount", 25)) // 2 + 1
+    if tool_name == "apply_clarity":
+        return gaussian_halo(opencv_tools.CLARITY_SIGMA, dtype)
+    if tool_name == "apply_lut_color_grade":
+        return gaussian_halo(opencv_tools.CLARITY_SIGMA, dtype) if params.get("style") == "vibrant_pop" else 0
+    if tool_name in POSITIONAL_TOOLS or lut3d.is_pointwise(tool_name, params):
+        return 0
+    return None
+
+
+def _tool_op(tool_name: str, params: Dict, fn: Callable, dtype) -> Op:
+    if tool_name in POSITIONAL_TOOLS:
+        return (tool_name, lambda img, y0, shape: fn(img, **params, row_offset=y0, full_shape=shape), 0)
+    return (tool_name, lambda img, y0, shape: lut3d.run_tool(fn, tool_name, img, **params),
+            tool_halo(tool_name, params, dtype))
+
+
+def _lut_op(label: str, lut) -> Op:
+    return (label, lambda img, y0, shape: lut.apply(img), 0)
+
+
+def build_ops(stages: List[lut3d.Stage], toolbox: Dict[str, Callable],
+              size: int = lut3d.DEFAULT_SIZE, use_lut: bool = True, dtype=np.uint8) -> List[Op]:
+    """Compile render stages into strip ops for a dtype image, mirroring lut3d.render_stages."""
+    ops: List[Op] = []
+    segment: List[lut3d.Stage] = []
+
+    def flush():
+        if not segment:
+            return
+        stages = list(segment)
+        names = [name for name, _ in stages]
+        if use_lut:
+            ops.append(_lut_op(f"lut{names}", lut3d.compile_stages(stages, size)))
+        else:
+            ops.append((f"tools{names}",
+                        lambda img, y0, shape: lut3d._to_uint8(lut3d.run_stages(img, stages, toolbox)), 0))
+        segment.clear()
+
+    for tool_name, params in stages:
+        if lut3d.is_pointwise(tool_name, params):
+            segment.append((tool_name, params))
+            continue
+        flush()
+
+        if tool_name == "apply_style_preset":
+            # Expand the preset into what the untiled call would have run.
+            if toolbox[tool_name] is preset_bank.apply_preset:
+                for name, payload in preset_bank.get_plan(params.get("style", "none")).stages:
+                    if name == "lut":
+                        ops.append(_lut_op(f"preset {payload.key}", payload))
+                    else:
+                        ops.append(_tool_op(name, payload, getattr(opencv_tools, name), dtype))
+            else:
+                for name, step_params in opencv_tools.preset_steps(params.get("style", "none")):
+                    ops.append(_tool_op(name, step_params, getattr(opencv_tools, name), dtype))
+            continue
+
+        ops.append(_tool_op(tool_name, params, toolbox[tool_name], dtype))
+
+    flush()
+    return ops
+
+
+def _run_strips(image: np.ndarray, ops: List[Op], strip_pixels: int) -> np.ndarray:
+    if not ops:
+        return image
+
+    h, w = image.shape[:2]
+    # Each op's output is valid one halo in from the strip edges, so the
+    # strip is read with the sum of the halos on both sides.
+    halo = sum(op_halo for _, _, op_halo in ops)
+    rows = max(1, strip_pixels // max(1, w), 4 * halo)
+    out = np.empty_like(image)
+
+    for y0 in range(0, h, rows):
+        y1 = min(h, y0 + rows)
+        top, bottom = max(0, y0 - halo), min(h, y1 + halo)
+        strip = image[top:bottom]
+        for _, fn, _ in ops:
+            strip = fn(strip, top, image.shape)
+        out[y0:y1] = strip[y0 - top:y1 - top]
+    return out
+
+
+def render_tiled(image: np.ndarray, stages: List[lut3d.Stage], toolbox: Dict[str, Callable],
+                 size: int = lut3d.DEFAULT_SIZE, use_lut: bool = True,
+                 strip_pixels: int = STRIP_PIXELS) -> np.ndarray:
+    """Render stages strip by strip; global tools run on the whole frame in between."""
+    try:
+        ops = build_ops(stages, toolbox, size, use_lut, image.dtype)
+        print(f"  🧩 Tiled render: {len(ops)} ops in strips of ~{strip_pixels / 1e6:.0f} MP")
+
+        img = image
+        run: List[Op] = []
+        for op in ops:
+            if op[2] is None:
+                img = _run_strips(img, run, strip_pixels)
+                run = []
+                img = op[1](img, 0, img.shape)
+            else:
+                run.append(op)
+        return _run_strips(img, run, strip_pixels)
+    except Exception as e:
+        print(f"  ✗ ERROR in tiled render: {e}, rendering untiled")
+        return lut3d.render_stages(image, stages, toolbox, size, use_lut)
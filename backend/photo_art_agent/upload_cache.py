@@ -0,0 +1,204 @@
+"""
+Upload Cache - content-addressed index of images already uploaded to Cloudinary
+===============================================================================
+Every VLM call sends its images by URL, so each one is uploaded first unless
+the same bytes were uploaded before. The index lives in SQLite in WAL mode:
+lookups are a primary-key read, concurrent sessions (threads or processes)
+can write at the same time without losing each other's entries, and a
+periodic sweep evicts entries by age and keeps the table under MAX_ENTRIES.
+
+Files are keyed by a BLAKE2b of their bytes, hashed in chunks as they are
+read; on a miss the same bytes are uploaded, so no file is read twice. A file
+whose size and mtime have not changed is not read again at all.
+"""
+
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+
+DB_PATH = os.getenv("UPLOAD_CACHE_PATH", os.path.join("payloads_qwen_openrouter", "cloudinary_cache.sqlite3"))
+MAX_ENTRIES = int(os.getenv("UPLOAD_CACHE_ENTRIES", "50000"))
+MAX_AGE_DAYS = float(os.getenv("UPLOAD_CACHE_DAYS", "30"))
+
+# Read size while hashing.
+CHUNK_BYTES = 1 << 20
+# Seconds a writer waits for another writer's lock.
+BUSY_TIMEOUT_S = 10.0
+# Sweep for expired/excess entries once every this many inserts.
+EVICT_EVERY = 256
+# A hit refreshes last_used at most this often (seconds), to keep hits read-only.
+TOUCH_INTERVAL_S = 3600.0
+# Remembered (path, size, mtime_ns) -> digest pairs.
+DIGEST_MEMO = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    digest TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_last_used ON uploads (last_used);
+"""
+
+
+def read_file(path: str) -> Tuple[str, bytes]:
+    """(digest, bytes) of a file, hashed chunk by chunk in the same read."""
+    h = hashlib.blake2b(digest_size=16)
+    data = bytearray()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            h.update(chunk)
+            data += chunk
+    return h.hexdigest(), bytes(data)
+
+
+class UploadCache:
+    """SQLite-backed digest -> URL index, safe for concurrent threads and processes."""
+
+    def __init__(self, db_path: str, max_entries: int = MAX_ENTRIES,
+                 max_age_days: float = MAX_AGE_DAYS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_s = max_age_days * 86400
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._inserts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, digest: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT url, last_used FROM uploads WHERE digest = ?", (digest,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        if now - row[1] > TOUCH_INTERVAL_S:
+            conn.execute("UPDATE uploads SET last_used = ? WHERE digest = ?", (now, digest))
+        return row[0]
+
+    def put(self, digest: str, url: str, size: int):
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO uploads (digest, url, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (digest, url, size, now, now))
+        with self._lock:
+            self._inserts += 1
+            sweep = self._inserts % EVICT_EVERY == 0
+        if sweep:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop entries older than max_age_days, then the least recently used over max_entries."""
+        conn = self._connect()
+        removed = conn.execute("DELETE FROM uploads WHERE last_used < ?",
+                               (time.time() - self.max_age_s,)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM uploads WHERE digest IN "
+                "(SELECT digest FROM uploads ORDER BY last_used LIMIT ?)", (excess,)).rowcount
+        with self._lock:
+            self.evicted += removed
+        return removed
+
+    def _memo_digest(self, path: str, stat: os.stat_result) -> Optional[str]:
+        with self._lock:
+            return self._digests.get((path, stat.st_size, stat.st_mtime_ns))
+
+    def _remember_digest(self, path: str, stat: os.stat_result, digest: str):
+        with self._lock:
+            self._digests[(path, stat.st_size, stat.st_mtime_ns)] = digest
+            while len(self._digests) > DIGEST_MEMO:
+                self._digests.popitem(last=False)
+
+    def known_digest(self, path: str) -> Optional[str]:
+        """Digest remembered for path while its size and mtime are unchanged."""
+        try:
+            return self._memo_digest(path, os.stat(path))
+        except OSError:
+            return None
+
+    def upload_known(self, digest: str, path: str,
+                     upload_fn: Callable[[io.BytesIO, str], Optional[str]]) -> Optional[str]:
+        """Like upload() for a file whose digest is already known: read only to upload it."""
+        url = self.get(digest)
+        if url:
+            return url
+        with open(path, "rb") as f:
+            data = f.read()
+        url = upload_fn(io.BytesIO(data), digest)
+        if url:
+            self.put(digest, url, len(data))
+        return url
+
+    def upload(self, path: str, upload_fn: Callable[[io.BytesIO, str], Optional[str]]) -> Optional[str]:
+        """
+        URL for the file at path, calling upload_fn(file_obj, digest) only if
+        these bytes have not been uploaded before.
+        """
+        stat = os.stat(path)
+        known = self._memo_digest(path, stat)
+        url = self.get(known) if known else None
+        if url:
+            return url
+
+        digest, data = read_file(path)
+        self._remember_digest(path, stat, digest)
+        if digest != known:
+            url = self.get(digest)
+            if url:
+                return url
+
+        url = upload_fn(io.BytesIO(data), digest)
+        if url:
+            self.put(digest, url, len(data))
+        return url
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._connect().execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+        with self._lock:
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+            }
+
+
+_caches: Dict[str, UploadCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_path: str = DB_PATH) -> UploadCache:
+    """The process-wide cache for db_path."""
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = UploadCache(db_path)
+        return _caches[db_path]
@@ -1,3 +1,7 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
@@ -38,6 +42,41 @@ except Exception as e:
     print(f"Error loading model: {e}")
     llm = None
 
+# A llama.cpp context is not thread-safe, so model calls run one at a time on
+# a single worker thread, off the event loop: /health and new requests stay
+# responsive while a completion runs. Requests beyond MAX_QUEUED get a 503.
+MAX_QUEUED = 16
+llm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llama")
+llm_stats = {"queued": 0, "running": 0, "max_queued": 0, "completed": 0, "rejected": 0, "wait_ms": 0.0, "run_ms": 0.0}
+llm_stats_lock = threading.Lock()
+
+
+async def run_llm(fn, *args, **kwargs):
+    """Run a blocking model call on the llama worker and await its result."""
+    with llm_stats_lock:
+        if llm_stats["queued"] >= MAX_QUEUED:
+            llm_stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Model is busy. Please retry shortly.")
+        llm_stats["queued"] += 1
+        llm_stats["max_queued"] = max(llm_stats["max_queued"], llm_stats["queued"])
+    submitted = time.perf_counter()
+
+    def call():
+        started = time.perf_counter()
+        with llm_stats_lock:
+            llm_stats["queued"] -= 1
+            llm_stats["running"] += 1
+            llm_stats["wait_ms"] += (started - submitted) * 1000
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with llm_stats_lock:
+                llm_stats["running"] -= 1
+                llm_stats["completed"] += 1
+                llm_stats["run_ms"] += (time.perf_counter() - started) * 1000
+
+    return await asyncio.get_running_loop().run_in_executor(llm_executor, call)
+
 # Pydantic models for request/response
 class AutocompleteRequest(BaseModel):
     sentence: str = Field(..., description="The base sentence to autocomplete", example="soften the overall")
@@ -89,7 +128,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/autocomplete": "POST - Generate text autocompletion",
-            "/health": "GET - Check API health status",
+            "/health": "GET - Check API health status and model queue depth",
             "/docs": "GET - Interactive API documentation"
         }
     }
@@ -103,10 +142,14 @@ async def health_check():
             detail="Model not loaded. Please check server logs."
         )
     
+    with llm_stats_lock:
+        queue = dict(llm_stats)
+
     return {
         "status": "healthy",
         "model_loaded": True,
-        "model_path": MODEL_PATH
+        "model_path": MODEL_PATH,
+        "queue": queue
     }
 
 @app.post("/autocomplete", response_model=AutocompleteResponse)
@@ -131,7 +174,8 @@ async def autocomplete(request: AutocompleteRequest):
     
     try:
         # Generate autocomplete
-        completion = autocomplete_lightart(
+        completion = await run_llm(
+            autocomplete_lightart,
             base_sentence=request.sentence,
             light_suggestions=request.suggestions
         )
@@ -144,6 +188,8 @@ async def autocomplete(request: AutocompleteRequest):
             full_text=full_text
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -206,7 +252,8 @@ async def refine(request: AutocompleteRequest):
     
     try:
         # Generate refined completion
-        completion = refine_lightart(
+        completion = await run_llm(
+            refine_lightart,
             base_sentence=request.sentence,
             light_suggestions=request.suggestions
         )
@@ -219,6 +266,8 @@ async def refine(request: AutocompleteRequest):
             full_text=full_text
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,